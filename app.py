@@ -1,673 +1,1016 @@
-
-
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
-import os
-from pathlib import Path
-import time
-from datetime import datetime
-
-# Import local modules
-from config import Config
-from database.models import User, DatabaseManager
-from utils.file_processor import FileProcessor
-from utils.embeddings import EmbeddingManager
-from utils.llm_handler import LLMHandler
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize Flask-Login
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# Initialize utilities
-embedding_manager = EmbeddingManager()
-llm_handler = LLMHandler()
-file_processor = FileProcessor()
-
-# Create upload folder
-os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.get_by_id(int(user_id))
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
-
-# AUTHENTICATION ROUTES 
-
-
-@app.route('/')
-def index():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return render_template('index.html')
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    
-    if request.method == 'POST':
-        username = request.form.get('username')
-        email = request.form.get('email')
-        password = request.form.get('password')
-        confirm_password = request.form.get('confirm_password')
-        
-        if not username or not email or not password:
-            flash('All fields are required', 'danger')
-            return render_template('register.html')
-        
-        if password != confirm_password:
-            flash('Passwords do not match', 'danger')
-            return render_template('register.html')
-        
-        if len(password) < 6:
-            flash('Password must be at least 6 characters', 'danger')
-            return render_template('register.html')
-        
-        if User.create_user(username, email, password):
-            flash('Registration successful! Please login.', 'success')
-            return redirect(url_for('login'))
-        else:
-            flash('Username or email already exists', 'danger')
-            return render_template('register.html')
-    
-    return render_template('register.html')
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    
-    if request.method == 'POST':
-        username = request.form.get('username')
-        password = request.form.get('password')
-        
-        user = User.get_by_username(username)
-        
-        if user and user.check_password(password):
-            login_user(user)
-            flash('Login successful!', 'success')
-            next_page = request.args.get('next')
-            return redirect(next_page or url_for('dashboard'))
-        else:
-            flash('Invalid username or password', 'danger')
-    
-    return render_template('login.html')
-
-@app.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    flash('You have been logged out', 'info')
-    return redirect(url_for('index'))
-
-
-# MAIN APPLICATION ROUTES
-
-
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    # Get recent chat sessions (limit 5)
-    chat_sessions = DatabaseManager.get_user_chat_sessions(current_user.id)[:5]
-    
-    # Get recent Excel tasks (limit 5)
-    excel_tasks = DatabaseManager.get_user_excel_tasks(current_user.id)[:5]
-    
-    # Get all user documents for stats
-    all_documents = DatabaseManager.get_user_documents(current_user.id)
-    
-    stats = {
-        'total_chats': len(DatabaseManager.get_user_chat_sessions(current_user.id)),
-        'total_excel_tasks': len(DatabaseManager.get_user_excel_tasks(current_user.id)),
-        'total_documents': len(all_documents),
-        'pdf_count': sum(1 for d in all_documents if d['file_type'] == 'pdf')
-    }
-    
-    return render_template('dashboard.html', 
-                         chat_sessions=chat_sessions,
-                         excel_tasks=excel_tasks,
-                         stats=stats)
-
-# CHAT ROUTES
-
-
-@app.route('/chat')
-@login_required
-def chat_list():
-    """Show list of all chat sessions"""
-    sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
-    return render_template('chat_list.html', sessions=sessions)
-
-@app.route('/chat/new', methods=['POST'])
-@login_required
-def create_chat():
-    """Create a new chat session"""
-    session_id, collection_name = DatabaseManager.create_chat_session(current_user.id)
-    if session_id:
-        return redirect(url_for('chat_session', session_id=session_id))
-    else:
-        flash('Error creating chat session', 'danger')
-        return redirect(url_for('dashboard'))
-
-@app.route('/chat/<int:session_id>')
-@login_required
-def chat_session(session_id):
-    """View and interact with a chat session"""
-    # Get session documents
-    session_docs = DatabaseManager.get_session_documents(session_id)
-    
-    # Get chat messages
-    messages = DatabaseManager.get_chat_messages(session_id)
-    
-    # Get all user documents for reuse option
-    all_docs = DatabaseManager.get_user_documents(current_user.id)
-    
-    # Get session info
-    sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
-    current_session = next((s for s in sessions if s['session_id'] == session_id), None)
-    
-    return render_template('chat_session.html',
-                         session_id=session_id,
-                         session=current_session,
-                         session_docs=session_docs,
-                         messages=messages,
-                         all_docs=all_docs)
-
-@app.route('/chat/<int:session_id>/upload', methods=['POST'])
-@login_required
-def upload_to_chat(session_id):
-    """Upload document to chat session"""
-    try:
-        print(f"Upload request received for session {session_id}")
-        
-        # Check if it's a new upload or reuse existing
-        reuse_doc_id = request.form.get('reuse_doc_id')
-        
-        if reuse_doc_id:
-            print(f"Reusing document {reuse_doc_id}")
-            # Reuse existing document
-            doc_id = int(reuse_doc_id)
-            
-            # Get document info
-            all_docs = DatabaseManager.get_user_documents(current_user.id)
-            doc = next((d for d in all_docs if d['doc_id'] == doc_id), None)
-            
-            if not doc:
-                print("Document not found")
-                return jsonify({'success': False, 'message': 'Document not found'})
-            
-            # Add to session
-            DatabaseManager.add_document_to_session(session_id, doc_id)
-            
-            # Get collection name and add to ChromaDB
-            collection_name = DatabaseManager.get_session_collection_name(session_id)
-            
-            if doc['file_type'] == 'pdf':
-                text_by_page, _ = file_processor.process_pdf(doc['file_path'])
-                chunks_by_page = {}
-                for page_num, text in text_by_page.items():
-                    chunks = file_processor.chunk_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-                    chunks_by_page[page_num] = chunks
-                
-                embedding_manager.add_document_chunks(collection_name, doc_id, chunks_by_page)
-            
-            return jsonify({
-                'success': True,
-                'doc_id': doc_id,
-                'filename': doc['filename'],
-                'total_pages': doc.get('total_pages')
-            })
-        
-        else:
-            # New file upload
-            files = request.files.getlist('pdf_files')
-            
-            if not files or not files[0].filename:
-                print("No files provided")
-                return jsonify({'success': False, 'message': 'No files provided'})
-            
-            uploaded_docs = []
-            collection_name = DatabaseManager.get_session_collection_name(session_id)
-            
-            for file in files:
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    timestamp = str(int(time.time()))
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{name}_{timestamp}{ext}"
-                    file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                    
-                    file.save(file_path)
-                    
-                    # Process PDF
-                    text_by_page, total_pages = file_processor.process_pdf(file_path)
-                    
-                    # Save to database
-                    doc_id = DatabaseManager.save_document(
-                        current_user.id,
-                        filename,
-                        'pdf',
-                        file_path,
-                        total_pages
-                    )
-                    
-                    # Add to session
-                    DatabaseManager.add_document_to_session(session_id, doc_id)
-                    
-                    # Process and add to ChromaDB
-                    chunks_by_page = {}
-                    for page_num, text in text_by_page.items():
-                        chunks = file_processor.chunk_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-                        chunks_by_page[page_num] = chunks
-                    
-                    embedding_manager.add_document_chunks(collection_name, doc_id, chunks_by_page)
-                    
-                    uploaded_docs.append({
-                        'doc_id': doc_id,
-                        'filename': filename,
-                        'total_pages': total_pages
-                    })
-            
-            if len(uploaded_docs) == 0:
-                return jsonify({
-                    'success': False,
-                    'message': 'No valid PDF files uploaded'
-                })
-            
-            # If only one file was uploaded, return it directly
-            if len(uploaded_docs) == 1:
-                return jsonify({
-                    'success': True,
-                    'filename': uploaded_docs[0]['filename'],
-                    'total_pages': uploaded_docs[0]['total_pages'],
-                    'doc_id': uploaded_docs[0]['doc_id']
-                })
-            
-            # Multiple files uploaded, return as array
-            return jsonify({
-                'success': True,
-                'documents': uploaded_docs,
-                'message': f'{len(uploaded_docs)} file(s) uploaded successfully'
-            })
-    
-    except Exception as e:
-        print(f"Error in upload_to_chat: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'message': str(e)})
-
-@app.route('/chat/<int:session_id>/ask', methods=['POST'])
-@login_required
-def ask_question(session_id):
-    """Ask a question in chat session"""
-    try:
-        data = request.get_json()
-        question = data.get('question', '').strip()
-        
-        if not question:
-            return jsonify({'success': False, 'message': 'No question provided'})
-        
-        # Save user message
-        DatabaseManager.save_chat_message(session_id, 'user', question)
-        
-        # Get collection name
-        collection_name = DatabaseManager.get_session_collection_name(session_id)
-        
-        # Search for relevant chunks
-        relevant_chunks = embedding_manager.search_similar(collection_name, question, n_results=5)
-        
-        # Generate answer
-        result = llm_handler.generate_answer(question, relevant_chunks)
-        
-        # Save AI response
-        DatabaseManager.save_chat_message(
-            session_id,
-            'ai',
-            result['answer'],
-            result['confidence'],
-            result['source_pages'],
-            result.get('source_doc_names')
-        )
-        
-        # Update session timestamp
-        DatabaseManager.update_session_timestamp(session_id)
-        
-        return jsonify({
-            'success': True,
-            'answer': result['answer'],
-            'confidence': result['confidence'],
-            'source_pages': result['source_pages'],
-            'source_doc_names': result.get('source_doc_names')
-        })
-    
-    except Exception as e:
-        print(f"Error in ask_question: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'message': str(e)})
-
-@app.route('/chat/<int:session_id>/rename', methods=['POST'])
-@login_required
-def rename_chat(session_id):
-    """Rename chat session"""
-    try:
-        data = request.get_json()
-        new_name = data.get('name', '').strip()
-        
-        if not new_name:
-            return jsonify({'success': False, 'message': 'Name cannot be empty'})
-        
-        success = DatabaseManager.update_session_name(session_id, new_name)
-        
-        return jsonify({
-            'success': success,
-            'message': 'Chat renamed' if success else 'Failed to rename chat'
-        })
-    
-    except Exception as e:
-        print(f"Error renaming chat: {e}")
-        return jsonify({'success': False, 'message': str(e)})
-
-
-# EXCEL Q&A ROUTES
-
-
-@app.route('/excel_qa', methods=['GET', 'POST'])
-@login_required
-def excel_qa():
-    if request.method == 'POST':
-        try:
-            print("Excel Q&A upload started")
-            
-            # Get files
-            excel_file = request.files.get('excel_file')
-            pdf_files = request.files.getlist('pdf_files')
-            reuse_doc_ids = request.form.getlist('reuse_doc_ids')
-            
-            if not excel_file or not allowed_file(excel_file.filename):
-                flash('Please upload a valid Excel file', 'danger')
-                return redirect(request.url)
-            
-            if not pdf_files and not reuse_doc_ids:
-                flash('Please upload at least one PDF or select existing PDFs', 'danger')
-                return redirect(request.url)
-            
-            # Save Excel file
-            timestamp = str(int(time.time()))
-            excel_filename = secure_filename(excel_file.filename)
-            name, ext = os.path.splitext(excel_filename)
-            excel_filename = f"{name}_{timestamp}{ext}"
-            excel_path = os.path.join(Config.UPLOAD_FOLDER, excel_filename)
-            excel_file.save(excel_path)
-            
-            # Save Excel to database
-            excel_doc_id = DatabaseManager.save_document(
-                current_user.id,
-                excel_filename,
-                'xlsx',
-                excel_path
-            )
-            
-            # Create task
-            task_name = f"Excel Q&A - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-            task_id, collection_name = DatabaseManager.create_excel_task(
-                current_user.id,
-                task_name,
-                excel_doc_id
-            )
-            
-            # Process PDF uploads (new files)
-            pdf_doc_ids = []
-            for pdf_file in pdf_files:
-                if pdf_file.filename:
-                    pdf_filename = secure_filename(pdf_file.filename)
-                    name, ext = os.path.splitext(pdf_filename)
-                    pdf_filename = f"{name}_{timestamp}{ext}"
-                    pdf_path = os.path.join(Config.UPLOAD_FOLDER, pdf_filename)
-                    pdf_file.save(pdf_path)
-                    
-                    # Process PDF
-                    text_by_page, total_pages = file_processor.process_pdf(pdf_path)
-                    
-                    # Save to database
-                    doc_id = DatabaseManager.save_document(
-                        current_user.id,
-                        pdf_filename,
-                        'pdf',
-                        pdf_path,
-                        total_pages
-                    )
-                    
-                    pdf_doc_ids.append(doc_id)
-                    
-                    # Add to task
-                    DatabaseManager.add_document_to_task(task_id, doc_id)
-                    
-                    # Process and add to ChromaDB
-                    chunks_by_page = {}
-                    for page_num, text in text_by_page.items():
-                        chunks = file_processor.chunk_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-                        chunks_by_page[page_num] = chunks
-                    
-                    embedding_manager.add_document_chunks(collection_name, doc_id, chunks_by_page)
-            
-            # Add reused documents
-            for reuse_id in reuse_doc_ids:
-                if reuse_id:
-                    doc_id = int(reuse_id)
-                    DatabaseManager.add_document_to_task(task_id, doc_id)
-                    
-                    # Get document and add to ChromaDB
-                    all_docs = DatabaseManager.get_user_documents(current_user.id)
-                    doc = next((d for d in all_docs if d['doc_id'] == doc_id), None)
-                    
-                    if doc and doc['file_type'] == 'pdf':
-                        text_by_page, _ = file_processor.process_pdf(doc['file_path'])
-                        chunks_by_page = {}
-                        for page_num, text in text_by_page.items():
-                            chunks = file_processor.chunk_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-                            chunks_by_page[page_num] = chunks
-                        
-                        embedding_manager.add_document_chunks(collection_name, doc_id, chunks_by_page)
-            
-            # Extract questions from Excel
-            questions = file_processor.process_excel(excel_path)
-            
-            if not questions:
-                flash('No questions found in Excel file', 'warning')
-                return redirect(url_for('excel_qa'))
-            
-            # Process each question
-            for question in questions:
-                # Search for relevant chunks
-                relevant_chunks = embedding_manager.search_similar(collection_name, question, n_results=5)
-                
-                # Generate answer
-                result = llm_handler.generate_answer(question, relevant_chunks)
-                
-                # Save answer
-                DatabaseManager.save_task_answer(
-                    task_id,
-                    question,
-                    result['answer'],
-                    result['confidence'],
-                    result['source_pages'],
-                    result.get('source_doc_names') 
-                )
-            
-            flash(f'Successfully processed {len(questions)} questions!', 'success')
-            return redirect(url_for('view_excel_task', task_id=task_id))
-        
-        except Exception as e:
-            print(f"Error in excel_qa: {e}")
-            flash(f'Error processing Excel file: {str(e)}', 'danger')
-            return redirect(request.url)
-    
-    # GET request
-    all_docs = DatabaseManager.get_user_documents(current_user.id)
-    pdf_docs = [d for d in all_docs if d['file_type'] == 'pdf']
-    
-    return render_template('excel_qa.html', pdf_docs=pdf_docs)
-
-@app.route('/excel_task/<int:task_id>')
-@login_required
-def view_excel_task(task_id):
-    """View Excel task results"""
-    answers = DatabaseManager.get_task_answers(task_id)
-    tasks = DatabaseManager.get_user_excel_tasks(current_user.id)
-    current_task = next((t for t in tasks if t['task_id'] == task_id), None)
-    
-    return render_template('excel_task_view.html',
-                         task=current_task,
-                         answers=answers,
-                         task_id=task_id)
-
-
-# HISTORY ROUTE 
-
-
-@app.route('/history')
-@login_required
-def history():
-    """Show all history including all Q&A processed"""
-    # Get all chat sessions
-    chat_sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
-    
-    # Get all Excel tasks
-    excel_tasks = DatabaseManager.get_user_excel_tasks(current_user.id)
-    
-    # Get all documents
-    documents = DatabaseManager.get_user_documents(current_user.id)
-    
-    # Get all Q&A (from both chats and excel tasks)
-    all_qa = DatabaseManager.get_all_user_qa(current_user.id)
-    
-    # Get date range from request
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Filter Q&A by date if provided
-    if start_date or end_date:
-        all_qa = DatabaseManager.filter_qa_by_date(all_qa, start_date, end_date)
-    
-    return render_template('history.html',
-                         chat_sessions=chat_sessions,
-                         excel_tasks=excel_tasks,
-                         documents=documents,
-                         all_qa=all_qa)
-
-
-# ROUTES FOR PDF VIEWING AND FEEDBACK
-
-
-@app.route('/document/view/<int:doc_id>')
-@login_required
-def view_document(doc_id):
-    """View/download a document"""
-    try:
-        doc = DatabaseManager.get_document_by_id(doc_id)
-        if not doc:
-            flash('Document not found', 'danger')
-            return redirect(url_for('history'))
-        
-        # Check if user owns this document
-        user_docs = DatabaseManager.get_user_documents(current_user.id)
-        if not any(d['doc_id'] == doc_id for d in user_docs):
-            flash('Access denied', 'danger')
-            return redirect(url_for('history'))
-        
-        return send_file(
-            doc['file_path'],
-            as_attachment=False,
-            download_name=doc['filename']
-        )
-    except Exception as e:
-        print(f"Error viewing document: {e}")
-        flash('Error opening document', 'danger')
-        return redirect(url_for('history'))
-
-@app.route('/chat/message/<int:message_id>/feedback', methods=['POST'])
-@login_required
-def chat_message_feedback(message_id):
-    """Handle feedback for chat message"""
-    try:
-        data = request.get_json()
-        is_correct = data.get('is_correct', False)
-        edited_content = data.get('edited_content')
-        
-        success = DatabaseManager.update_chat_message_feedback(
-            message_id, 
-            is_correct, 
-            edited_content
-        )
-        
-        return jsonify({
-            'success': success,
-            'message': 'Feedback saved' if success else 'Failed to save feedback'
-        })
-    
-    except Exception as e:
-        print(f"Error saving feedback: {e}")
-        return jsonify({'success': False, 'message': str(e)})
-
-@app.route('/task/answer/<int:answer_id>/feedback', methods=['POST'])
-@login_required
-def task_answer_feedback(answer_id):
-    """Handle feedback for task answer"""
-    try:
-        data = request.get_json()
-        is_correct = data.get('is_correct', False)
-        edited_answer = data.get('edited_answer')
-        
-        success = DatabaseManager.update_task_answer_feedback(
-            answer_id, 
-            is_correct, 
-            edited_answer
-        )
-        
-        return jsonify({
-            'success': success,
-            'message': 'Feedback saved' if success else 'Failed to save feedback'
-        })
-    
-    except Exception as e:
-        print(f"Error saving feedback: {e}")
-        return jsonify({'success': False, 'message': str(e)})
-
-
-# ERROR HANDLERS
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('404.html'), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return render_template('500.html'), 500
-
-
-# MAIN
-
-
-if __name__ == '__main__':
-    from database.db_setup import initialize_database
-    print("Initializing database...")
-    initialize_database()
-    print("Database initialized!")
-    
-    print("\n" + "="*60)
-    print("MediQuery AI - Document-Based Q&A System")
-    print("="*60)
-    print("\nStarting server...")
-    print("Access the application at: http://127.0.0.1:5000")
-  
-    
+
+
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, stream_with_context
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from werkzeug.utils import secure_filename
+import os
+import json
+from pathlib import Path
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import datetime
+
+# Import local modules
+from config import Config
+from database.models import User, DatabaseManager
+from utils.file_processor import FileProcessor
+from utils.answer_cache import ExactAnswerCache, SemanticAnswerCache
+from utils.context_selector import ContextSelector
+from utils.ingestion import IngestionPipeline
+from utils.job_queue import IngestionJobQueue
+from utils.llm_handler import LLMHandler
+from utils.metrics import Metrics
+
+# Initialize Flask app
+app = Flask(__name__)
+app.config.from_object(Config)
+
+# Initialize Flask-Login
+login_manager = LoginManager()
+login_manager.init_app(app)
+login_manager.login_view = 'login'
+
+class LazyService:
+    """Stand-in for a service that is created on first attribute access
+    
+    PDF extraction and OCR worker processes re-import the main script (spawn and forkserver
+    both do), so importing this module must not load models or open stores.
+    """
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+def create_embedding_manager():
+    # Imported here so torch, sentence-transformers and ChromaDB stay out of worker processes
+    from utils.embeddings import EmbeddingManager
+    return EmbeddingManager()
+
+# Initialize utilities (cheap until used: the embedding manager is created by the first request
+# that needs it, and the executors start their threads on first submit)
+embedding_manager = LazyService(create_embedding_manager)
+llm_handler = LLMHandler()
+file_processor = FileProcessor()
+answer_cache = SemanticAnswerCache()
+Metrics.register('answer_cache', answer_cache.stats)
+ingestion_pipeline = IngestionPipeline(embedding_manager, answer_cache=answer_cache)
+job_queue = IngestionJobQueue(ingestion_pipeline)
+context_selector = ContextSelector(embedding_manager)
+upload_executor = ThreadPoolExecutor(max_workers=Config.UPLOAD_WORKERS, thread_name_prefix='upload')
+qa_executor = ThreadPoolExecutor(max_workers=Config.EXCEL_QA_WORKERS, thread_name_prefix='excel-qa')
+
+# Create upload folder
+os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.get_by_id(int(user_id))
+
+@app.before_request
+def start_ingestion_workers():
+    # Started lazily so the debug reloader's watcher process never runs jobs
+    job_queue.start()
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+
+def vector_collection(own_collection_name):
+    """Collection holding a session's or task's vectors: the shared index, or its own collection"""
+    if Config.VECTOR_STORE_MODE == 'shared':
+        shared_name = embedding_manager.shared_index_name(current_user.id)
+        # Sessions and tasks from before shared mode still have their vectors in their own collection
+        embedding_manager.migrate_collection(own_collection_name, shared_name)
+        return shared_name
+    return own_collection_name
+
+def reusable_ingestions(collection_name, doc_ids):
+    """Latest ingestion jobs of documents whose vectors can be reused from the shared index
+    
+    Only documents whose latest job into the index finished or is still running count;
+    vectors left by a failed job may be partial, so those documents (like any in the
+    per-session/task storage mode) need a new job.
+    """
+    if Config.VECTOR_STORE_MODE != 'shared':
+        return {}
+    jobs = DatabaseManager.get_latest_ingestion_jobs(doc_ids, collection_name)
+    return {doc_id: job for doc_id, job in jobs.items() if job['status'] in ('queued', 'extracting', 'embedding', 'ready')}
+
+def superseded_versions(uploads, doc_ids, attached_docs):
+    """Attached documents that new uploads replace, as {new doc_id: [earlier doc_ids]}
+    
+    An upload is a new version of an attached PDF with the same file name (ignoring
+    the upload timestamp and suffix) but different content.
+    """
+    replaces = {}
+    for upload, doc_id in zip(uploads, doc_ids):
+        source_name = embedding_manager.source_name(upload['filename'])
+        earlier = [doc['doc_id'] for doc in attached_docs
+                   if doc['file_type'] == 'pdf' and doc['doc_id'] != doc_id
+                   and embedding_manager.source_name(doc['filename']) == source_name
+                   and doc.get('file_hash') != upload['file_hash']]
+        if earlier:
+            replaces[doc_id] = earlier
+    return replaces
+
+def exact_cache_key(question, relevant_chunks):
+    """Key for the persistent exact-match answer cache"""
+    return ExactAnswerCache.key(question, relevant_chunks, llm_handler.model,
+                                [LLMHandler.PROMPT_VERSION, llm_handler.prompt_budget, Config.CONTEXT_MAX_TOKENS])
+
+def answer_task_question(question, question_vector, retrieved_chunks, doc_ids):
+    """Answer one Excel question from its retrieved chunks, retrying failed generations"""
+    # A re-run over unchanged documents retrieves the same chunks: reuse the saved answer
+    exact_key = exact_cache_key(question, retrieved_chunks)
+    result = ExactAnswerCache.get(exact_key)
+    if result is None:
+        # Generate answer from the selected context
+        relevant_chunks = context_selector.select(retrieved_chunks)
+        for attempt in range(1, Config.EXCEL_QA_MAX_ATTEMPTS + 1):
+            result = llm_handler.generate_answer(question, relevant_chunks)
+            if not result.get('error') or attempt == Config.EXCEL_QA_MAX_ATTEMPTS:
+                break
+            Metrics.increment('excel_qa.retries')
+            time.sleep(Config.EXCEL_QA_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        
+        if relevant_chunks and not result.get('error'):
+            ExactAnswerCache.put(exact_key, result)
+    
+    if retrieved_chunks and not result.get('error'):
+        answer_cache.put(question_vector, doc_ids, result)
+    return result
+
+def unique_filename(filename, timestamp):
+    """Upload name with a timestamp and a random suffix, so same-named files never overwrite each other"""
+    name, ext = os.path.splitext(secure_filename(filename))
+    return f"{name}_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
+
+def save_upload(file, timestamp):
+    """Save an uploaded file under a unique timestamped name and hash it"""
+    filename = unique_filename(file.filename, timestamp)
+    ext = os.path.splitext(filename)[1]
+    file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
+    file.save(file_path)
+    
+    return {
+        'filename': filename,
+        'file_type': ext.lstrip('.').lower(),
+        'file_path': file_path,
+        'file_hash': DatabaseManager.calculate_file_hash(file_path)
+    }
+
+def save_uploads(files, timestamp):
+    """Save and hash PDF uploads concurrently, returning (saved, failed) in upload order"""
+    futures = []
+    for file in files:
+        if file and file.filename:
+            if allowed_file(file.filename) and file.filename.lower().endswith('.pdf'):
+                futures.append((file.filename, upload_executor.submit(save_upload, file, timestamp)))
+            else:
+                futures.append((file.filename, None))
+    
+    saved = []
+    failed = []
+    for original_name, future in futures:
+        if future is None:
+            failed.append({'success': False, 'filename': original_name, 'message': 'Not a PDF file'})
+            continue
+        try:
+            saved.append(future.result())
+        except Exception as e:
+            print(f"Error saving upload {original_name}: {e}")
+            failed.append({'success': False, 'filename': original_name, 'message': str(e)})
+    
+    return saved, failed
+
+# AUTHENTICATION ROUTES 
+
+
+@app.route('/')
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('dashboard'))
+    return render_template('index.html')
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        if not username or not email or not password:
+            flash('All fields are required', 'danger')
+            return render_template('register.html')
+        
+        if password != confirm_password:
+            flash('Passwords do not match', 'danger')
+            return render_template('register.html')
+        
+        if len(password) < 6:
+            flash('Password must be at least 6 characters', 'danger')
+            return render_template('register.html')
+        
+        if User.create_user(username, email, password):
+            flash('Registration successful! Please login.', 'success')
+            return redirect(url_for('login'))
+        else:
+            flash('Username or email already exists', 'danger')
+            return render_template('register.html')
+    
+    return render_template('register.html')
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        user = User.get_by_username(username)
+        
+        if user and user.check_password(password):
+            login_user(user)
+            flash('Login successful!', 'success')
+            next_page = request.args.get('next')
+            return redirect(next_page or url_for('dashboard'))
+        else:
+            flash('Invalid username or password', 'danger')
+    
+    return render_template('login.html')
+
+@app.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out', 'info')
+    return redirect(url_for('index'))
+
+
+# MAIN APPLICATION ROUTES
+
+
+@app.route('/dashboard')
+@login_required
+def dashboard():
+    # Get recent chat sessions (limit 5)
+    chat_sessions = DatabaseManager.get_user_chat_sessions(current_user.id)[:5]
+    
+    # Get recent Excel tasks (limit 5)
+    excel_tasks = DatabaseManager.get_user_excel_tasks(current_user.id)[:5]
+    
+    # Get all user documents for stats
+    all_documents = DatabaseManager.get_user_documents(current_user.id)
+    
+    stats = {
+        'total_chats': len(DatabaseManager.get_user_chat_sessions(current_user.id)),
+        'total_excel_tasks': len(DatabaseManager.get_user_excel_tasks(current_user.id)),
+        'total_documents': len(all_documents),
+        'pdf_count': sum(1 for d in all_documents if d['file_type'] == 'pdf')
+    }
+    
+    return render_template('dashboard.html', 
+                         chat_sessions=chat_sessions,
+                         excel_tasks=excel_tasks,
+                         stats=stats)
+
+# CHAT ROUTES
+
+
+@app.route('/chat')
+@login_required
+def chat_list():
+    """Show list of all chat sessions"""
+    sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
+    return render_template('chat_list.html', sessions=sessions)
+
+@app.route('/chat/new', methods=['POST'])
+@login_required
+def create_chat():
+    """Create a new chat session"""
+    session_id, collection_name = DatabaseManager.create_chat_session(current_user.id)
+    if session_id:
+        return redirect(url_for('chat_session', session_id=session_id))
+    else:
+        flash('Error creating chat session', 'danger')
+        return redirect(url_for('dashboard'))
+
+@app.route('/chat/<int:session_id>')
+@login_required
+def chat_session(session_id):
+    """View and interact with a chat session"""
+    # Get session documents
+    session_docs = DatabaseManager.get_session_documents(session_id, vector_collection(None))
+    
+    # Get chat messages
+    messages = DatabaseManager.get_chat_messages(session_id)
+    
+    # Get all user documents for reuse option
+    all_docs = DatabaseManager.get_user_documents(current_user.id)
+    
+    # Get session info
+    sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
+    current_session = next((s for s in sessions if s['session_id'] == session_id), None)
+    
+    return render_template('chat_session.html',
+                         session_id=session_id,
+                         session=current_session,
+                         session_docs=session_docs,
+                         messages=messages,
+                         all_docs=all_docs)
+
+@app.route('/chat/<int:session_id>/upload', methods=['POST'])
+@login_required
+def upload_to_chat(session_id):
+    """Upload document to chat session"""
+    try:
+        print(f"Upload request received for session {session_id}")
+        
+        # Check if it's a new upload or reuse existing
+        reuse_doc_id = request.form.get('reuse_doc_id')
+        
+        if reuse_doc_id:
+            print(f"Reusing document {reuse_doc_id}")
+            # Reuse existing document
+            doc_id = int(reuse_doc_id)
+            
+            # Get document info
+            all_docs = DatabaseManager.get_user_documents(current_user.id)
+            doc = next((d for d in all_docs if d['doc_id'] == doc_id), None)
+            
+            if not doc:
+                print("Document not found")
+                return jsonify({'success': False, 'message': 'Document not found'})
+            
+            # Add to session
+            DatabaseManager.add_document_to_session(session_id, doc_id)
+            
+            # Get collection name and queue ingestion into ChromaDB
+            collection_name = vector_collection(DatabaseManager.get_session_collection_name(session_id))
+            
+            job_id = None
+            status = 'ready'
+            if doc['file_type'] == 'pdf':
+                job = reusable_ingestions(collection_name, [doc_id]).get(doc_id)
+                if job:
+                    # Already (being) ingested into the shared index: attaching it to the session is all that's needed
+                    job_id = job['job_id'] if job['status'] != 'ready' else None
+                    status = job['status']
+                else:
+                    # Cached text and chunks are reused instead of re-extracting the stored file
+                    job_id = job_queue.submit(current_user.id, doc_id, collection_name)
+                    status = 'queued' if job_id else 'failed'
+            
+            return jsonify({
+                'success': True,
+                'doc_id': doc_id,
+                'filename': doc['filename'],
+                'total_pages': doc.get('total_pages'),
+                'job_id': job_id,
+                'status': status
+            })
+        
+        else:
+            # New file upload
+            files = request.files.getlist('pdf_files')
+            
+            if not files or not files[0].filename:
+                print("No files provided")
+                return jsonify({'success': False, 'message': 'No files provided'})
+            
+            collection_name = vector_collection(DatabaseManager.get_session_collection_name(session_id))
+            
+            # Files are written and hashed in parallel, then registered in a few batched writes
+            saved, failed = save_uploads(files, str(int(time.time())))
+            
+            doc_ids = DatabaseManager.save_documents(current_user.id, saved)
+            if doc_ids is None:
+                failed += [{'success': False, 'filename': upload['filename'], 'message': 'Failed to save document'}
+                           for upload in saved]
+                saved, doc_ids = [], []
+            
+            # A changed file uploaded under the same name takes the place of the version in the session
+            replaces = superseded_versions(saved, doc_ids, DatabaseManager.get_session_documents(session_id))
+            DatabaseManager.remove_documents_from_session(
+                session_id, [old_id for old_ids in replaces.values() for old_id in old_ids])
+            DatabaseManager.add_documents_to_session(session_id, doc_ids)
+            
+            # Extraction and embedding run in the background
+            job_ids = job_queue.submit_many(current_user.id, doc_ids, collection_name, replaces)
+            
+            uploaded_docs = [
+                {
+                    'success': True,
+                    'doc_id': doc_id,
+                    'filename': upload['filename'],
+                    'total_pages': None,
+                    'job_id': job_id,
+                    'status': 'queued' if job_id else 'failed',
+                    'replaces': replaces.get(doc_id, [])
+                }
+                for upload, doc_id, job_id in zip(saved, doc_ids, job_ids)
+            ]
+            
+            if len(uploaded_docs) == 0:
+                return jsonify({
+                    'success': False,
+                    'message': failed[0]['message'] if len(failed) == 1 else 'No valid PDF files uploaded',
+                    'failed': failed
+                })
+            
+            # If only one file was uploaded, return it directly
+            if len(uploaded_docs) == 1 and not failed:
+                return jsonify({
+                    'success': True,
+                    'filename': uploaded_docs[0]['filename'],
+                    'total_pages': uploaded_docs[0]['total_pages'],
+                    'doc_id': uploaded_docs[0]['doc_id'],
+                    'job_id': uploaded_docs[0]['job_id'],
+                    'status': uploaded_docs[0]['status'],
+                    'replaces': uploaded_docs[0]['replaces']
+                })
+            
+            # Multiple files uploaded, return as array
+            return jsonify({
+                'success': True,
+                'documents': uploaded_docs,
+                'failed': failed,
+                'message': f'{len(uploaded_docs)} file(s) uploaded successfully'
+            })
+    
+    except Exception as e:
+        print(f"Error in upload_to_chat: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/ingest/jobs/<int:job_id>')
+@login_required
+def ingestion_job_status(job_id):
+    """Report progress of a background ingestion job"""
+    job = DatabaseManager.get_ingestion_job(job_id)
+    
+    if not job or job['user_id'] != current_user.id:
+        return jsonify({'success': False, 'message': 'Job not found'})
+    
+    return jsonify({
+        'success': True,
+        'job_id': job['job_id'],
+        'doc_id': job['doc_id'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'total_pages': job['total_pages'],
+        'pages_done': job['pages_done'],
+        'chunks_done': job['chunks_done'],
+        'replaces': job['replaces'],
+        'changes': job['changes'],
+        'error': job['error_message']
+    })
+
+@app.route('/chat/<int:session_id>/ask', methods=['POST'])
+@login_required
+def ask_question(session_id):
+    """Ask a question in chat session"""
+    try:
+        data = request.get_json()
+        question = data.get('question', '').strip()
+        
+        if not question:
+            return jsonify({'success': False, 'message': 'No question provided'})
+        
+        # Save user message
+        DatabaseManager.save_chat_message(session_id, 'user', question)
+        
+        # A paraphrase of an earlier question over the same documents reuses its answer
+        session_doc_ids = DatabaseManager.get_session_doc_ids(session_id)
+        question_vector = embedding_manager.embed_query(question)
+        result = answer_cache.get(question_vector, session_doc_ids)
+        cache_hit = result is not None
+        
+        if not cache_hit:
+            # Get collection name; the shared index is filtered down to the session's documents
+            collection_name = vector_collection(DatabaseManager.get_session_collection_name(session_id))
+            doc_ids = session_doc_ids if Config.VECTOR_STORE_MODE == 'shared' else None
+            
+            # Search for relevant chunks
+            relevant_chunks = embedding_manager.search_similar(
+                collection_name, question, n_results=Config.CONTEXT_CANDIDATES, doc_ids=doc_ids
+            )
+            
+            # The same question over the same chunks was answered before
+            exact_key = exact_cache_key(question, relevant_chunks)
+            result = ExactAnswerCache.get(exact_key)
+            cache_hit = result is not None
+            
+            if not cache_hit:
+                # Merge overlapping chunks, drop duplicates and fit the token budget
+                selected_chunks = context_selector.select(relevant_chunks)
+                
+                # Generate answer
+                result = llm_handler.generate_answer(question, selected_chunks)
+                if selected_chunks and not result.get('error'):
+                    ExactAnswerCache.put(exact_key, result)
+            
+            if relevant_chunks and not result.get('error'):
+                answer_cache.put(question_vector, session_doc_ids, result)
+        
+        # Save AI response
+        DatabaseManager.save_chat_message(
+            session_id,
+            'ai',
+            result['answer'],
+            result['confidence'],
+            result['source_pages'],
+            result.get('source_doc_names')
+        )
+        
+        # Update session timestamp
+        DatabaseManager.update_session_timestamp(session_id)
+        
+        return jsonify({
+            'success': True,
+            'answer': result['answer'],
+            'confidence': result['confidence'],
+            'source_pages': result['source_pages'],
+            'source_doc_names': result.get('source_doc_names'),
+            'cache_hit': cache_hit
+        })
+    
+    except Exception as e:
+        print(f"Error in ask_question: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)})
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/chat/<int:session_id>/ask/stream', methods=['POST'])
+@login_required
+def ask_question_stream(session_id):
+    """Ask a question in chat session, streaming the answer as server-sent events
+    
+    Sends 'token' events as the model generates, then one 'done' event with the
+    confidence, sources and saved message id.
+    """
+    request_start = time.perf_counter()
+    try:
+        data = request.get_json()
+        question = data.get('question', '').strip()
+        
+        if not question:
+            return jsonify({'success': False, 'message': 'No question provided'})
+        
+        # Save user message
+        DatabaseManager.save_chat_message(session_id, 'user', question)
+        
+        session_doc_ids = DatabaseManager.get_session_doc_ids(session_id)
+        question_vector = embedding_manager.embed_query(question)
+        cached_result = answer_cache.get(question_vector, session_doc_ids)
+        
+        # Retrieve and select context before the stream starts
+        relevant_chunks = []
+        exact_key = None
+        if cached_result is None:
+            collection_name = vector_collection(DatabaseManager.get_session_collection_name(session_id))
+            doc_ids = session_doc_ids if Config.VECTOR_STORE_MODE == 'shared' else None
+            relevant_chunks = embedding_manager.search_similar(
+                collection_name, question, n_results=Config.CONTEXT_CANDIDATES, doc_ids=doc_ids
+            )
+            exact_key = exact_cache_key(question, relevant_chunks)
+            cached_result = ExactAnswerCache.get(exact_key)
+            if cached_result is None:
+                relevant_chunks = context_selector.select(relevant_chunks)
+            elif relevant_chunks:
+                answer_cache.put(question_vector, session_doc_ids, cached_result)
+    except Exception as e:
+        print(f"Error in ask_question_stream: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+    
+    def generate():
+        if cached_result is not None:
+            # The cached answer goes out as a single token
+            answer = [('token', cached_result['answer']), ('done', cached_result)]
+        else:
+            answer = llm_handler.stream_answer(question, relevant_chunks)
+        
+        first_token = True
+        for kind, value in answer:
+            if kind == 'token':
+                # Only generated answers count; cache hits would hide the model's latency
+                if first_token and cached_result is None:
+                    Metrics.observe('chat.time_to_first_token', time.perf_counter() - request_start)
+                first_token = False
+                yield sse_event('token', {'text': value})
+                continue
+            
+            # Finalize once the whole answer is known
+            result = value
+            if cached_result is None and relevant_chunks and not result.get('error'):
+                ExactAnswerCache.put(exact_key, result)
+                answer_cache.put(question_vector, session_doc_ids, result)
+            message_id = DatabaseManager.save_chat_message(
+                session_id,
+                'ai',
+                result['answer'],
+                result['confidence'],
+                result['source_pages'],
+                result.get('source_doc_names')
+            )
+            DatabaseManager.update_session_timestamp(session_id)
+            Metrics.observe('chat.answer_seconds', time.perf_counter() - request_start)
+            
+            yield sse_event('done', {
+                'success': True,
+                'message_id': int(message_id) if message_id else None,
+                'answer': result['answer'],
+                'confidence': result['confidence'],
+                'source_pages': result['source_pages'],
+                'source_doc_names': result.get('source_doc_names'),
+                'cache_hit': cached_result is not None
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Proxies must pass tokens through as they are written
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/chat/<int:session_id>/rename', methods=['POST'])
+@login_required
+def rename_chat(session_id):
+    """Rename chat session"""
+    try:
+        data = request.get_json()
+        new_name = data.get('name', '').strip()
+        
+        if not new_name:
+            return jsonify({'success': False, 'message': 'Name cannot be empty'})
+        
+        success = DatabaseManager.update_session_name(session_id, new_name)
+        
+        return jsonify({
+            'success': success,
+            'message': 'Chat renamed' if success else 'Failed to rename chat'
+        })
+    
+    except Exception as e:
+        print(f"Error renaming chat: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+
+# EXCEL Q&A ROUTES
+
+
+@app.route('/excel_qa', methods=['GET', 'POST'])
+@login_required
+def excel_qa():
+    if request.method == 'POST':
+        try:
+            print("Excel Q&A upload started")
+            
+            # Get files
+            excel_file = request.files.get('excel_file')
+            pdf_files = request.files.getlist('pdf_files')
+            reuse_doc_ids = request.form.getlist('reuse_doc_ids')
+            
+            if not excel_file or not allowed_file(excel_file.filename):
+                flash('Please upload a valid Excel file', 'danger')
+                return redirect(request.url)
+            
+            if not pdf_files and not reuse_doc_ids:
+                flash('Please upload at least one PDF or select existing PDFs', 'danger')
+                return redirect(request.url)
+            
+            # Save Excel file
+            timestamp = str(int(time.time()))
+            excel_filename = unique_filename(excel_file.filename, timestamp)
+            ext = os.path.splitext(excel_filename)[1]
+            excel_path = os.path.join(Config.UPLOAD_FOLDER, excel_filename)
+            excel_file.save(excel_path)
+            
+            # Save Excel to database
+            excel_doc_id = DatabaseManager.save_document(
+                current_user.id,
+                excel_filename,
+                ext.lstrip('.').lower(),
+                excel_path
+            )
+            
+            # Create task
+            task_name = f"Excel Q&A - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            task_id, collection_name = DatabaseManager.create_excel_task(
+                current_user.id,
+                task_name,
+                excel_doc_id
+            )
+            collection_name = vector_collection(collection_name)
+            
+            # Save and hash new PDFs concurrently, then register them in one transaction
+            saved, failed = save_uploads(pdf_files, timestamp)
+            failed_files = [upload['filename'] for upload in failed]
+            
+            pdf_doc_ids = DatabaseManager.save_documents(current_user.id, saved)
+            if pdf_doc_ids is None:
+                failed_files += [upload['filename'] for upload in saved]
+                saved, pdf_doc_ids = [], []
+            to_ingest = list(pdf_doc_ids)
+            task_doc_ids = list(pdf_doc_ids)
+            
+            # Add reused documents
+            all_docs = DatabaseManager.get_user_documents(current_user.id)
+            docs_by_id = {d['doc_id']: d for d in all_docs}
+            reuse_ids = [int(reuse_id) for reuse_id in reuse_doc_ids if reuse_id]
+            
+            # A changed file uploaded under the name of a selected document is used instead of it
+            replaces = superseded_versions(saved, pdf_doc_ids, [docs_by_id[doc_id] for doc_id in reuse_ids
+                                                                 if doc_id in docs_by_id])
+            superseded = {old_id for old_ids in replaces.values() for old_id in old_ids}
+            reuse_ids = [doc_id for doc_id in reuse_ids if doc_id not in superseded]
+            task_doc_ids += reuse_ids
+            # Answers are generated right away, so only fully ingested documents are reused as-is
+            ready = {doc_id for doc_id, job in reusable_ingestions(collection_name, reuse_ids).items()
+                     if job['status'] == 'ready'}
+            for doc_id in reuse_ids:
+                doc = docs_by_id.get(doc_id)
+                if doc and doc['file_type'] == 'pdf' and doc_id not in ready:
+                    # Cached text and chunks are reused instead of re-extracting the stored file
+                    to_ingest.append(doc_id)
+            
+            DatabaseManager.add_documents_to_task(task_id, task_doc_ids)
+            
+            # Extract, chunk and embed the PDFs concurrently, recording each as an ingestion job
+            # so the shared index knows which documents are complete
+            job_ids = DatabaseManager.create_ingestion_jobs(current_user.id, to_ingest, collection_name, replaces) or [None] * len(to_ingest)
+            ingest_futures = [
+                (doc_id, upload_executor.submit(job_queue.run, job_id) if job_id else None)
+                for doc_id, job_id in zip(to_ingest, job_ids)
+            ]
+            filenames = {doc_id: upload['filename'] for upload, doc_id in zip(saved, pdf_doc_ids)}
+            for doc_id, future in ingest_futures:
+                result = future.result() if future else None
+                if not result or not result['success']:
+                    print(f"Failed to ingest document {doc_id} into {collection_name}")
+                    failed_files.append(filenames.get(doc_id) or docs_by_id[doc_id]['filename'])
+            
+            if failed_files:
+                flash(f"Could not process: {', '.join(failed_files)}", 'warning')
+            
+            # Stream questions from the sheet in blocks; each block is retrieved with one batched search
+            question_count = 0
+            questions = file_processor.iter_questions(excel_path)
+            while True:
+                block = list(islice(questions, Config.RETRIEVAL_BATCH_SIZE))
+                if not block:
+                    break
+                
+                # Paraphrases of already answered questions skip retrieval and generation
+                question_vectors = embedding_manager.embed_queries([question for _, question in block])
+                cached = [answer_cache.get(vector, task_doc_ids) for vector in question_vectors]
+                misses = [i for i, result in enumerate(cached) if result is None]
+                
+                # Search for relevant chunks
+                search_start = time.perf_counter()
+                retrieved = dict(zip(misses, embedding_manager.search_similar_batch(
+                    collection_name, [block[i][1] for i in misses], n_results=Config.CONTEXT_CANDIDATES,
+                    doc_ids=task_doc_ids if Config.VECTOR_STORE_MODE == 'shared' else None
+                ))) if misses else {}
+                print(f"Retrieved chunks for {len(misses)} questions in {time.perf_counter() - search_start:.2f}s "
+                      f"({len(block) - len(misses)} answered from cache)")
+                
+                # Answer the block's questions concurrently on the bounded pool
+                futures = {
+                    i: qa_executor.submit(answer_task_question, block[i][1], question_vectors[i], retrieved[i], task_doc_ids)
+                    for i in misses
+                }
+                
+                # Save in sheet order as answers complete; a failed question gets an error answer
+                for i, (row_num, question) in enumerate(block):
+                    question_count += 1
+                    
+                    result = cached[i]
+                    if result is None:
+                        try:
+                            result = futures[i].result()
+                        except Exception as e:
+                            print(f"Error answering question in sheet row {row_num}: {e}")
+                            Metrics.increment('excel_qa.failed_questions')
+                            result = {
+                                'answer': "Error generating answer. Please try again.",
+                                'confidence': 0,
+                                'source_pages': None,
+                                'source_doc_names': None
+                            }
+                    
+                    # Save answer
+                    DatabaseManager.save_task_answer(
+                        task_id,
+                        question,
+                        result['answer'],
+                        result['confidence'],
+                        result['source_pages'],
+                        result.get('source_doc_names') 
+                    )
+                    
+                    if question_count % 100 == 0:
+                        print(f"Answered {question_count} questions (sheet row {row_num})")
+            
+            if question_count == 0:
+                flash('No questions found in Excel file', 'warning')
+                return redirect(url_for('excel_qa'))
+            
+            flash(f'Successfully processed {question_count} questions!', 'success')
+            return redirect(url_for('view_excel_task', task_id=task_id))
+        
+        except Exception as e:
+            print(f"Error in excel_qa: {e}")
+            flash(f'Error processing Excel file: {str(e)}', 'danger')
+            return redirect(request.url)
+    
+    # GET request
+    all_docs = DatabaseManager.get_user_documents(current_user.id)
+    pdf_docs = [d for d in all_docs if d['file_type'] == 'pdf']
+    
+    return render_template('excel_qa.html', pdf_docs=pdf_docs)
+
+@app.route('/excel_task/<int:task_id>')
+@login_required
+def view_excel_task(task_id):
+    """View Excel task results"""
+    answers = DatabaseManager.get_task_answers(task_id)
+    tasks = DatabaseManager.get_user_excel_tasks(current_user.id)
+    current_task = next((t for t in tasks if t['task_id'] == task_id), None)
+    
+    return render_template('excel_task_view.html',
+                         task=current_task,
+                         answers=answers,
+                         task_id=task_id)
+
+
+@app.route('/metrics')
+@login_required
+def metrics():
+    """Cache, queue and timing counters for this process"""
+    return jsonify(Metrics.snapshot())
+
+# HISTORY ROUTE 
+
+
+@app.route('/history')
+@login_required
+def history():
+    """Show all history including all Q&A processed"""
+    # Get all chat sessions
+    chat_sessions = DatabaseManager.get_user_chat_sessions(current_user.id)
+    
+    # Get all Excel tasks
+    excel_tasks = DatabaseManager.get_user_excel_tasks(current_user.id)
+    
+    # Get all documents
+    documents = DatabaseManager.get_user_documents(current_user.id)
+    
+    # Get all Q&A (from both chats and excel tasks)
+    all_qa = DatabaseManager.get_all_user_qa(current_user.id)
+    
+    # Get date range from request
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    # Filter Q&A by date if provided
+    if start_date or end_date:
+        all_qa = DatabaseManager.filter_qa_by_date(all_qa, start_date, end_date)
+    
+    return render_template('history.html',
+                         chat_sessions=chat_sessions,
+                         excel_tasks=excel_tasks,
+                         documents=documents,
+                         all_qa=all_qa)
+
+
+# ROUTES FOR PDF VIEWING AND FEEDBACK
+
+
+@app.route('/document/view/<int:doc_id>')
+@login_required
+def view_document(doc_id):
+    """View/download a document"""
+    try:
+        doc = DatabaseManager.get_document_by_id(doc_id)
+        if not doc:
+            flash('Document not found', 'danger')
+            return redirect(url_for('history'))
+        
+        # Check if user owns this document
+        user_docs = DatabaseManager.get_user_documents(current_user.id)
+        if not any(d['doc_id'] == doc_id for d in user_docs):
+            flash('Access denied', 'danger')
+            return redirect(url_for('history'))
+        
+        return send_file(
+            doc['file_path'],
+            as_attachment=False,
+            download_name=doc['filename']
+        )
+    except Exception as e:
+        print(f"Error viewing document: {e}")
+        flash('Error opening document', 'danger')
+        return redirect(url_for('history'))
+
+@app.route('/chat/message/<int:message_id>/feedback', methods=['POST'])
+@login_required
+def chat_message_feedback(message_id):
+    """Handle feedback for chat message"""
+    try:
+        data = request.get_json()
+        is_correct = data.get('is_correct', False)
+        edited_content = data.get('edited_content')
+        
+        success = DatabaseManager.update_chat_message_feedback(
+            message_id, 
+            is_correct, 
+            edited_content
+        )
+        
+        return jsonify({
+            'success': success,
+            'message': 'Feedback saved' if success else 'Failed to save feedback'
+        })
+    
+    except Exception as e:
+        print(f"Error saving feedback: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/task/answer/<int:answer_id>/feedback', methods=['POST'])
+@login_required
+def task_answer_feedback(answer_id):
+    """Handle feedback for task answer"""
+    try:
+        data = request.get_json()
+        is_correct = data.get('is_correct', False)
+        edited_answer = data.get('edited_answer')
+        
+        success = DatabaseManager.update_task_answer_feedback(
+            answer_id, 
+            is_correct, 
+            edited_answer
+        )
+        
+        return jsonify({
+            'success': success,
+            'message': 'Feedback saved' if success else 'Failed to save feedback'
+        })
+    
+    except Exception as e:
+        print(f"Error saving feedback: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+
+# ERROR HANDLERS
+
+@app.errorhandler(404)
+def not_found_error(error):
+    return render_template('404.html'), 404
+
+@app.errorhandler(500)
+def internal_error(error):
+    return render_template('500.html'), 500
+
+
+# MAIN
+
+
+if __name__ == '__main__':
+    from database.db_setup import initialize_database
+    print("Initializing database...")
+    initialize_database()
+    print("Database initialized!")
+    
+    print("\n" + "="*60)
+    print("MediQuery AI - Document-Based Q&A System")
+    print("="*60)
+    print("\nStarting server...")
+    print("Access the application at: http://127.0.0.1:5000")
+  
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Compare fixed character-window chunking with boundary-aware chunking
+
+Usage:
+    python benchmarks/chunking.py [file.pdf ...]
+
+Without arguments a synthetic clinical-style text is used.
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config
+from utils.chunker import TextChunker
+from utils.file_processor import FileProcessor
+
+WORDS = (
+    "patient dosage daily contraindication renal hepatic metformin insulin guideline therapy "
+    "monitor adverse reaction clearance creatinine hypoglycaemia titrate discontinue baseline"
+).split()
+
+def synthetic_pages(pages=200, seed=7):
+    """Pages of sentences and paragraphs resembling extracted guideline text"""
+    rng = random.Random(seed)
+    text_by_page = {}
+    for page_num in range(1, pages + 1):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = []
+            for _ in range(rng.randint(2, 7)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(6, 24))]
+                words[0] = words[0].capitalize()
+                if rng.random() < 0.2:
+                    words.insert(rng.randint(1, len(words) - 1), f"{rng.randint(1, 1000)} mg")
+                sentences.append(' '.join(words) + '.')
+            paragraphs.append(' '.join(sentences))
+        text_by_page[page_num] = '\n\n'.join(paragraphs)
+    return text_by_page
+
+def cut_words(chunks):
+    """Chunks that start or end in the middle of a word"""
+    count = 0
+    for chunk in chunks:
+        if re.match(r'^[a-z]', chunk) or re.search(r'[A-Za-z]$', chunk):
+            count += 1
+    return count
+
+def run(name, chunk_fn, text_by_page, total_chars, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [chunk for text in text_by_page.values() for chunk in chunk_fn(text)]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    avg_len = sum(len(c) for c in chunks) / len(chunks) if chunks else 0
+    print(f"{name:<12} chunks={len(chunks):<7} avg_chars={avg_len:<7.0f} "
+          f"cut_words={cut_words(chunks):<6} {total_chars / best / 1e6:.2f} MB/s")
+    return chunks
+
+def main():
+    if len(sys.argv) > 1:
+        text_by_page = {}
+        for path in sys.argv[1:]:
+            pages, _ = FileProcessor.process_pdf(path)
+            offset = len(text_by_page)
+            text_by_page.update({offset + n: t for n, t in pages.items()})
+    else:
+        text_by_page = synthetic_pages()
+    
+    total_chars = sum(len(t) for t in text_by_page.values())
+    print(f"{len(text_by_page)} pages, {total_chars / 1e6:.2f} MB of text, "
+          f"chunk_size={Config.CHUNK_SIZE}, overlap={Config.CHUNK_OVERLAP}, max_tokens={Config.CHUNK_MAX_TOKENS}")
+    
+    chunker = TextChunker()
+    run('fixed', lambda t: FileProcessor.chunk_text_fixed(t, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP),
+        text_by_page, total_chars)
+    run('sentence', chunker.chunk, text_by_page, total_chars)
+    # Same character size as the fixed windows, to isolate the effect of boundaries
+    run('sentence@cs', TextChunker(max_chars=Config.CHUNK_SIZE).chunk, text_by_page, total_chars)
+    
+    # Linear-time check: throughput should not drop as a single text grows
+    for pages in (50, 200, 800):
+        text = '\n\n'.join(synthetic_pages(pages).values())
+        start = time.perf_counter()
+        chunker.chunk(text)
+        elapsed = time.perf_counter() - start
+        print(f"single text of {len(text) / 1e6:.2f} MB: {len(text) / elapsed / 1e6:.2f} MB/s")
+
+if __name__ == '__main__':
+    main()
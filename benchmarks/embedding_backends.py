@@ -0,0 +1,67 @@
+"""Check ONNX backend parity with PyTorch and compare CPU throughput
+
+Usage:
+    python benchmarks/embedding_backends.py [chunks] [threads]
+
+Parity: cosine similarity of each ONNX vector to the PyTorch vector for the same
+chunk, and how many of PyTorch's top-5 neighbours each backend retrieves for the
+first 100 chunks used as queries. Exits with status 1 when a backend falls below
+the thresholds below, so it can gate a model or runtime upgrade.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.chunking import synthetic_pages
+from config import Config
+from utils.file_processor import FileProcessor
+from utils.onnx_embedder import OnnxEmbedder
+
+# Minimum per-chunk cosine similarity to the PyTorch vectors
+MIN_COSINE = {'onnx': 0.999, 'onnx-int8': 0.95}
+MIN_TOP5_OVERLAP = {'onnx': 0.98, 'onnx-int8': 0.85}
+
+def encode(model, texts):
+    model.encode(texts[:8], batch_size=8, normalize_embeddings=True)  # warm up
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=Config.EMBEDDING_BATCH_SIZE,
+                           normalize_embeddings=Config.EMBEDDING_NORMALIZE, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+def top5(vectors, queries):
+    return [set(np.argsort(-row)[1:6]) for row in vectors[queries] @ vectors.T]
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else Config.EMBEDDING_THREADS
+    texts = [chunk for text in synthetic_pages(400).values() for chunk in FileProcessor.chunk_text(text)][:limit]
+    print(f"{len(texts)} chunks, model={Config.EMBEDDING_MODEL}, threads={threads or 'default'}")
+    
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    reference, seconds = encode(SentenceTransformer(Config.EMBEDDING_MODEL, device='cpu'), texts)
+    print(f"  {'torch':<10} {len(texts) / seconds:8.1f} chunks/sec")
+    
+    queries = list(range(min(100, len(texts))))
+    expected = top5(reference, queries)
+    passed = True
+    for name, quantize in (('onnx', False), ('onnx-int8', True)):
+        vectors, seconds = encode(OnnxEmbedder(Config.EMBEDDING_MODEL, quantize=quantize, threads=threads), texts)
+        cosine = np.sum(vectors * reference, axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))
+        overlap = np.mean([len(a & b) / 5 for a, b in zip(top5(vectors, queries), expected)])
+        ok = cosine.min() >= MIN_COSINE[name] and overlap >= MIN_TOP5_OVERLAP[name]
+        passed &= ok
+        print(f"  {name:<10} {len(texts) / seconds:8.1f} chunks/sec  cosine mean={cosine.mean():.4f} "
+              f"min={cosine.min():.4f}  top-5 overlap={overlap:.3f}  {'ok' if ok else 'PARITY FAILED'}")
+    
+    sys.exit(0 if passed else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compare Chroma's default embedding function with the app's SentenceTransformer path
+
+Usage:
+    python benchmarks/embeddings.py [chunks]
+
+Each variant runs in a fresh process so peak memory (RSS) is not shared:
+  chroma-default   Chroma's built-in ONNX model only
+  before           SentenceTransformer loaded but unused, Chroma's default model embeds
+  model@N          SentenceTransformer encoding with batch size N (the app's path)
+"""
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.chunking import synthetic_pages
+from config import Config
+from utils.file_processor import FileProcessor
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 if sys.platform != 'darwin' else peak / 1024 / 1024
+
+def run_variant(variant, texts, results):
+    from chromadb.utils import embedding_functions
+    from sentence_transformers import SentenceTransformer
+    
+    if variant in ('chroma-default', 'before'):
+        if variant == 'before':
+            SentenceTransformer(Config.EMBEDDING_MODEL)
+        embed = embedding_functions.DefaultEmbeddingFunction()
+        embed(texts[:1])  # load the model before timing
+        start = time.perf_counter()
+        # Chroma embeds whatever one add() call passes, i.e. one ingestion batch
+        for i in range(0, len(texts), Config.INGEST_BATCH_SIZE):
+            embed(texts[i:i + Config.INGEST_BATCH_SIZE])
+    else:
+        batch_size = int(variant.split('@')[1])
+        model = SentenceTransformer(Config.EMBEDDING_MODEL)
+        model.encode(texts[:1])
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=Config.EMBEDDING_NORMALIZE,
+                     show_progress_bar=False)
+    
+    elapsed = time.perf_counter() - start
+    results.put((variant, len(texts) / elapsed, peak_rss_mb()))
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    texts = [chunk for text in synthetic_pages(400).values() for chunk in FileProcessor.chunk_text(text)][:limit]
+    print(f"{len(texts)} chunks, model={Config.EMBEDDING_MODEL}")
+    
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    variants = ['chroma-default', 'before', 'model@16', 'model@32', 'model@64', 'model@128']
+    for variant in variants:
+        process = context.Process(target=run_variant, args=(variant, texts, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{variant:<15} failed (exit code {process.exitcode})")
+            continue
+        name, per_sec, rss = results.get()
+        memory = f"{rss:.0f} MB" if rss is not None else 'n/a'
+        print(f"{name:<15} {per_sec:8.1f} chunks/sec  peak RSS {memory}")
+
+if __name__ == '__main__':
+    main()
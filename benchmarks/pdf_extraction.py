@@ -0,0 +1,77 @@
+"""Compare PDF extraction engines: pages/sec and text fidelity
+
+Usage:
+    python benchmarks/pdf_extraction.py file.pdf [file.pdf ...]
+
+Fidelity is the F1 score of words and adjacent word pairs (so reading order counts)
+against a reference text: file.txt next to file.pdf when present (pages separated
+by form feeds), otherwise pdfplumber's output.
+Runs serially in this process so engines are compared on equal terms.
+"""
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.file_processor import FileProcessor, _EXTRACTORS
+
+def terms(text):
+    words = text.lower().split()
+    return Counter(words) + Counter(zip(words, words[1:]))
+
+def word_f1(text, reference):
+    """F1 of the words and word pairs in text against reference"""
+    words = terms(text)
+    expected = terms(reference)
+    if not words or not expected:
+        return 1.0 if words == expected else 0.0
+    overlap = sum((words & expected).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(words.values())
+    recall = overlap / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+def load_reference(path, total_pages, extracted):
+    reference_path = Path(path).with_suffix('.txt')
+    if reference_path.exists():
+        pages = reference_path.read_text(encoding='utf-8').split('\f')
+        return {n + 1: pages[n] for n in range(min(total_pages, len(pages)))}, reference_path.name
+    return extracted['pdfplumber'][0], 'pdfplumber'
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    
+    totals = {mode: {'pages': 0, 'seconds': 0.0, 'f1': 0.0, 'escalated': 0} for mode in _EXTRACTORS}
+    for path in sys.argv[1:]:
+        total_pages = FileProcessor.count_pdf_pages(path)
+        extracted = {}
+        for mode, extract in _EXTRACTORS.items():
+            start = time.perf_counter()
+            text_by_page, _, escalated = extract(path, 0, total_pages)
+            extracted[mode] = (text_by_page, time.perf_counter() - start, escalated)
+        
+        reference, reference_name = load_reference(path, total_pages, extracted)
+        print(f"{Path(path).name}: {total_pages} pages, reference={reference_name}")
+        for mode, (text_by_page, seconds, escalated) in extracted.items():
+            f1 = sum(word_f1(text_by_page.get(n, ''), reference.get(n, ''))
+                     for n in range(1, total_pages + 1)) / max(total_pages, 1)
+            print(f"  {mode:<11} {total_pages / seconds:8.1f} pages/sec  fidelity={f1:.3f}"
+                  + (f"  ({escalated} page(s) via pdfplumber)" if mode == 'adaptive' else ''))
+            totals[mode]['pages'] += total_pages
+            totals[mode]['seconds'] += seconds
+            totals[mode]['f1'] += f1 * total_pages
+            totals[mode]['escalated'] += escalated
+    
+    print("Overall:")
+    for mode, total in totals.items():
+        pages = max(total['pages'], 1)
+        print(f"  {mode:<11} {total['pages'] / total['seconds']:8.1f} pages/sec  fidelity={total['f1'] / pages:.3f}"
+              + (f"  ({total['escalated']}/{total['pages']} pages via pdfplumber)" if mode == 'adaptive' else ''))
+
+if __name__ == '__main__':
+    main()
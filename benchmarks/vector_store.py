@@ -0,0 +1,94 @@
+"""Compare ChromaDB (hnsw:space cosine) with the quantized vector store
+
+Usage:
+    python benchmarks/vector_store.py [vectors] [queries]
+
+Vectors are synthetic, clustered and normalized, with the embedding model's 384
+dimensions. Recall@k is measured against an exact float32 search; latency is per
+single-query call; disk is the size of each store's directory after loading.
+"""
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.vector_store import QuantizedCollection
+
+DIMENSION = 384
+K = 5
+BATCH = 1000
+
+def synthetic_vectors(count, queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 200, 1), DIMENSION))
+    vectors = centers[rng.integers(len(centers), size=count)] + 0.6 * rng.normal(size=(count, DIMENSION))
+    picks = vectors[rng.integers(count, size=queries)] + 0.4 * rng.normal(size=(queries, DIMENSION))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks /= np.linalg.norm(picks, axis=1, keepdims=True)
+    return vectors.astype(np.float32), picks.astype(np.float32)
+
+def directory_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+def open_chroma(directory):
+    import chromadb
+    client = chromadb.PersistentClient(path=directory)
+    return client.get_or_create_collection(name='benchmark', metadata={"hnsw:space": "cosine"})
+
+def run(name, collection, directory, vectors, queries, truth):
+    ids = [f"chunk{i}" for i in range(len(vectors))]
+    start = time.perf_counter()
+    for i in range(0, len(vectors), BATCH):
+        collection.upsert(
+            ids=ids[i:i + BATCH],
+            embeddings=vectors[i:i + BATCH].tolist(),
+            documents=[f"text {n}" for n in range(i, min(i + BATCH, len(vectors)))],
+            metadatas=[{'doc_id': str(n % 10)} for n in range(i, min(i + BATCH, len(vectors)))]
+        )
+    load_seconds = time.perf_counter() - start
+    
+    hits = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=K)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(result['ids'][0]) & expected)
+    
+    print(f"  {name:<9} recall@{K}={hits / (K * len(queries)):.3f}  "
+          f"p50={np.median(latencies) * 1000:6.2f} ms  p95={np.percentile(latencies, 95) * 1000:6.2f} ms  "
+          f"disk={directory_bytes(directory) / 1024 / 1024:7.1f} MB  load={load_seconds:.1f}s")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    vectors, queries = synthetic_vectors(count, query_count)
+    
+    # Exact top-k by cosine similarity
+    scores = queries @ vectors.T
+    truth = [{f"chunk{i}" for i in np.argsort(-row)[:K]} for row in scores]
+    print(f"{count} vectors x {DIMENSION} dims, {query_count} queries "
+          f"(raw float32 size {vectors.nbytes / 1024 / 1024:.1f} MB)")
+    
+    for name in ('chroma', 'int8', 'float16'):
+        directory = tempfile.mkdtemp(prefix=f"vector-bench-{name}-")
+        try:
+            if name == 'chroma':
+                try:
+                    collection = open_chroma(directory)
+                except ImportError:
+                    print(f"  {name:<9} skipped (chromadb not installed)")
+                    continue
+            else:
+                collection = QuantizedCollection('benchmark', name, store_dir=directory)
+            run(name, collection, directory, vectors, queries, truth)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
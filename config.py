@@ -1,34 +1,97 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-class Config:
-    # Flask settings
-    SECRET_KEY = "OP123"
-    
-    # SQL Server settings
-    DB_SERVER = 'localhost\SQLEXPRESS'
-    DB_NAME = 'miniproj'
-    DB_DRIVER = '{ODBC Driver 17 for SQL Server}'
-    
-    # Connection string for Windows Authentication
-    CONNECTION_STRING = f'DRIVER={DB_DRIVER};SERVER={DB_SERVER};DATABASE={DB_NAME};Trusted_Connection=yes;'
-    
-    # File upload settings
-    UPLOAD_FOLDER = 'uploads'
-    ALLOWED_EXTENSIONS = {'pdf', 'xlsx', 'xls'}
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    
-    # Ollama settings
-    OLLAMA_MODEL = 'phi3:mini'
-    OLLAMA_BASE_URL = 'http://localhost:11434'
-    
-    # ChromaDB settings
-    CHROMA_PERSIST_DIR = 'chroma_db'
-    
-    # Embedding settings
-    EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
-    CHUNK_SIZE = 500
-    CHUNK_OVERLAP = 50
-
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class Config:
+    # Flask settings
+    SECRET_KEY = "OP123"
+    
+    # SQL Server settings
+    DB_SERVER = 'localhost\SQLEXPRESS'
+    DB_NAME = 'miniproj'
+    DB_DRIVER = '{ODBC Driver 17 for SQL Server}'
+    
+    # Connection string for Windows Authentication
+    CONNECTION_STRING = f'DRIVER={DB_DRIVER};SERVER={DB_SERVER};DATABASE={DB_NAME};Trusted_Connection=yes;'
+    
+    # File upload settings
+    UPLOAD_FOLDER = 'uploads'
+    ALLOWED_EXTENSIONS = {'pdf', 'xlsx', 'xls', 'csv'}
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_WORKERS = 8  # uploaded files saved and hashed (and Excel Q&A PDFs ingested) concurrently
+    
+    # PDF extraction settings
+    PDF_EXTRACT_WORKERS = max(1, (os.cpu_count() or 1) - 1)  # 1 = serial extraction
+    PDF_PAGES_PER_TASK = 25  # pages handed to a worker process at a time
+    PDF_PARALLEL_MIN_PAGES = 50  # smaller PDFs are extracted serially
+    PDF_EXTRACT_MODE = 'adaptive'  # 'adaptive' (PyPDF2, pdfplumber for tables/columns/poor text), 'pdfplumber' or 'pypdf2'
+    
+    # OCR settings (pages with no text layer, e.g. scanned documents)
+    OCR_ENABLED = True
+    OCR_WORKERS = max(1, (os.cpu_count() or 1) - 1)  # 1 = OCR pages in the extracting process
+    OCR_RESOLUTION = 300  # DPI pages are rendered at for tesseract
+    OCR_LANGUAGE = 'eng'
+    OCR_CACHE_DIR = 'ocr_cache'  # OCR text cached by page-image hash
+    
+    # Ollama settings
+    OLLAMA_MODEL = 'phi3:mini'
+    OLLAMA_BASE_URL = 'http://localhost:11434'
+    LLM_CONTEXT_WINDOW = 4096  # num_ctx: phi3:mini's context window in tokens
+    LLM_ANSWER_TOKENS = 512  # num_predict: reserved in the window for the answer
+    LLM_TOKENIZER = 'microsoft/Phi-3-mini-4k-instruct'  # Hugging Face tokenizer matching OLLAMA_MODEL, None = estimate counts
+    ANSWER_CACHE_ENABLED = True  # reuse answers for paraphrased questions over the same documents
+    ANSWER_CACHE_SIMILARITY = 0.95  # minimum cosine similarity between questions for a cache hit
+    ANSWER_CACHE_MAX_ENTRIES = 5000
+    EXACT_CACHE_ENABLED = True  # persist answers by question + retrieved chunks + prompt version + model
+    EXACT_CACHE_DIR = 'answer_cache'
+    
+    # ChromaDB settings
+    CHROMA_PERSIST_DIR = 'chroma_db'
+    VECTOR_STORE_MODE = 'shared'  # 'shared': each document embedded once, sessions/tasks filter by doc_id; 'collection': one collection per session/task
+    SHARED_INDEX_SCOPE = 'user'  # shared index per 'user' or one 'global' index
+    VECTOR_QUANTIZATION = None  # 'int8' or 'float16': store chunks in the compact vector store instead of ChromaDB
+    VECTOR_STORE_DIR = 'vector_store'  # compact vector store location
+    VECTOR_RESCORE_FACTOR = 4  # candidates per requested result rescored with full-precision vectors
+    
+    # Embedding settings
+    EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+    EMBEDDING_BATCH_SIZE = 64  # texts per model forward pass
+    EMBEDDING_NORMALIZE = True  # unit-length vectors, matching the collections' cosine space
+    EMBEDDING_THREADS = 0  # CPU threads for encoding, 0 = backend default (all cores for ONNX)
+    EMBEDDING_BACKEND = 'torch'  # 'torch' (SentenceTransformer) or 'onnx' (exported model on ONNX Runtime)
+    EMBEDDING_ONNX_QUANTIZE = True  # ONNX backend: run the int8-quantized export
+    ONNX_MODEL_DIR = 'onnx_models'  # exported ONNX models
+    EMBEDDING_CACHE_ENABLED = True  # reuse chunk vectors across collections
+    EMBEDDING_CACHE_DIR = 'embedding_cache'
+    EMBEDDING_CACHE_MAX_ENTRIES = 100000  # ~150MB of vectors for a 384-dimension model
+    QUERY_CACHE_MAX_ENTRIES = 2048  # query embeddings kept in memory
+    QUERY_CACHE_TTL_SECONDS = 3600
+    HYBRID_SEARCH = True  # keep a BM25 index per collection and fuse it with vector search
+    HYBRID_CANDIDATES = 20  # hits taken from each of vector and BM25 search before fusion
+    HYBRID_LEXICAL_WEIGHT = 1.0  # BM25's weight in reciprocal rank fusion (vector search = 1.0)
+    HYBRID_RRF_K = 60  # reciprocal rank fusion constant
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    BM25_INDEX_DIR = 'bm25_index'
+    CONTEXT_CANDIDATES = 8  # chunks retrieved per question before context selection
+    CONTEXT_MAX_TOKENS = 1024  # LLM tokens of context per prompt (evaluation time grows with it); capped by LLM_CONTEXT_WINDOW - LLM_ANSWER_TOKENS
+    CONTEXT_MMR_LAMBDA = 0.7  # relevance vs. novelty trade-off in maximal marginal relevance
+    CONTEXT_DUPLICATE_SIMILARITY = 0.95  # cosine similarity above which chunks count as duplicates
+    EXCEL_QA_WORKERS = 4  # Excel questions answered concurrently; match the Ollama server's OLLAMA_NUM_PARALLEL
+    EXCEL_QA_MAX_ATTEMPTS = 3  # generation attempts per question before saving an error answer
+    EXCEL_QA_RETRY_BACKOFF_SECONDS = 1.0  # doubled after each failed attempt
+    RETRIEVAL_BATCH_SIZE = 256  # questions encoded and queried per call in Excel Q&A
+    CHUNK_SIZE = 500  # characters per chunk for the 'fixed' strategy
+    CHUNK_OVERLAP = 50
+    CHUNK_STRATEGY = 'sentence'  # 'sentence' (boundary-aware) or 'fixed' (character windows)
+    CHUNK_MAX_TOKENS = 256  # 'sentence' chunks fill, but never exceed, all-MiniLM-L6-v2's 256 word pieces
+    
+    # Ingestion pipeline settings
+    INGEST_BATCH_SIZE = 64  # chunks embedded and inserted per batch
+    INGEST_QUEUE_BATCHES = 4  # batches buffered between extraction and embedding
+    INGEST_WORKERS = 4  # documents ingested concurrently in the background
+    INGEST_JOB_STALE_SECONDS = 300  # running jobs of other processes with no heartbeat for this long are requeued
+    INGEST_JOB_SWEEP_SECONDS = 60  # how often stale jobs are looked for
+    INGEST_JOB_HEARTBEAT_SECONDS = 30  # running jobs refresh updated_at this often, even mid-extraction
+
@@ -1,836 +1,1521 @@
-import pyodbc
-from werkzeug.security import generate_password_hash, check_password_hash
-from config import Config
-import hashlib
-from datetime import datetime
-
-class User:
-    def __init__(self, user_id, username, email, password_hash):
-        self.id = user_id
-        self.username = username
-        self.email = email
-        self.password_hash = password_hash
-        self.is_authenticated = True
-        self.is_active = True
-        self.is_anonymous = False
-    
-    def get_id(self):
-        return str(self.id)
-    
-    @staticmethod
-    def create_user(username, email, password):
-        """Create a new user"""
-        try:
-            conn = pyodbc.connect(Config.CONNECTION_STRING)
-            cursor = conn.cursor()
-            
-            password_hash = generate_password_hash(password)
-            
-            cursor.execute("""
-                INSERT INTO Users (username, email, password_hash)
-                VALUES (?, ?, ?)
-            """, (username, email, password_hash))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error creating user: {e}")
-            return False
-    
-    @staticmethod
-    def get_by_username(username):
-        """Get user by username"""
-        try:
-            conn = pyodbc.connect(Config.CONNECTION_STRING)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT user_id, username, email, password_hash
-                FROM Users
-                WHERE username = ?
-            """, (username,))
-            
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if row:
-                return User(row[0], row[1], row[2], row[3])
-            return None
-        except Exception as e:
-            print(f"Error getting user: {e}")
-            return None
-    
-    @staticmethod
-    def get_by_id(user_id):
-        """Get user by ID"""
-        try:
-            conn = pyodbc.connect(Config.CONNECTION_STRING)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT user_id, username, email, password_hash
-                FROM Users
-                WHERE user_id = ?
-            """, (user_id,))
-            
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if row:
-                return User(row[0], row[1], row[2], row[3])
-            return None
-        except Exception as e:
-            print(f"Error getting user: {e}")
-            return None
-    
-    def check_password(self, password):
-        """Check if password is correct"""
-        return check_password_hash(self.password_hash, password)
-
-class DatabaseManager:
-    """Helper class for database operations"""
-    
-    @staticmethod
-    def get_connection():
-        return pyodbc.connect(Config.CONNECTION_STRING)
-    
-    @staticmethod
-    def calculate_file_hash(file_path):
-        """Calculate MD5 hash of file"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    
-    @staticmethod
-    def save_document(user_id, filename, file_type, file_path, total_pages=None):
-        """Save document metadata"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            file_hash = DatabaseManager.calculate_file_hash(file_path)
-            
-            cursor.execute("""
-                INSERT INTO Documents (user_id, filename, file_type, file_path, total_pages, file_hash)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (user_id, filename, file_type, file_path, total_pages, file_hash))
-            
-            cursor.execute("SELECT @@IDENTITY")
-            doc_id = cursor.fetchone()[0]
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return doc_id
-        except Exception as e:
-            print(f"Error saving document: {e}")
-            return None
-    
-    @staticmethod
-    def get_user_documents(user_id):
-        """Get all documents for a user"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT doc_id, filename, file_type, file_path, upload_date, total_pages, status
-                FROM Documents
-                WHERE user_id = ?
-                ORDER BY upload_date DESC
-            """, (user_id,))
-            
-            documents = []
-            for row in cursor.fetchall():
-                documents.append({
-                    'doc_id': row[0],
-                    'filename': row[1],
-                    'file_type': row[2],
-                    'file_path': row[3],
-                    'upload_date': row[4],
-                    'total_pages': row[5],
-                    'status': row[6]
-                })
-            
-            cursor.close()
-            conn.close()
-            return documents
-        except Exception as e:
-            print(f"Error getting documents: {e}")
-            return []
-    
-    # Chat Session Methods
-    @staticmethod
-    def create_chat_session(user_id, session_name='New Chat'):
-        """Create a new chat session"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO ChatSessions (user_id, session_name)
-                VALUES (?, ?)
-            """, (user_id, session_name))
-            
-            cursor.execute("SELECT @@IDENTITY")
-            session_id = cursor.fetchone()[0]
-            
-            # Generate unique collection name
-            collection_name = f"chat_session_{session_id}"
-            
-            cursor.execute("""
-                UPDATE ChatSessions
-                SET chroma_collection_name = ?
-                WHERE session_id = ?
-            """, (collection_name, session_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return session_id, collection_name
-        except Exception as e:
-            print(f"Error creating chat session: {e}")
-            return None, None
-    
-    @staticmethod
-    def get_user_chat_sessions(user_id):
-        """Get all chat sessions for a user"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT session_id, session_name, created_at, updated_at
-                FROM ChatSessions
-                WHERE user_id = ?
-                ORDER BY updated_at DESC
-            """, (user_id,))
-            
-            sessions = []
-            for row in cursor.fetchall():
-                sessions.append({
-                    'session_id': row[0],
-                    'session_name': row[1],
-                    'created_at': row[2],
-                    'updated_at': row[3]
-                })
-            
-            cursor.close()
-            conn.close()
-            return sessions
-        except Exception as e:
-            print(f"Error getting chat sessions: {e}")
-            return []
-    
-    @staticmethod
-    def update_session_name(session_id, new_name):
-        """Update chat session name"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE ChatSessions
-                SET session_name = ?, updated_at = GETDATE()
-                WHERE session_id = ?
-            """, (new_name, session_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error updating session name: {e}")
-            return False
-    
-    @staticmethod
-    def update_session_timestamp(session_id):
-        """Update session's last updated timestamp"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE ChatSessions
-                SET updated_at = GETDATE()
-                WHERE session_id = ?
-            """, (session_id,))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error updating session timestamp: {e}")
-            return False
-    
-    @staticmethod
-    def add_document_to_session(session_id, doc_id):
-        """Add document to chat session"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            # Check if already exists
-            cursor.execute("""
-                SELECT session_doc_id FROM SessionDocuments
-                WHERE session_id = ? AND doc_id = ?
-            """, (session_id, doc_id))
-            
-            if cursor.fetchone():
-                cursor.close()
-                conn.close()
-                return True  # Already exists
-            
-            cursor.execute("""
-                INSERT INTO SessionDocuments (session_id, doc_id)
-                VALUES (?, ?)
-            """, (session_id, doc_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error adding document to session: {e}")
-            return False
-    
-    @staticmethod
-    def get_session_documents(session_id):
-        """Get all documents for a session"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT d.doc_id, d.filename, d.file_type, d.file_path, d.total_pages
-                FROM Documents d
-                INNER JOIN SessionDocuments sd ON d.doc_id = sd.doc_id
-                WHERE sd.session_id = ?
-                ORDER BY sd.uploaded_at DESC
-            """, (session_id,))
-            
-            documents = []
-            for row in cursor.fetchall():
-                documents.append({
-                    'doc_id': row[0],
-                    'filename': row[1],
-                    'file_type': row[2],
-                    'file_path': row[3],
-                    'total_pages': row[4]
-                })
-            
-            cursor.close()
-            conn.close()
-            return documents
-        except Exception as e:
-            print(f"Error getting session documents: {e}")
-            return []
-    
-    @staticmethod
-    def save_chat_message(session_id, message_type, content, confidence_score=None, source_pages=None, source_doc_names=None):
-        """Save chat message"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO ChatMessages 
-                (session_id, message_type, content, confidence_score, source_pages, source_doc_names)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                session_id,
-                message_type,
-                content,
-                confidence_score,
-                source_pages,
-                source_doc_names
-            ))
-            
-            cursor.execute("SELECT @@IDENTITY")
-            message_id = cursor.fetchone()[0]
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return message_id
-        except Exception as e:
-            print(f"Error saving chat message: {e}")
-            return None
-    
-    @staticmethod
-    def get_chat_messages(session_id):
-        """Get all messages for a session"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    message_id,
-                    message_type,
-                    content,
-                    confidence_score,
-                    source_pages,
-                    source_doc_names,
-                    created_at,
-                    is_edited,
-                    is_correct
-                FROM ChatMessages
-                WHERE session_id = ?
-                ORDER BY created_at ASC
-            """, (session_id,))
-            
-            messages = []
-            for row in cursor.fetchall():
-                messages.append({
-                    'message_id': row[0],
-                    'message_type': row[1],
-                    'content': row[2],
-                    'confidence_score': row[3],
-                    'source_pages': row[4],
-                    'source_doc_names': row[5],
-                    'created_at': row[6],
-                    'is_edited': row[7],
-                    'is_correct': row[8]
-                })
-            
-            cursor.close()
-            conn.close()
-            return messages
-        except Exception as e:
-            print(f"Error getting chat messages: {e}")
-            return []
-    
-    @staticmethod
-    def get_session_collection_name(session_id):
-        """Get ChromaDB collection name for session"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT chroma_collection_name
-                FROM ChatSessions
-                WHERE session_id = ?
-            """, (session_id,))
-            
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            return row[0] if row else None
-        except Exception as e:
-            print(f"Error getting session collection name: {e}")
-            return None
-    
-    # Excel Task Methods
-    @staticmethod
-    def create_excel_task(user_id, task_name, excel_file_id):
-        """Create new Excel task"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO ExcelTasks (user_id, task_name, excel_file_id)
-                VALUES (?, ?, ?)
-            """, (user_id, task_name, excel_file_id))
-            
-            cursor.execute("SELECT @@IDENTITY")
-            task_id = cursor.fetchone()[0]
-            
-            # Generate unique collection name
-            collection_name = f"excel_task_{task_id}"
-            
-            cursor.execute("""
-                UPDATE ExcelTasks
-                SET chroma_collection_name = ?
-                WHERE task_id = ?
-            """, (collection_name, task_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return task_id, collection_name
-        except Exception as e:
-            print(f"Error creating Excel task: {e}")
-            return None, None
-    
-    @staticmethod
-    def add_document_to_task(task_id, doc_id):
-        """Add document to Excel task"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO TaskDocuments (task_id, doc_id)
-                VALUES (?, ?)
-            """, (task_id, doc_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error adding document to task: {e}")
-            return False
-    
-    @staticmethod
-    def save_task_answer(
-        task_id,
-        question_text,
-        answer_text,
-        confidence_score,
-        source_pages,
-        source_doc_names=None
-    ):
-        """Save answer for Excel task"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO TaskAnswers 
-                (task_id, question_text, answer_text, confidence_score, source_pages, source_doc_names)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                task_id,
-                question_text,
-                answer_text,
-                confidence_score,
-                source_pages,
-                source_doc_names
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error saving task answer: {e}")
-            return False
-    
-    @staticmethod
-    def get_user_excel_tasks(user_id):
-        """Get all Excel tasks for a user"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT task_id, task_name, created_at, total_questions, status
-                FROM ExcelTasks
-                WHERE user_id = ?
-                ORDER BY created_at DESC
-            """, (user_id,))
-            
-            tasks = []
-            for row in cursor.fetchall():
-                tasks.append({
-                    'task_id': row[0],
-                    'task_name': row[1],
-                    'created_at': row[2],
-                    'total_questions': row[3],
-                    'status': row[4]
-                })
-            
-            cursor.close()
-            conn.close()
-            return tasks
-        except Exception as e:
-            print(f"Error getting Excel tasks: {e}")
-            return []
-    
-    @staticmethod
-    def get_task_answers(task_id):
-        """Get all answers for a task"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    answer_id,
-                    question_text,
-                    answer_text,
-                    confidence_score,
-                    source_pages,
-                    source_doc_names,
-                    is_correct,
-                    is_edited
-                FROM TaskAnswers
-                WHERE task_id = ?
-                ORDER BY answer_id ASC
-            """, (task_id,))
-            
-            answers = []
-            for row in cursor.fetchall():
-                answers.append({
-                    'answer_id': row[0],
-                    'question': row[1],
-                    'answer': row[2],
-                    'confidence': row[3],
-                    'source_pages': row[4],
-                    'source_doc_names': row[5],
-                    'is_correct': row[6],
-                    'is_edited': row[7]
-                })
-            
-            cursor.close()
-            conn.close()
-            return answers
-        except Exception as e:
-            print(f"Error getting task answers: {e}")
-            return []
-    
-    @staticmethod
-    def get_task_collection_name(task_id):
-        """Get ChromaDB collection name for task"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT chroma_collection_name
-                FROM ExcelTasks
-                WHERE task_id = ?
-            """, (task_id,))
-            
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            return row[0] if row else None
-        except Exception as e:
-            print(f"Error getting task collection name: {e}")
-            return None
-
-    @staticmethod
-    def update_chat_message_feedback(message_id, is_correct, edited_content=None):
-        """Update chat message feedback - Sets confidence to 100% ONLY when edited"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            if edited_content:
-                # When edited, set confidence to 100%, mark as edited and correct
-                cursor.execute("""
-                    UPDATE ChatMessages
-                    SET content = ?, is_edited = 1, is_correct = 1, confidence_score = 100
-                    WHERE message_id = ? AND message_type = 'ai'
-                """, (edited_content, message_id))
-            elif is_correct:
-                # Just marking as correct - keep original confidence score
-                cursor.execute("""
-                    UPDATE ChatMessages
-                    SET is_correct = 1
-                    WHERE message_id = ? AND message_type = 'ai'
-                """, (message_id,))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error updating message feedback: {e}")
-            return False
-    
-    @staticmethod
-    def update_task_answer_feedback(answer_id, is_correct, edited_answer=None):
-        """Update task answer feedback - Sets confidence to 100% ONLY when edited"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            if edited_answer:
-                # When edited, set confidence to 100%, mark as edited and correct
-                cursor.execute("""
-                    UPDATE TaskAnswers
-                    SET answer_text = ?, is_correct = 1, is_edited = 1, confidence_score = 100
-                    WHERE answer_id = ?
-                """, (edited_answer, answer_id))
-            else:
-                # Just marking as correct - keep original confidence score
-                cursor.execute("""
-                    UPDATE TaskAnswers
-                    SET is_correct = 1
-                    WHERE answer_id = ?
-                """, (answer_id,))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error updating answer feedback: {e}")
-            return False
-    
-    @staticmethod
-    def get_document_by_id(doc_id):
-        """Get document details by ID"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT doc_id, filename, file_type, file_path, total_pages
-                FROM Documents
-                WHERE doc_id = ?
-            """, (doc_id,))
-            
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if row:
-                return {
-                    'doc_id': row[0],
-                    'filename': row[1],
-                    'file_type': row[2],
-                    'file_path': row[3],
-                    'total_pages': row[4]
-                }
-            return None
-        except Exception as e:
-            print(f"Error getting document: {e}")
-            return None
-    
-    # NEW METHODS FOR ALL Q&A AND DATE FILTERING
-    
-    @staticmethod
-    def get_all_user_qa(user_id):
-        """Get all Q&A from both chat sessions and excel tasks"""
-        try:
-            conn = DatabaseManager.get_connection()
-            cursor = conn.cursor()
-            
-            all_qa = []
-            
-            # Get Q&A from chat sessions
-            cursor.execute("""
-                SELECT 
-                    cm2.message_id as id,
-                    'chat' as source_type,
-                    cs.session_name as source_name,
-                    cm.content as question,
-                    cm2.content as answer,
-                    cm2.confidence_score as confidence,
-                    cm2.source_pages,
-                    cm2.source_doc_names,
-                    cm2.is_edited,
-                    cm.created_at,
-                    cm2.is_correct
-                FROM ChatMessages cm
-                INNER JOIN ChatSessions cs ON cm.session_id = cs.session_id
-                LEFT JOIN ChatMessages cm2 ON cm.session_id = cm2.session_id 
-                    AND cm2.message_id = (
-                        SELECT MIN(message_id) 
-                        FROM ChatMessages 
-                        WHERE session_id = cm.session_id 
-                        AND message_type = 'ai' 
-                        AND message_id > cm.message_id
-                    )
-                WHERE cs.user_id = ? 
-                AND cm.message_type = 'user'
-                AND cm2.message_id IS NOT NULL
-            """, (user_id,))
-            
-            for row in cursor.fetchall():
-                all_qa.append({
-                    'id': row[0],
-                    'source_type': row[1],
-                    'source_name': row[2],
-                    'question': row[3],
-                    'answer': row[4],
-                    'confidence': row[5],
-                    'source_pages': row[6],
-                    'source_doc_names': row[7],
-                    'is_edited': row[8],
-                    'created_at': row[9],
-                    'is_correct': row[10]
-                })
-            
-            # Get Q&A from Excel tasks
-            cursor.execute("""
-                SELECT 
-                    ta.answer_id as id,
-                    'excel' as source_type,
-                    et.task_name as source_name,
-                    ta.question_text as question,
-                    ta.answer_text as answer,
-                    ta.confidence_score as confidence,
-                    ta.source_pages,
-                    ta.source_doc_names,
-                    ta.is_edited,
-                    ta.created_at,
-                    ta.is_correct
-                FROM TaskAnswers ta
-                INNER JOIN ExcelTasks et ON ta.task_id = et.task_id
-                WHERE et.user_id = ?
-            """, (user_id,))
-            
-            for row in cursor.fetchall():
-                all_qa.append({
-                    'id': row[0],
-                    'source_type': row[1],
-                    'source_name': row[2],
-                    'question': row[3],
-                    'answer': row[4],
-                    'confidence': row[5],
-                    'source_pages': row[6],
-                    'source_doc_names': row[7],
-                    'is_edited': row[8],
-                    'created_at': row[9],
-                    'is_correct': row[10]
-                })
-            
-            cursor.close()
-            conn.close()
-            
-            # Sort by date (most recent first)
-            all_qa.sort(key=lambda x: x['created_at'], reverse=True)
-            
-            return all_qa
-        except Exception as e:
-            print(f"Error getting all Q&A: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
-    
-    @staticmethod
-    def filter_qa_by_date(qa_list, start_date=None, end_date=None):
-        """Filter Q&A list by date range"""
-        try:
-            if not start_date and not end_date:
-                return qa_list
-            
-            filtered_qa = []
-            
-            for qa in qa_list:
-                qa_date = qa['created_at'].date() if isinstance(qa['created_at'], datetime) else qa['created_at']
-                
-                # Convert string dates to date objects if needed
-                if start_date:
-                    start = datetime.strptime(start_date, '%Y-%m-%d').date() if isinstance(start_date, str) else start_date
-                    if qa_date < start:
-                        continue
-                
-                if end_date:
-                    end = datetime.strptime(end_date, '%Y-%m-%d').date() if isinstance(end_date, str) else end_date
-                    if qa_date > end:
-                        continue
-                
-                filtered_qa.append(qa)
-            
-            return filtered_qa
-        except Exception as e:
-            print(f"Error filtering Q&A by date: {e}")
+import pyodbc
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+import hashlib
+from datetime import datetime
+
+class User:
+    def __init__(self, user_id, username, email, password_hash):
+        self.id = user_id
+        self.username = username
+        self.email = email
+        self.password_hash = password_hash
+        self.is_authenticated = True
+        self.is_active = True
+        self.is_anonymous = False
+    
+    def get_id(self):
+        return str(self.id)
+    
+    @staticmethod
+    def create_user(username, email, password):
+        """Create a new user"""
+        try:
+            conn = pyodbc.connect(Config.CONNECTION_STRING)
+            cursor = conn.cursor()
+            
+            password_hash = generate_password_hash(password)
+            
+            cursor.execute("""
+                INSERT INTO Users (username, email, password_hash)
+                VALUES (?, ?, ?)
+            """, (username, email, password_hash))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            return False
+    
+    @staticmethod
+    def get_by_username(username):
+        """Get user by username"""
+        try:
+            conn = pyodbc.connect(Config.CONNECTION_STRING)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, username, email, password_hash
+                FROM Users
+                WHERE username = ?
+            """, (username,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            if row:
+                return User(row[0], row[1], row[2], row[3])
+            return None
+        except Exception as e:
+            print(f"Error getting user: {e}")
+            return None
+    
+    @staticmethod
+    def get_by_id(user_id):
+        """Get user by ID"""
+        try:
+            conn = pyodbc.connect(Config.CONNECTION_STRING)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, username, email, password_hash
+                FROM Users
+                WHERE user_id = ?
+            """, (user_id,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            if row:
+                return User(row[0], row[1], row[2], row[3])
+            return None
+        except Exception as e:
+            print(f"Error getting user: {e}")
+            return None
+    
+    def check_password(self, password):
+        """Check if password is correct"""
+        return check_password_hash(self.password_hash, password)
+
+class DatabaseManager:
+    """Helper class for database operations"""
+    
+    @staticmethod
+    def get_connection():
+        return pyodbc.connect(Config.CONNECTION_STRING)
+    
+    @staticmethod
+    def calculate_file_hash(file_path):
+        """Calculate MD5 hash of file"""
+        hash_md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(4096), b""):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+    
+    @staticmethod
+    def save_document(user_id, filename, file_type, file_path, total_pages=None, file_hash=None):
+        """Save document metadata"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            if file_hash is None:
+                file_hash = DatabaseManager.calculate_file_hash(file_path)
+            
+            cursor.execute("""
+                INSERT INTO Documents (user_id, filename, file_type, file_path, total_pages, file_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, filename, file_type, file_path, total_pages, file_hash))
+            
+            cursor.execute("SELECT @@IDENTITY")
+            doc_id = cursor.fetchone()[0]
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return doc_id
+        except Exception as e:
+            print(f"Error saving document: {e}")
+            return None
+    
+    @staticmethod
+    def save_documents(user_id, documents):
+        """Save metadata for several documents in one transaction
+        
+        documents are dicts with filename, file_type, file_path and file_hash.
+        Returns the new doc_ids in the same order, or None on failure.
+        """
+        try:
+            if not documents:
+                return []
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            doc_ids = []
+            for document in documents:
+                cursor.execute("""
+                    INSERT INTO Documents (user_id, filename, file_type, file_path, total_pages, file_hash)
+                    OUTPUT INSERTED.doc_id
+                    VALUES (?, ?, ?, ?, NULL, ?)
+                """, (user_id, document['filename'], document['file_type'],
+                      document['file_path'], document['file_hash']))
+                doc_ids.append(cursor.fetchone()[0])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return doc_ids
+        except Exception as e:
+            print(f"Error saving documents: {e}")
+            return None
+    
+    @staticmethod
+    def update_document_pages(doc_id, total_pages):
+        """Update page count once a document has been extracted"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE Documents
+                SET total_pages = ?
+                WHERE doc_id = ?
+            """, (total_pages, doc_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating document pages: {e}")
+            return False
+    
+    @staticmethod
+    def get_user_documents(user_id):
+        """Get all documents for a user"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT doc_id, filename, file_type, file_path, upload_date, total_pages, status, file_hash
+                FROM Documents
+                WHERE user_id = ?
+                ORDER BY upload_date DESC
+            """, (user_id,))
+            
+            documents = []
+            for row in cursor.fetchall():
+                documents.append({
+                    'doc_id': row[0],
+                    'filename': row[1],
+                    'file_type': row[2],
+                    'file_path': row[3],
+                    'upload_date': row[4],
+                    'total_pages': row[5],
+                    'status': row[6],
+                    'file_hash': row[7]
+                })
+            
+            cursor.close()
+            conn.close()
+            return documents
+        except Exception as e:
+            print(f"Error getting documents: {e}")
+            return []
+    
+    # Extracted Text Cache Methods
+    @staticmethod
+    def get_cached_page_count(file_hash):
+        """Get page count of a fully extracted file hash, or None if it was never extracted"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT total_pages FROM ExtractedDocuments
+                WHERE file_hash = ?
+            """, (file_hash,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error getting cached page count: {e}")
+            return None
+    
+    @staticmethod
+    def iter_cached_pages(file_hash, fetch_size=100):
+        """Yield cached (page_num, page_text) rows in page order"""
+        conn = DatabaseManager.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT page_num, page_text
+                FROM ExtractedPages
+                WHERE file_hash = ?
+                ORDER BY page_num ASC
+            """, (file_hash,))
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for page_num, page_text in rows:
+                    yield page_num, page_text
+        finally:
+            cursor.close()
+            conn.close()
+    
+    @staticmethod
+    def clear_cached_pages(file_hash):
+        """Remove cached page text (including partial writes) for a file hash"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM ExtractedDocuments WHERE file_hash = ?", (file_hash,))
+            cursor.execute("DELETE FROM ExtractedPages WHERE file_hash = ?", (file_hash,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error clearing cached pages: {e}")
+            return False
+    
+    @staticmethod
+    def append_cached_pages(file_hash, pages):
+        """Append a batch of (page_num, page_text) rows for a file hash"""
+        try:
+            if not pages:
+                return True
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            cursor.executemany("""
+                INSERT INTO ExtractedPages (file_hash, page_num, page_text)
+                VALUES (?, ?, ?)
+            """, [(file_hash, page_num, page_text) for page_num, page_text in pages])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving cached pages: {e}")
+            return False
+    
+    @staticmethod
+    def mark_pages_cached(file_hash, total_pages):
+        """Mark page text of a file hash as complete"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO ExtractedDocuments (file_hash, total_pages)
+                VALUES (?, ?)
+            """, (file_hash, total_pages))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error marking pages cached: {e}")
+            return False
+    
+    @staticmethod
+    def get_cached_chunk_count(file_hash, chunk_params):
+        """Get chunk count of a fully chunked file hash, or None if not cached"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT total_chunks FROM ExtractedChunkSets
+                WHERE file_hash = ? AND chunk_params = ?
+            """, (file_hash, chunk_params))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error getting cached chunk count: {e}")
+            return None
+    
+    @staticmethod
+    def iter_cached_chunks(file_hash, chunk_params, fetch_size=500):
+        """Yield cached (page_num, chunk_text) rows in page and chunk order"""
+        conn = DatabaseManager.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT page_num, chunk_text
+                FROM ExtractedChunks
+                WHERE file_hash = ? AND chunk_params = ?
+                ORDER BY page_num ASC, chunk_index ASC
+            """, (file_hash, chunk_params))
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for page_num, chunk_text in rows:
+                    yield page_num, chunk_text
+        finally:
+            cursor.close()
+            conn.close()
+    
+    @staticmethod
+    def clear_cached_chunks(file_hash, chunk_params):
+        """Remove cached chunks (including partial writes) for a file hash and chunking parameters"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                DELETE FROM ExtractedChunkSets
+                WHERE file_hash = ? AND chunk_params = ?
+            """, (file_hash, chunk_params))
+            cursor.execute("""
+                DELETE FROM ExtractedChunks
+                WHERE file_hash = ? AND chunk_params = ?
+            """, (file_hash, chunk_params))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error clearing cached chunks: {e}")
+            return False
+    
+    @staticmethod
+    def append_cached_chunks(file_hash, chunk_params, chunks):
+        """Append a batch of (page_num, chunk_index, chunk_text) rows"""
+        try:
+            if not chunks:
+                return True
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            cursor.executemany("""
+                INSERT INTO ExtractedChunks (file_hash, chunk_params, page_num, chunk_index, chunk_text)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (file_hash, chunk_params, page_num, chunk_index, chunk_text)
+                for page_num, chunk_index, chunk_text in chunks
+            ])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving cached chunks: {e}")
+            return False
+    
+    @staticmethod
+    def mark_chunks_cached(file_hash, chunk_params, total_chunks):
+        """Mark chunks of a file hash and chunking parameters as complete"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO ExtractedChunkSets (file_hash, chunk_params, total_chunks)
+                VALUES (?, ?, ?)
+            """, (file_hash, chunk_params, total_chunks))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error marking chunks cached: {e}")
+            return False
+    
+    # Ingestion Job Methods
+    @staticmethod
+    def create_ingestion_job(user_id, doc_id, collection_name):
+        """Queue a document for background ingestion into a collection"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO IngestionJobs (user_id, doc_id, collection_name, status)
+                VALUES (?, ?, ?, 'queued')
+            """, (user_id, doc_id, collection_name))
+            
+            cursor.execute("SELECT @@IDENTITY")
+            job_id = cursor.fetchone()[0]
+            
+            cursor.execute("""
+                UPDATE Documents
+                SET status = 'queued'
+                WHERE doc_id = ?
+            """, (doc_id,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return job_id
+        except Exception as e:
+            print(f"Error creating ingestion job: {e}")
+            return None
+    
+    @staticmethod
+    def create_ingestion_jobs(user_id, doc_ids, collection_name, replaces=None):
+        """Queue several documents in one transaction, returning their job ids in order (or None)
+        
+        replaces maps a document to the earlier versions of it whose vectors its job deletes.
+        """
+        try:
+            if not doc_ids:
+                return []
+            replaces = replaces or {}
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            job_ids = []
+            for doc_id in doc_ids:
+                replaced = ','.join(str(old_id) for old_id in replaces.get(doc_id, [])) or None
+                cursor.execute("""
+                    INSERT INTO IngestionJobs (user_id, doc_id, collection_name, status, replaces_doc_ids)
+                    OUTPUT INSERTED.job_id
+                    VALUES (?, ?, ?, 'queued', ?)
+                """, (user_id, doc_id, collection_name, replaced))
+                job_ids.append(cursor.fetchone()[0])
+            
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                UPDATE Documents
+                SET status = 'queued'
+                WHERE doc_id = ?
+            """, [(doc_id,) for doc_id in doc_ids])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return job_ids
+        except Exception as e:
+            print(f"Error creating ingestion jobs: {e}")
+            return None
+    
+    @staticmethod
+    def claim_ingestion_job(job_id, worker_id=None):
+        """Move a queued job to 'extracting' owned by worker_id; returns False if another worker already has it"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE IngestionJobs
+                SET status = 'extracting', worker_id = ?, updated_at = GETDATE()
+                WHERE job_id = ? AND status = 'queued'
+            """, (worker_id, job_id))
+            claimed = cursor.rowcount == 1
+            
+            if claimed:
+                cursor.execute("""
+                    UPDATE Documents
+                    SET status = 'extracting'
+                    WHERE doc_id = (SELECT doc_id FROM IngestionJobs WHERE job_id = ?)
+                """, (job_id,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return claimed
+        except Exception as e:
+            print(f"Error claiming ingestion job: {e}")
+            return False
+    
+    @staticmethod
+    def update_ingestion_job(job_id, status, total_pages=None, pages_done=None, chunks_done=None, error_message=None,
+                             changes=None):
+        """Update job status/progress and mirror the status onto the document
+        
+        changes is the chunk diff of a finished ingest ({'unchanged', 'reused', 'embedded', 'deleted'}).
+        """
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            changes = changes or {}
+            
+            cursor.execute("""
+                UPDATE IngestionJobs
+                SET status = ?,
+                    total_pages = COALESCE(?, total_pages),
+                    pages_done = COALESCE(?, pages_done),
+                    chunks_done = COALESCE(?, chunks_done),
+                    error_message = COALESCE(?, error_message),
+                    chunks_unchanged = COALESCE(?, chunks_unchanged),
+                    chunks_reused = COALESCE(?, chunks_reused),
+                    chunks_embedded = COALESCE(?, chunks_embedded),
+                    chunks_deleted = COALESCE(?, chunks_deleted),
+                    updated_at = GETDATE()
+                WHERE job_id = ?
+            """, (status, total_pages, pages_done, chunks_done, error_message,
+                  changes.get('unchanged'), changes.get('reused'), changes.get('embedded'), changes.get('deleted'),
+                  job_id))
+            
+            cursor.execute("""
+                UPDATE Documents
+                SET status = ?
+                WHERE doc_id = (SELECT doc_id FROM IngestionJobs WHERE job_id = ?)
+            """, (status, job_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating ingestion job: {e}")
+            return False
+    
+    @staticmethod
+    def touch_ingestion_job(job_id, worker_id):
+        """Refresh a running job's updated_at so other processes don't treat it as stale"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE IngestionJobs
+                SET updated_at = GETDATE()
+                WHERE job_id = ? AND worker_id = ?
+                AND status IN ('extracting', 'embedding')
+            """, (job_id, worker_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating ingestion job heartbeat: {e}")
+            return False
+    
+    @staticmethod
+    def get_ingestion_job(job_id):
+        """Get ingestion job details"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT j.job_id, j.user_id, j.doc_id, j.collection_name, j.status, j.total_pages,
+                       j.pages_done, j.chunks_done, j.error_message, j.created_at, j.updated_at,
+                       d.file_path, d.file_hash, d.filename, j.replaces_doc_ids,
+                       j.chunks_unchanged, j.chunks_reused, j.chunks_embedded, j.chunks_deleted
+                FROM IngestionJobs j
+                INNER JOIN Documents d ON j.doc_id = d.doc_id
+                WHERE j.job_id = ?
+            """, (job_id,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            if row:
+                return {
+                    'job_id': row[0],
+                    'user_id': row[1],
+                    'doc_id': row[2],
+                    'collection_name': row[3],
+                    'status': row[4],
+                    'total_pages': row[5],
+                    'pages_done': row[6],
+                    'chunks_done': row[7],
+                    'error_message': row[8],
+                    'created_at': row[9],
+                    'updated_at': row[10],
+                    'file_path': row[11],
+                    'file_hash': row[12],
+                    'filename': row[13],
+                    'replaces': [int(doc_id) for doc_id in row[14].split(',')] if row[14] else [],
+                    'changes': {
+                        'unchanged': row[15],
+                        'reused': row[16],
+                        'embedded': row[17],
+                        'deleted': row[18]
+                    } if row[15] is not None else None
+                }
+            return None
+        except Exception as e:
+            print(f"Error getting ingestion job: {e}")
+            return None
+    
+    @staticmethod
+    def get_latest_ingestion_jobs(doc_ids, collection_name):
+        """Latest job into collection_name for each document, as {doc_id: {'job_id', 'status'}}"""
+        try:
+            if not doc_ids:
+                return {}
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            placeholders = ','.join('?' * len(doc_ids))
+            cursor.execute(f"""
+                SELECT j.doc_id, j.job_id, j.status
+                FROM IngestionJobs j
+                WHERE j.job_id IN (
+                    SELECT MAX(job_id) FROM IngestionJobs
+                    WHERE collection_name = ? AND doc_id IN ({placeholders})
+                    GROUP BY doc_id
+                )
+            """, [collection_name] + list(doc_ids))
+            
+            jobs = {row[0]: {'job_id': row[1], 'status': row[2]} for row in cursor.fetchall()}
+            cursor.close()
+            conn.close()
+            return jobs
+        except Exception as e:
+            print(f"Error getting latest ingestion jobs: {e}")
+            return {}
+    
+    @staticmethod
+    def requeue_stale_ingestion_jobs(stale_seconds, worker_id=None):
+        """Requeue running jobs with no progress for stale_seconds, returning their ids
+        
+        Jobs owned by worker_id (the caller, which knows they are still running) are left alone.
+        """
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            # Jobs left running by a crashed or restarted process
+            cursor.execute("""
+                UPDATE IngestionJobs
+                SET status = 'queued', worker_id = NULL, updated_at = GETDATE()
+                OUTPUT INSERTED.job_id
+                WHERE status IN ('extracting', 'embedding')
+                AND updated_at < DATEADD(second, -?, GETDATE())
+                AND (worker_id IS NULL OR worker_id <> ?)
+            """, (stale_seconds, worker_id or ''))
+            job_ids = sorted(row[0] for row in cursor.fetchall())
+            
+            if job_ids:
+                placeholders = ','.join('?' * len(job_ids))
+                cursor.execute(f"""
+                    UPDATE Documents
+                    SET status = 'queued'
+                    WHERE doc_id IN (SELECT doc_id FROM IngestionJobs WHERE job_id IN ({placeholders}))
+                """, job_ids)
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return job_ids
+        except Exception as e:
+            print(f"Error requeuing ingestion jobs: {e}")
+            return []
+    
+    @staticmethod
+    def get_queued_ingestion_job_ids():
+        """Ids of all queued jobs, oldest first"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT job_id FROM IngestionJobs
+                WHERE status = 'queued'
+                ORDER BY job_id ASC
+            """)
+            job_ids = [row[0] for row in cursor.fetchall()]
+            
+            cursor.close()
+            conn.close()
+            return job_ids
+        except Exception as e:
+            print(f"Error getting queued ingestion jobs: {e}")
+            return []
+    
+    # Chat Session Methods
+    @staticmethod
+    def create_chat_session(user_id, session_name='New Chat'):
+        """Create a new chat session"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO ChatSessions (user_id, session_name)
+                VALUES (?, ?)
+            """, (user_id, session_name))
+            
+            cursor.execute("SELECT @@IDENTITY")
+            session_id = cursor.fetchone()[0]
+            
+            # Generate unique collection name
+            collection_name = f"chat_session_{session_id}"
+            
+            cursor.execute("""
+                UPDATE ChatSessions
+                SET chroma_collection_name = ?
+                WHERE session_id = ?
+            """, (collection_name, session_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return session_id, collection_name
+        except Exception as e:
+            print(f"Error creating chat session: {e}")
+            return None, None
+    
+    @staticmethod
+    def get_user_chat_sessions(user_id):
+        """Get all chat sessions for a user"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT session_id, session_name, created_at, updated_at
+                FROM ChatSessions
+                WHERE user_id = ?
+                ORDER BY updated_at DESC
+            """, (user_id,))
+            
+            sessions = []
+            for row in cursor.fetchall():
+                sessions.append({
+                    'session_id': row[0],
+                    'session_name': row[1],
+                    'created_at': row[2],
+                    'updated_at': row[3]
+                })
+            
+            cursor.close()
+            conn.close()
+            return sessions
+        except Exception as e:
+            print(f"Error getting chat sessions: {e}")
+            return []
+    
+    @staticmethod
+    def update_session_name(session_id, new_name):
+        """Update chat session name"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE ChatSessions
+                SET session_name = ?, updated_at = GETDATE()
+                WHERE session_id = ?
+            """, (new_name, session_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating session name: {e}")
+            return False
+    
+    @staticmethod
+    def update_session_timestamp(session_id):
+        """Update session's last updated timestamp"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE ChatSessions
+                SET updated_at = GETDATE()
+                WHERE session_id = ?
+            """, (session_id,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating session timestamp: {e}")
+            return False
+    
+    @staticmethod
+    def add_document_to_session(session_id, doc_id):
+        """Add document to chat session"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            # Check if already exists
+            cursor.execute("""
+                SELECT session_doc_id FROM SessionDocuments
+                WHERE session_id = ? AND doc_id = ?
+            """, (session_id, doc_id))
+            
+            if cursor.fetchone():
+                cursor.close()
+                conn.close()
+                return True  # Already exists
+            
+            cursor.execute("""
+                INSERT INTO SessionDocuments (session_id, doc_id)
+                VALUES (?, ?)
+            """, (session_id, doc_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error adding document to session: {e}")
+            return False
+    
+    @staticmethod
+    def add_documents_to_session(session_id, doc_ids):
+        """Add several documents to a chat session in one transaction"""
+        try:
+            if not doc_ids:
+                return True
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            # Skip documents already in the session
+            cursor.executemany("""
+                INSERT INTO SessionDocuments (session_id, doc_id)
+                SELECT ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM SessionDocuments WHERE session_id = ? AND doc_id = ?
+                )
+            """, [(session_id, doc_id, session_id, doc_id) for doc_id in doc_ids])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error adding documents to session: {e}")
+            return False
+    
+    @staticmethod
+    def remove_documents_from_session(session_id, doc_ids):
+        """Detach documents from a chat session (the documents themselves are kept)"""
+        try:
+            if not doc_ids:
+                return True
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            cursor.executemany("""
+                DELETE FROM SessionDocuments
+                WHERE session_id = ? AND doc_id = ?
+            """, [(session_id, doc_id) for doc_id in doc_ids])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error removing documents from session: {e}")
+            return False
+    
+    @staticmethod
+    def get_session_documents(session_id, collection_name=None):
+        """Get all documents for a session
+        
+        Ingestion status comes from jobs into collection_name (default: the session's own collection).
+        """
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT d.doc_id, d.filename, d.file_type, d.file_path, d.total_pages, j.job_id, j.status, d.file_hash
+                FROM Documents d
+                INNER JOIN SessionDocuments sd ON d.doc_id = sd.doc_id
+                INNER JOIN ChatSessions cs ON sd.session_id = cs.session_id
+                OUTER APPLY (
+                    SELECT TOP 1 job_id, status
+                    FROM IngestionJobs
+                    WHERE doc_id = d.doc_id AND collection_name = COALESCE(?, cs.chroma_collection_name)
+                    ORDER BY job_id DESC
+                ) j
+                WHERE sd.session_id = ?
+                ORDER BY sd.uploaded_at DESC
+            """, (collection_name, session_id))
+            
+            documents = []
+            for row in cursor.fetchall():
+                documents.append({
+                    'doc_id': row[0],
+                    'filename': row[1],
+                    'file_type': row[2],
+                    'file_path': row[3],
+                    'total_pages': row[4],
+                    'job_id': row[5],
+                    'status': row[6] or 'ready',
+                    'file_hash': row[7]
+                })
+            
+            cursor.close()
+            conn.close()
+            return documents
+        except Exception as e:
+            print(f"Error getting session documents: {e}")
+            return []
+    
+    @staticmethod
+    def get_session_doc_ids(session_id):
+        """Get the ids of documents attached to a session"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT doc_id FROM SessionDocuments
+                WHERE session_id = ?
+            """, (session_id,))
+            
+            doc_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            conn.close()
+            return doc_ids
+        except Exception as e:
+            print(f"Error getting session document ids: {e}")
+            return []
+    
+    @staticmethod
+    def save_chat_message(session_id, message_type, content, confidence_score=None, source_pages=None, source_doc_names=None):
+        """Save chat message"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO ChatMessages 
+                (session_id, message_type, content, confidence_score, source_pages, source_doc_names)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                session_id,
+                message_type,
+                content,
+                confidence_score,
+                source_pages,
+                source_doc_names
+            ))
+            
+            cursor.execute("SELECT @@IDENTITY")
+            message_id = cursor.fetchone()[0]
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return message_id
+        except Exception as e:
+            print(f"Error saving chat message: {e}")
+            return None
+    
+    @staticmethod
+    def get_chat_messages(session_id):
+        """Get all messages for a session"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    message_id,
+                    message_type,
+                    content,
+                    confidence_score,
+                    source_pages,
+                    source_doc_names,
+                    created_at,
+                    is_edited,
+                    is_correct
+                FROM ChatMessages
+                WHERE session_id = ?
+                ORDER BY created_at ASC
+            """, (session_id,))
+            
+            messages = []
+            for row in cursor.fetchall():
+                messages.append({
+                    'message_id': row[0],
+                    'message_type': row[1],
+                    'content': row[2],
+                    'confidence_score': row[3],
+                    'source_pages': row[4],
+                    'source_doc_names': row[5],
+                    'created_at': row[6],
+                    'is_edited': row[7],
+                    'is_correct': row[8]
+                })
+            
+            cursor.close()
+            conn.close()
+            return messages
+        except Exception as e:
+            print(f"Error getting chat messages: {e}")
+            return []
+    
+    @staticmethod
+    def get_session_collection_name(session_id):
+        """Get ChromaDB collection name for session"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT chroma_collection_name
+                FROM ChatSessions
+                WHERE session_id = ?
+            """, (session_id,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error getting session collection name: {e}")
+            return None
+    
+    # Excel Task Methods
+    @staticmethod
+    def create_excel_task(user_id, task_name, excel_file_id):
+        """Create new Excel task"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO ExcelTasks (user_id, task_name, excel_file_id)
+                VALUES (?, ?, ?)
+            """, (user_id, task_name, excel_file_id))
+            
+            cursor.execute("SELECT @@IDENTITY")
+            task_id = cursor.fetchone()[0]
+            
+            # Generate unique collection name
+            collection_name = f"excel_task_{task_id}"
+            
+            cursor.execute("""
+                UPDATE ExcelTasks
+                SET chroma_collection_name = ?
+                WHERE task_id = ?
+            """, (collection_name, task_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return task_id, collection_name
+        except Exception as e:
+            print(f"Error creating Excel task: {e}")
+            return None, None
+    
+    @staticmethod
+    def add_document_to_task(task_id, doc_id):
+        """Add document to Excel task"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO TaskDocuments (task_id, doc_id)
+                VALUES (?, ?)
+            """, (task_id, doc_id))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error adding document to task: {e}")
+            return False
+    
+    @staticmethod
+    def add_documents_to_task(task_id, doc_ids):
+        """Add several documents to an Excel task in one transaction"""
+        try:
+            if not doc_ids:
+                return True
+            
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            cursor.executemany("""
+                INSERT INTO TaskDocuments (task_id, doc_id)
+                VALUES (?, ?)
+            """, [(task_id, doc_id) for doc_id in doc_ids])
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error adding documents to task: {e}")
+            return False
+    
+    @staticmethod
+    def save_task_answer(
+        task_id,
+        question_text,
+        answer_text,
+        confidence_score,
+        source_pages,
+        source_doc_names=None
+    ):
+        """Save answer for Excel task"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO TaskAnswers 
+                (task_id, question_text, answer_text, confidence_score, source_pages, source_doc_names)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                task_id,
+                question_text,
+                answer_text,
+                confidence_score,
+                source_pages,
+                source_doc_names
+            ))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving task answer: {e}")
+            return False
+    
+    @staticmethod
+    def get_user_excel_tasks(user_id):
+        """Get all Excel tasks for a user"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT task_id, task_name, created_at, total_questions, status
+                FROM ExcelTasks
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            """, (user_id,))
+            
+            tasks = []
+            for row in cursor.fetchall():
+                tasks.append({
+                    'task_id': row[0],
+                    'task_name': row[1],
+                    'created_at': row[2],
+                    'total_questions': row[3],
+                    'status': row[4]
+                })
+            
+            cursor.close()
+            conn.close()
+            return tasks
+        except Exception as e:
+            print(f"Error getting Excel tasks: {e}")
+            return []
+    
+    @staticmethod
+    def get_task_answers(task_id):
+        """Get all answers for a task"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    answer_id,
+                    question_text,
+                    answer_text,
+                    confidence_score,
+                    source_pages,
+                    source_doc_names,
+                    is_correct,
+                    is_edited
+                FROM TaskAnswers
+                WHERE task_id = ?
+                ORDER BY answer_id ASC
+            """, (task_id,))
+            
+            answers = []
+            for row in cursor.fetchall():
+                answers.append({
+                    'answer_id': row[0],
+                    'question': row[1],
+                    'answer': row[2],
+                    'confidence': row[3],
+                    'source_pages': row[4],
+                    'source_doc_names': row[5],
+                    'is_correct': row[6],
+                    'is_edited': row[7]
+                })
+            
+            cursor.close()
+            conn.close()
+            return answers
+        except Exception as e:
+            print(f"Error getting task answers: {e}")
+            return []
+    
+    @staticmethod
+    def get_task_collection_name(task_id):
+        """Get ChromaDB collection name for task"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT chroma_collection_name
+                FROM ExcelTasks
+                WHERE task_id = ?
+            """, (task_id,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error getting task collection name: {e}")
+            return None
+
+    @staticmethod
+    def update_chat_message_feedback(message_id, is_correct, edited_content=None):
+        """Update chat message feedback - Sets confidence to 100% ONLY when edited"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            if edited_content:
+                # When edited, set confidence to 100%, mark as edited and correct
+                cursor.execute("""
+                    UPDATE ChatMessages
+                    SET content = ?, is_edited = 1, is_correct = 1, confidence_score = 100
+                    WHERE message_id = ? AND message_type = 'ai'
+                """, (edited_content, message_id))
+            elif is_correct:
+                # Just marking as correct - keep original confidence score
+                cursor.execute("""
+                    UPDATE ChatMessages
+                    SET is_correct = 1
+                    WHERE message_id = ? AND message_type = 'ai'
+                """, (message_id,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating message feedback: {e}")
+            return False
+    
+    @staticmethod
+    def update_task_answer_feedback(answer_id, is_correct, edited_answer=None):
+        """Update task answer feedback - Sets confidence to 100% ONLY when edited"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            if edited_answer:
+                # When edited, set confidence to 100%, mark as edited and correct
+                cursor.execute("""
+                    UPDATE TaskAnswers
+                    SET answer_text = ?, is_correct = 1, is_edited = 1, confidence_score = 100
+                    WHERE answer_id = ?
+                """, (edited_answer, answer_id))
+            else:
+                # Just marking as correct - keep original confidence score
+                cursor.execute("""
+                    UPDATE TaskAnswers
+                    SET is_correct = 1
+                    WHERE answer_id = ?
+                """, (answer_id,))
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error updating answer feedback: {e}")
+            return False
+    
+    @staticmethod
+    def get_document_by_id(doc_id):
+        """Get document details by ID"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT doc_id, filename, file_type, file_path, total_pages, file_hash
+                FROM Documents
+                WHERE doc_id = ?
+            """, (doc_id,))
+            
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            if row:
+                return {
+                    'doc_id': row[0],
+                    'filename': row[1],
+                    'file_type': row[2],
+                    'file_path': row[3],
+                    'total_pages': row[4],
+                    'file_hash': row[5]
+                }
+            return None
+        except Exception as e:
+            print(f"Error getting document: {e}")
+            return None
+    
+    # NEW METHODS FOR ALL Q&A AND DATE FILTERING
+    
+    @staticmethod
+    def get_all_user_qa(user_id):
+        """Get all Q&A from both chat sessions and excel tasks"""
+        try:
+            conn = DatabaseManager.get_connection()
+            cursor = conn.cursor()
+            
+            all_qa = []
+            
+            # Get Q&A from chat sessions
+            cursor.execute("""
+                SELECT 
+                    cm2.message_id as id,
+                    'chat' as source_type,
+                    cs.session_name as source_name,
+                    cm.content as question,
+                    cm2.content as answer,
+                    cm2.confidence_score as confidence,
+                    cm2.source_pages,
+                    cm2.source_doc_names,
+                    cm2.is_edited,
+                    cm.created_at,
+                    cm2.is_correct
+                FROM ChatMessages cm
+                INNER JOIN ChatSessions cs ON cm.session_id = cs.session_id
+                LEFT JOIN ChatMessages cm2 ON cm.session_id = cm2.session_id 
+                    AND cm2.message_id = (
+                        SELECT MIN(message_id) 
+                        FROM ChatMessages 
+                        WHERE session_id = cm.session_id 
+                        AND message_type = 'ai' 
+                        AND message_id > cm.message_id
+                    )
+                WHERE cs.user_id = ? 
+                AND cm.message_type = 'user'
+                AND cm2.message_id IS NOT NULL
+            """, (user_id,))
+            
+            for row in cursor.fetchall():
+                all_qa.append({
+                    'id': row[0],
+                    'source_type': row[1],
+                    'source_name': row[2],
+                    'question': row[3],
+                    'answer': row[4],
+                    'confidence': row[5],
+                    'source_pages': row[6],
+                    'source_doc_names': row[7],
+                    'is_edited': row[8],
+                    'created_at': row[9],
+                    'is_correct': row[10]
+                })
+            
+            # Get Q&A from Excel tasks
+            cursor.execute("""
+                SELECT 
+                    ta.answer_id as id,
+                    'excel' as source_type,
+                    et.task_name as source_name,
+                    ta.question_text as question,
+                    ta.answer_text as answer,
+                    ta.confidence_score as confidence,
+                    ta.source_pages,
+                    ta.source_doc_names,
+                    ta.is_edited,
+                    ta.created_at,
+                    ta.is_correct
+                FROM TaskAnswers ta
+                INNER JOIN ExcelTasks et ON ta.task_id = et.task_id
+                WHERE et.user_id = ?
+            """, (user_id,))
+            
+            for row in cursor.fetchall():
+                all_qa.append({
+                    'id': row[0],
+                    'source_type': row[1],
+                    'source_name': row[2],
+                    'question': row[3],
+                    'answer': row[4],
+                    'confidence': row[5],
+                    'source_pages': row[6],
+                    'source_doc_names': row[7],
+                    'is_edited': row[8],
+                    'created_at': row[9],
+                    'is_correct': row[10]
+                })
+            
+            cursor.close()
+            conn.close()
+            
+            # Sort by date (most recent first)
+            all_qa.sort(key=lambda x: x['created_at'], reverse=True)
+            
+            return all_qa
+        except Exception as e:
+            print(f"Error getting all Q&A: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+    
+    @staticmethod
+    def filter_qa_by_date(qa_list, start_date=None, end_date=None):
+        """Filter Q&A list by date range"""
+        try:
+            if not start_date and not end_date:
+                return qa_list
+            
+            filtered_qa = []
+            
+            for qa in qa_list:
+                qa_date = qa['created_at'].date() if isinstance(qa['created_at'], datetime) else qa['created_at']
+                
+                # Convert string dates to date objects if needed
+                if start_date:
+                    start = datetime.strptime(start_date, '%Y-%m-%d').date() if isinstance(start_date, str) else start_date
+                    if qa_date < start:
+                        continue
+                
+                if end_date:
+                    end = datetime.strptime(end_date, '%Y-%m-%d').date() if isinstance(end_date, str) else end_date
+                    if qa_date > end:
+                        continue
+                
+                filtered_qa.append(qa)
+            
+            return filtered_qa
+        except Exception as e:
+            print(f"Error filtering Q&A by date: {e}")
             return qa_list
\ No newline at end of file
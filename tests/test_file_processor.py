@@ -0,0 +1,41 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+import pdfplumber
+
+from utils.file_processor import _column_gutter, _extract_range_adaptive
+
+LEFT_LINES = [f"Left column line {n} runs well past the middle of the page here" for n in range(14)]
+RIGHT_LINES = [f"Right line {n} text" for n in range(14)]
+
+def write_two_column_pdf(path):
+    """One page: a left column reaching past the middle of the page and a narrow right column"""
+    pdf = canvas.Canvas(str(path), pagesize=letter)
+    pdf.setFont('Helvetica', 10)
+    for n, (left, right) in enumerate(zip(LEFT_LINES, RIGHT_LINES)):
+        y = 720 - n * 14
+        pdf.drawString(40, y, left)
+        pdf.drawString(400, y, right)
+    pdf.save()
+
+def test_column_gutter_is_found_off_centre(tmp_path):
+    path = tmp_path / 'columns.pdf'
+    write_two_column_pdf(path)
+    
+    with pdfplumber.open(path) as pdf:
+        page = pdf.pages[0]
+        widest_left = max(char['x1'] for char in page.chars if char['x0'] < 390)
+        gutter = _column_gutter(page)
+    
+    assert widest_left > float(letter[0]) / 2
+    assert widest_left < gutter < 400
+
+def test_multi_column_page_keeps_every_glyph_in_reading_order(tmp_path):
+    path = tmp_path / 'columns.pdf'
+    write_two_column_pdf(path)
+    
+    text_by_page, blank_pages, pdfplumber_pages = _extract_range_adaptive(str(path), 0, 1)
+    
+    assert pdfplumber_pages == 1
+    assert blank_pages == []
+    lines = text_by_page[1].splitlines()
+    assert lines == LEFT_LINES + RIGHT_LINES
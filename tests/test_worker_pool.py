@@ -0,0 +1,50 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Run as the main script, so every pool worker re-imports it (and with it the web app)
+SCRIPT = textwrap.dedent('''
+    import json
+    import os
+    import sys
+    sys.path.insert(0, {repo_root!r})
+    
+    import app
+    from utils.file_processor import _worker_pool
+    
+    def probe():
+        app_module = sys.modules.get('app')
+        manager = getattr(app_module, 'embedding_manager', None)
+        return {{
+            'pid': os.getpid(),
+            'imported_app': app_module is not None,
+            'embedding_manager_created': getattr(manager, '_instance', manager) is not None,
+            'embeddings_imported': 'utils.embeddings' in sys.modules
+        }}
+    
+    if __name__ == '__main__':
+        pool = _worker_pool('extract', 2)
+        results = [future.result() for future in [pool.submit(probe) for _ in range(4)]]
+        print(json.dumps({{'parent': os.getpid(), 'workers': results}}))
+''')
+
+def test_pool_workers_do_not_build_app_services(tmp_path):
+    script = tmp_path / 'serve.py'
+    script.write_text(SCRIPT.format(repo_root=str(REPO_ROOT)))
+    
+    completed = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=tmp_path, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    
+    for worker in report['workers']:
+        assert worker['pid'] != report['parent']
+        assert worker['imported_app']
+        assert not worker['embedding_manager_created']
+        assert not worker['embeddings_imported']
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import Config
+from utils.embedding_cache import QueryEmbeddingCache
+from utils.metrics import Metrics
+
+class SemanticAnswerCache:
+    """In-process cache of answers, reused for paraphrased questions over the same documents
+    
+    Entries are grouped by (model, set of doc_ids). A question hits when its embedding
+    has cosine similarity of at least ANSWER_CACHE_SIMILARITY to a cached question in its
+    group; beyond ANSWER_CACHE_MAX_ENTRIES the least recently used answers are evicted.
+    """
+    
+    def __init__(self, model=None, max_entries=None, similarity=None):
+        self.model = model or Config.OLLAMA_MODEL
+        self.max_entries = max_entries or Config.ANSWER_CACHE_MAX_ENTRIES
+        self.similarity = similarity or Config.ANSWER_CACHE_SIMILARITY
+        self._groups = {}  # group key -> {entry_id: (vector, result)}
+        self._entries = OrderedDict()  # entry_id -> group key, least recently used first
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def _group_key(self, doc_ids):
+        return self.model, frozenset(str(doc_id) for doc_id in doc_ids)
+    
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(np.linalg.norm(vector), 1e-12)
+    
+    def get(self, vector, doc_ids):
+        """Cached result for a question embedding over doc_ids, or None"""
+        if not Config.ANSWER_CACHE_ENABLED or not doc_ids:
+            return None
+        
+        vector = self._normalize(vector)
+        result = None
+        with self._lock:
+            group = self._groups.get(self._group_key(doc_ids))
+            if group:
+                entry_ids = list(group)
+                similarities = np.vstack([group[entry_id][0] for entry_id in entry_ids]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity:
+                    self._entries.move_to_end(entry_ids[best])
+                    result = dict(group[entry_ids[best]][1])
+        
+        Metrics.increment('answer_cache.hits' if result is not None else 'answer_cache.misses')
+        return result
+    
+    def put(self, vector, doc_ids, result):
+        """Remember the result for a question embedding over doc_ids"""
+        if not Config.ANSWER_CACHE_ENABLED or not doc_ids:
+            return
+        
+        key = self._group_key(doc_ids)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._groups.setdefault(key, {})[entry_id] = (self._normalize(vector), dict(result))
+            self._entries[entry_id] = key
+            
+            while len(self._entries) > self.max_entries:
+                evicted, evicted_key = self._entries.popitem(last=False)
+                self._remove(evicted, evicted_key)
+    
+    def _remove(self, entry_id, key):
+        group = self._groups.get(key)
+        if group is not None:
+            group.pop(entry_id, None)
+            if not group:
+                del self._groups[key]
+    
+    def invalidate_document(self, doc_id):
+        """Drop every answer that drew on a document whose content changed"""
+        doc_id = str(doc_id)
+        with self._lock:
+            stale = [entry_id for entry_id, key in self._entries.items() if doc_id in key[1]]
+            for entry_id in stale:
+                self._remove(entry_id, self._entries.pop(entry_id))
+        if stale:
+            print(f"Invalidated {len(stale)} cached answers for document {doc_id}")
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'groups': len(self._groups),
+                'max_entries': self.max_entries,
+                'similarity': self.similarity
+            }
+
+
+class ExactAnswerCache:
+    """Answers persisted on disk for an exact question, set of retrieved chunks, prompt and model
+    
+    Re-running a question against unchanged documents retrieves the same chunks, so its
+    answer is read back instead of generated. The key covers each chunk's id and content
+    hash; files live under EXACT_CACHE_DIR/<xx>/<key>.json like the OCR cache.
+    """
+    
+    @staticmethod
+    def key(question, chunks, model, prompt_version):
+        """Hash of the normalized question, the ordered chunks, the prompt version and the model"""
+        parts = [
+            QueryEmbeddingCache.normalize(question),
+            [[chunk.get('id'), (chunk.get('metadata') or {}).get('chunk_hash')] for chunk in chunks],
+            prompt_version,
+            model
+        ]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _cache_path(key):
+        return os.path.join(Config.EXACT_CACHE_DIR, key[:2], f"{key}.json")
+    
+    @staticmethod
+    def get(key):
+        """Cached result for a key, or None"""
+        if not Config.EXACT_CACHE_ENABLED:
+            return None
+        result = None
+        try:
+            with open(ExactAnswerCache._cache_path(key), encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading answer cache: {e}")
+        
+        Metrics.increment('exact_cache.hits' if result is not None else 'exact_cache.misses')
+        return result
+    
+    @staticmethod
+    def put(key, result):
+        """Store a result under a key"""
+        if not Config.EXACT_CACHE_ENABLED:
+            return
+        path = ExactAnswerCache._cache_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent requests never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing answer cache: {e}")
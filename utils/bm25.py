@@ -0,0 +1,157 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from config import Config
+
+# Words, numbers and codes such as "e11.9", "hba1c" or "co-amoxiclav" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+class BM25Index:
+    """Inverted index of one collection's chunks for lexical (BM25) search
+    
+    Postings live in a SQLite file under BM25_INDEX_DIR and are updated together with
+    the collection's vectors, so exact terms like drug names and ICD codes can be
+    matched even when their embeddings are not close to the question's.
+    """
+    
+    def __init__(self, collection_name, index_dir=None):
+        self.collection_name = collection_name
+        self.path = self.index_path(collection_name, index_dir)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                doc_id TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_chunk ON postings (chunk_id);
+        """)
+        self._db.commit()
+    
+    @staticmethod
+    def index_path(collection_name, index_dir=None):
+        return os.path.join(index_dir or Config.BM25_INDEX_DIR, f"{collection_name}.sqlite3")
+    
+    @staticmethod
+    def tokenize(text):
+        """Lowercased terms; codes are also indexed by their parts ("e11.9" -> "e11", "9")"""
+        terms = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            terms.append(token)
+            parts = re.split(r"[.\-/]", token)
+            if len(parts) > 1:
+                terms.extend(part for part in parts if part)
+        return terms
+    
+    def _remove(self, chunk_ids):
+        for start in range(0, len(chunk_ids), 500):
+            block = chunk_ids[start:start + 500]
+            placeholders = ','.join('?' * len(block))
+            self._db.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", block)
+            self._db.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", block)
+    
+    def add(self, chunk_ids, texts, doc_ids):
+        """Index chunks, replacing any earlier postings for the same ids"""
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._remove(list(chunk_ids))
+            postings = []
+            chunks = []
+            for chunk_id, text, doc_id in zip(chunk_ids, texts, doc_ids):
+                counts = Counter(self.tokenize(text))
+                chunks.append((chunk_id, str(doc_id), sum(counts.values())))
+                postings.extend((term, chunk_id, tf) for term, tf in counts.items())
+            self._db.executemany("INSERT INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)", chunks)
+            self._db.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", postings)
+            self._db.commit()
+    
+    def count(self):
+        """Number of indexed chunks"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def missing(self, chunk_ids):
+        """The chunk_ids that are not indexed"""
+        chunk_ids = list(chunk_ids)
+        found = set()
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500):
+                block = chunk_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT chunk_id FROM chunks WHERE chunk_id IN ({','.join('?' * len(block))})", block
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return [chunk_id for chunk_id in chunk_ids if chunk_id not in found]
+    
+    def delete(self, chunk_ids):
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._remove(list(chunk_ids))
+            self._db.commit()
+    
+    def search(self, query, n_results=20, doc_ids=None):
+        """(chunk_id, score) pairs for the best BM25 matches, optionally only within doc_ids"""
+        terms = list(dict.fromkeys(self.tokenize(query)))
+        if not terms or doc_ids == []:
+            return []
+        
+        with self._lock:
+            doc_filter = ''
+            params = list(terms)
+            if doc_ids is not None:
+                doc_filter = f"AND c.doc_id IN ({','.join('?' * len(doc_ids))})"
+                params += [str(doc_id) for doc_id in doc_ids]
+                total, total_length = self._db.execute(
+                    f"SELECT COUNT(*), SUM(length) FROM chunks c WHERE 1 = 1 {doc_filter}", params[len(terms):]
+                ).fetchone()
+            else:
+                total, total_length = self._db.execute("SELECT COUNT(*), SUM(length) FROM chunks").fetchone()
+            if not total:
+                return []
+            
+            rows = self._db.execute(f"""
+                SELECT p.term, p.chunk_id, p.tf, c.length
+                FROM postings p
+                JOIN chunks c ON c.chunk_id = p.chunk_id
+                WHERE p.term IN ({','.join('?' * len(terms))}) {doc_filter}
+            """, params).fetchall()
+        
+        k1, b = Config.BM25_K1, Config.BM25_B
+        average_length = total_length / total
+        document_frequency = Counter(term for term, _, _, _ in rows)
+        scores = Counter()
+        for term, chunk_id, tf, length in rows:
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            scores[chunk_id] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average_length))
+        return scores.most_common(n_results)
+    
+    def drop(self):
+        """Delete the index file"""
+        with self._lock:
+            self._db.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+    
+    @staticmethod
+    def fuse(rankings, weights, n_results, k=None):
+        """Weighted reciprocal rank fusion of several ranked id lists, best first"""
+        k = k or Config.HYBRID_RRF_K
+        scores = Counter()
+        for ranking, weight in zip(rankings, weights):
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] += weight / (k + rank + 1)
+        return [chunk_id for chunk_id, _ in scores.most_common(n_results)]
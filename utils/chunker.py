@@ -0,0 +1,181 @@
+import re
+import threading
+from config import Config
+
+# Sentence ends: terminal punctuation followed by whitespace, or a line that starts a list item
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n(?=\s*(?:[-•▪●*]|\d{1,2}[.)])\s)')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_WHITESPACE = re.compile(r'\s+')
+_TOKEN_ESTIMATE = re.compile(r'\w+|[^\w\s]')
+
+# Words that end with a period without ending the sentence
+_ABBREVIATIONS = {
+    'e.g', 'i.e', 'etc', 'vs', 'dr', 'mr', 'mrs', 'ms', 'prof', 'approx', 'fig', 'no',
+    'vol', 'ref', 'min', 'max', 'hr', 'hrs', 'wk', 'wks', 'mo', 'yr', 'yrs', 'st', 'inc', 'al'
+}
+
+class TokenCounter:
+    """Count tokens the way a Hugging Face tokenizer does
+    
+    The tokenizer is loaded on first use; if it can't be loaded, counts are estimated
+    from the number of words and punctuation marks times estimate_factor.
+    """
+    
+    def __init__(self, tokenizer_name, estimate_factor=1.3):
+        self.tokenizer_name = tokenizer_name
+        self.estimate_factor = estimate_factor
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Fast tokenizers raise "Already borrowed" when one instance is used from several threads at once
+        self._encode_lock = threading.Lock()
+    
+    def _get_tokenizer(self):
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                if self.tokenizer_name:
+                    try:
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                    except Exception as e:
+                        print(f"Tokenizer {self.tokenizer_name} unavailable, estimating token counts: {e}")
+            return self._tokenizer
+    
+    def count_many(self, texts):
+        """Token counts for a list of texts (without special tokens)"""
+        if not texts:
+            return []
+        
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            with self._encode_lock:
+                encoded = tokenizer(texts, add_special_tokens=False)['input_ids']
+            return [len(ids) for ids in encoded]
+        
+        return [int(len(_TOKEN_ESTIMATE.findall(text)) * self.estimate_factor) + 1 for text in texts]
+    
+    def count(self, text):
+        return self.count_many([text])[0]
+    
+    def truncate(self, text, max_tokens):
+        """Leading words of text that fit in max_tokens, or '' if none do"""
+        words = text.split()
+        tokens = self.count(text)
+        while words and tokens > max_tokens:
+            words = words[:min(len(words) - 1, int(len(words) * max_tokens / tokens))]
+            tokens = self.count(' '.join(words))
+        return ' '.join(words)
+
+# Word pieces of the embedding model, which chunks must fit
+embedding_token_counter = TokenCounter(f"sentence-transformers/{Config.EMBEDDING_MODEL}")
+
+class TextChunker:
+    """Split text into chunks that end on sentence and paragraph boundaries
+    
+    Chunks hold whole sentences up to max_tokens word pieces (and max_chars characters,
+    if given); overlap carries trailing sentences (up to overlap characters) into the
+    next chunk. Sentences longer than a chunk are split between words. Runs in linear time.
+    """
+    
+    def __init__(self, max_tokens=None, overlap=None, max_chars=None):
+        # Leave room for the [CLS] and [SEP] tokens the model adds
+        self.max_tokens = (Config.CHUNK_MAX_TOKENS if max_tokens is None else max_tokens) - 2
+        self.overlap = Config.CHUNK_OVERLAP if overlap is None else overlap
+        self.chunk_size = max_chars or float('inf')
+    
+    def chunk(self, text):
+        """Split text into a list of chunks"""
+        sentences = list(self._iter_sentences(text))
+        token_counts = embedding_token_counter.count_many([sentence for sentence, _ in sentences])
+        
+        chunks = []
+        current = []  # (sentence, tokens)
+        current_chars = 0  # joined length plus one
+        current_tokens = 0
+        
+        for (sentence, new_paragraph), tokens in zip(sentences, token_counts):
+            # Prefer to end a reasonably full chunk at a paragraph break
+            if new_paragraph and current_tokens >= self.max_tokens * 3 // 4:
+                chunks.append(' '.join(s for s, _ in current))
+                current, current_chars, current_tokens = [], 0, 0
+            
+            for piece, piece_tokens in self._split_long_sentence(sentence, tokens):
+                if current and (current_chars + len(piece) > self.chunk_size
+                                or current_tokens + piece_tokens > self.max_tokens):
+                    chunks.append(' '.join(s for s, _ in current))
+                    current = self._overlap_tail(current)
+                    current_chars = sum(len(s) + 1 for s, _ in current)
+                    current_tokens = sum(t for _, t in current)
+                    
+                    # Drop the overlap if it leaves no room for this piece
+                    if current and (current_chars + len(piece) > self.chunk_size
+                                    or current_tokens + piece_tokens > self.max_tokens):
+                        current, current_chars, current_tokens = [], 0, 0
+                
+                current.append((piece, piece_tokens))
+                current_chars += len(piece) + 1
+                current_tokens += piece_tokens
+        
+        if current:
+            chunks.append(' '.join(s for s, _ in current))
+        
+        return chunks
+    
+    def _iter_sentences(self, text):
+        """Yield (sentence, starts_paragraph) with whitespace normalized"""
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            new_paragraph = True
+            start = 0
+            for match in _SENTENCE_BREAK.finditer(paragraph):
+                # Only look at the end of the candidate so skipped abbreviations stay linear
+                words = paragraph[max(start, match.start() - 16):match.start()].split()
+                last_word = words[-1].rstrip('.').lower() if words else ''
+                if last_word in _ABBREVIATIONS or (len(last_word) == 1 and last_word.isalpha()):
+                    continue
+                
+                sentence = _WHITESPACE.sub(' ', paragraph[start:match.start()]).strip()
+                if sentence:
+                    yield sentence, new_paragraph
+                    new_paragraph = False
+                start = match.end()
+            
+            sentence = _WHITESPACE.sub(' ', paragraph[start:]).strip()
+            if sentence:
+                yield sentence, new_paragraph
+    
+    def _split_long_sentence(self, sentence, tokens):
+        """Split a sentence that can't fit in one chunk into pieces between words"""
+        if len(sentence) <= self.chunk_size and tokens <= self.max_tokens:
+            return [(sentence, tokens)]
+        
+        # Character limit that keeps each piece under both budgets
+        limit = min(self.chunk_size, len(sentence))
+        if tokens > self.max_tokens:
+            limit = min(limit, max(1, len(sentence) * self.max_tokens // tokens))
+        
+        pieces = []
+        start = 0
+        while start < len(sentence):
+            end = min(start + limit, len(sentence))
+            if end < len(sentence):
+                space = sentence.rfind(' ', start + 1, end)
+                if space > start:
+                    end = space
+            piece = sentence[start:end].strip()
+            if piece:
+                pieces.append((piece, max(1, tokens * len(piece) // len(sentence))))
+            start = end
+        return pieces
+    
+    def _overlap_tail(self, sentences):
+        """Trailing sentences that fit within the overlap size"""
+        tail = []
+        chars = 0
+        for sentence, tokens in reversed(sentences):
+            if chars + len(sentence) > self.overlap:
+                break
+            tail.append((sentence, tokens))
+            chars += len(sentence) + 1
+        tail.reverse()
+        return tail
@@ -0,0 +1,127 @@
+import numpy as np
+from config import Config
+from utils.llm_handler import prompt_token_counter
+from utils.metrics import Metrics
+
+class ContextSelector:
+    """Choose the chunks sent to the LLM from the retrieved candidates
+    
+    Adjacent chunks of the same page are merged (dropping their overlapping text),
+    near-duplicates are removed, and maximal marginal relevance picks relevant but
+    non-redundant chunks until CONTEXT_MAX_TOKENS, counted with the LLM's tokenizer,
+    is reached.
+    """
+    
+    def __init__(self, embedding_manager):
+        self.embedding_manager = embedding_manager
+    
+    def select(self, chunks, max_tokens=None):
+        """Selected chunks, most relevant first; merged chunks keep the first chunk's metadata"""
+        if not chunks:
+            return []
+        max_tokens = max_tokens or Config.CONTEXT_MAX_TOKENS
+        tokens_before = sum(prompt_token_counter.count_many([chunk['text'] for chunk in chunks]))
+        
+        # Chunk texts are in the embedding cache from ingestion, so this rarely runs the model
+        vectors = np.asarray(self.embedding_manager.embed_texts([chunk['text'] for chunk in chunks]), dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        
+        groups = self._merge_adjacent(chunks, vectors)
+        groups = self._drop_near_duplicates(groups)
+        selected = self._mmr(groups, max_tokens)
+        
+        tokens_after = sum(group['tokens'] for group in selected)
+        Metrics.increment('context.tokens_before', tokens_before)
+        Metrics.increment('context.tokens_after', tokens_after)
+        print(f"Context: {len(chunks)} chunks / {tokens_before} tokens -> "
+              f"{len(selected)} chunks / {tokens_after} tokens")
+        return [group['chunk'] for group in selected]
+    
+    @staticmethod
+    def _join(first, second):
+        """Concatenate two consecutive chunks, dropping text the second repeats from the first"""
+        for overlap in range(min(len(first), len(second), Config.CHUNK_OVERLAP * 8), 9, -1):
+            if first.endswith(second[:overlap]):
+                return first + second[overlap:]
+        return first + ' ' + second
+    
+    def _merge_adjacent(self, chunks, vectors):
+        """Groups of consecutive chunks from the same document page"""
+        def position(index):
+            metadata = chunks[index].get('metadata') or {}
+            try:
+                return metadata['doc_id'], metadata['page_num'], int(metadata['chunk_id'])
+            except (KeyError, ValueError):
+                return None, None, index
+        
+        def sort_key(index):
+            doc_id, page_num, chunk_id = position(index)
+            return str(doc_id), str(page_num), chunk_id
+        
+        groups = []
+        for index in sorted(range(len(chunks)), key=sort_key):
+            doc_id, page_num, chunk_id = position(index)
+            previous = groups[-1] if groups else None
+            if (previous is not None and doc_id is not None and previous['key'] == (doc_id, page_num)
+                    and previous['last_chunk_id'] == chunk_id - 1):
+                previous['chunk']['text'] = self._join(previous['chunk']['text'], chunks[index]['text'])
+                previous['chunk']['distance'] = min(previous['chunk']['distance'], chunks[index].get('distance', 1))
+                previous['last_chunk_id'] = chunk_id
+                previous['vectors'].append(vectors[index])
+                continue
+            
+            groups.append({
+                'key': (doc_id, page_num),
+                'last_chunk_id': chunk_id,
+                'chunk': dict(chunks[index], distance=chunks[index].get('distance', 1)),
+                'vectors': [vectors[index]]
+            })
+        
+        token_counts = prompt_token_counter.count_many([group['chunk']['text'] for group in groups])
+        for group, tokens in zip(groups, token_counts):
+            vector = np.mean(group.pop('vectors'), axis=0)
+            group['vector'] = vector / max(np.linalg.norm(vector), 1e-12)
+            group['relevance'] = 1 - group['chunk']['distance']
+            group['tokens'] = tokens
+        return groups
+    
+    @staticmethod
+    def _drop_near_duplicates(groups):
+        """Keep the more relevant of any two groups above CONTEXT_DUPLICATE_SIMILARITY
+        
+        A group whose text is contained in a kept group's (e.g. the same passage in
+        another copy of a document, next to a merged neighbour) also counts as a duplicate.
+        """
+        kept = []
+        for group in sorted(groups, key=lambda g: -g['relevance']):
+            text = ' '.join(group['chunk']['text'].split())
+            if all(float(group['vector'] @ other['vector']) < Config.CONTEXT_DUPLICATE_SIMILARITY
+                   and text not in other['text'] for other in kept):
+                group['text'] = text
+                kept.append(group)
+        return kept
+    
+    @staticmethod
+    def _mmr(groups, max_tokens):
+        """Maximal marginal relevance selection of groups that fit the token budget"""
+        selected = []
+        remaining = list(groups)
+        budget = max_tokens
+        while remaining:
+            candidates = [group for group in remaining if group['tokens'] <= budget]
+            if not candidates:
+                break
+            
+            def score(group):
+                redundancy = max((float(group['vector'] @ other['vector']) for other in selected), default=0.0)
+                return Config.CONTEXT_MMR_LAMBDA * group['relevance'] - (1 - Config.CONTEXT_MMR_LAMBDA) * redundancy
+            
+            best = max(candidates, key=score)
+            selected.append(best)
+            remaining.remove(best)
+            budget -= best['tokens']
+        
+        # Never send an empty context because the best chunk alone is over budget
+        if not selected and groups:
+            selected.append(max(groups, key=lambda g: g['relevance']))
+        return selected
@@ -0,0 +1,115 @@
+import threading
+from config import Config
+from database.models import DatabaseManager
+from utils.file_processor import FileProcessor
+
+class DocumentCache:
+    """Reuse extracted page text and chunks of already-ingested PDFs, keyed by file hash"""
+    
+    # Rows buffered before they are written to the cache tables
+    WRITE_BATCH_SIZE = 500
+    
+    # Cache entries being written, so concurrent ingests of one file never interleave their writes
+    _writers = set()
+    _writers_lock = threading.Lock()
+    
+    @staticmethod
+    def chunk_params(chunk_size=None, overlap=None):
+        """Cache key part describing how a document was chunked"""
+        chunk_size = Config.CHUNK_SIZE if chunk_size is None else chunk_size
+        overlap = Config.CHUNK_OVERLAP if overlap is None else overlap
+        if Config.CHUNK_STRATEGY == 'sentence':
+            return f"sentence;tokens={Config.CHUNK_MAX_TOKENS};overlap={overlap}"
+        return f"size={chunk_size};overlap={overlap}"
+    
+    @staticmethod
+    def _claim_writer(key):
+        """Whether the caller may write the cache entry for key (one writer per entry at a time)"""
+        with DocumentCache._writers_lock:
+            if key in DocumentCache._writers:
+                return False
+            DocumentCache._writers.add(key)
+            return True
+    
+    @staticmethod
+    def _release_writer(key):
+        with DocumentCache._writers_lock:
+            DocumentCache._writers.discard(key)
+    
+    @staticmethod
+    def iter_pages(file_path, file_hash=None):
+        """Yield (page_num, text) from the cache, extracting and caching them on a miss
+        
+        While another ingest is caching the same file, pages are extracted without caching.
+        """
+        if file_hash is None:
+            file_hash = DatabaseManager.calculate_file_hash(file_path)
+        
+        if DatabaseManager.get_cached_page_count(file_hash) is not None:
+            yield from DatabaseManager.iter_cached_pages(file_hash)
+            return
+        
+        key = ('pages', file_hash)
+        claimed = DocumentCache._claim_writer(key)
+        try:
+            # Drop rows left behind by an interrupted extraction
+            caching = claimed and DatabaseManager.clear_cached_pages(file_hash)
+            
+            pending = []
+            total_pages = 0
+            for page_num, text in FileProcessor.iter_pdf_pages(file_path):
+                total_pages += 1
+                pending.append((page_num, text))
+                if len(pending) >= DocumentCache.WRITE_BATCH_SIZE:
+                    # After a failed write the cache is incomplete: stop writing and never mark it complete
+                    caching = caching and DatabaseManager.append_cached_pages(file_hash, pending)
+                    pending = []
+                yield page_num, text
+            
+            if caching and DatabaseManager.append_cached_pages(file_hash, pending):
+                DatabaseManager.mark_pages_cached(file_hash, total_pages)
+        finally:
+            if claimed:
+                DocumentCache._release_writer(key)
+    
+    @staticmethod
+    def iter_chunks(file_path, file_hash=None, chunk_size=None, overlap=None):
+        """Yield (page_num, chunk) from the cache, extracting and chunking only on a miss
+        
+        While another ingest is caching the same file's chunks, chunks are produced without caching.
+        """
+        chunk_size = Config.CHUNK_SIZE if chunk_size is None else chunk_size
+        overlap = Config.CHUNK_OVERLAP if overlap is None else overlap
+        
+        if file_hash is None:
+            file_hash = DatabaseManager.calculate_file_hash(file_path)
+        params = DocumentCache.chunk_params(chunk_size, overlap)
+        
+        if DatabaseManager.get_cached_chunk_count(file_hash, params) is not None:
+            yield from DatabaseManager.iter_cached_chunks(file_hash, params)
+            return
+        
+        key = ('chunks', file_hash, params)
+        claimed = DocumentCache._claim_writer(key)
+        try:
+            # Drop rows left behind by an interrupted chunking run
+            caching = claimed and DatabaseManager.clear_cached_chunks(file_hash, params)
+            
+            pending = []
+            total_chunks = 0
+            for page_num, text in DocumentCache.iter_pages(file_path, file_hash):
+                for chunk_index, chunk in enumerate(FileProcessor.chunk_text(text, chunk_size, overlap)):
+                    total_chunks += 1
+                    pending.append((page_num, chunk_index, chunk))
+                    yield page_num, chunk
+                
+                if len(pending) >= DocumentCache.WRITE_BATCH_SIZE:
+                    # After a failed write the cache is incomplete: stop writing and never mark it complete
+                    caching = caching and DatabaseManager.append_cached_chunks(file_hash, params, pending)
+                    pending = []
+            
+            if caching and DatabaseManager.append_cached_chunks(file_hash, params, pending):
+                DatabaseManager.mark_chunks_cached(file_hash, params, total_chunks)
+        finally:
+            if claimed:
+                DocumentCache._release_writer(key)
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import Config
+from utils.metrics import Metrics
+
+class EmbeddingCache:
+    """Persistent embedding store shared by all collections, keyed by a hash of model name and text
+    
+    Vectors live in memory-mapped arrays under EMBEDDING_CACHE_DIR/<model>; once the
+    cache is full the least recently used entries are overwritten.
+    """
+    
+    def __init__(self, model_name=None, cache_dir=None, max_entries=None):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.cache_dir = os.path.join(cache_dir or Config.EMBEDDING_CACHE_DIR,
+                                      re.sub(r'[^\w.-]', '_', self.model_name))
+        self.max_entries = max_entries or Config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        # slot arrays: vectors (N x dim float32), keys (N hex digests), last_used (N timestamps)
+        self._vectors = None
+        self._keys = None
+        self._last_used = None
+        self._slots = {}
+        self._free = []
+        
+        try:
+            if os.path.exists(self._path('keys')):
+                self._open('r+')
+        except Exception as e:
+            print(f"Error opening embedding cache, starting empty: {e}")
+            self._vectors = None
+    
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.npy")
+    
+    def _open(self, mode, dimension=None):
+        shapes = {
+            'vectors': (np.float32, (self.max_entries, dimension)),
+            'keys': ('S64', (self.max_entries,)),
+            'last_used': (np.float64, (self.max_entries,))
+        }
+        arrays = {}
+        for name, (dtype, shape) in shapes.items():
+            if mode == 'w+':
+                arrays[name] = np.lib.format.open_memmap(self._path(name), mode='w+', dtype=dtype, shape=shape)
+            else:
+                arrays[name] = np.lib.format.open_memmap(self._path(name), mode='r+')
+        
+        self._vectors, self._keys, self._last_used = arrays['vectors'], arrays['keys'], arrays['last_used']
+        self._slots = {bytes(key): slot for slot, key in enumerate(self._keys) if key}
+        self._free = np.flatnonzero(self._keys == b'').tolist()
+    
+    def _key(self, text):
+        # Hex rather than raw digests: fixed-width byte arrays drop trailing NUL bytes
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest().encode('ascii')
+    
+    def get_many(self, texts):
+        """Cached vectors for texts (None where missing), in the same order"""
+        with self._lock:
+            results = [None] * len(texts)
+            if self._vectors is not None:
+                now = time.time()
+                for i, text in enumerate(texts):
+                    slot = self._slots.get(self._key(text))
+                    if slot is not None:
+                        results[i] = np.array(self._vectors[slot])
+                        self._last_used[slot] = now
+            
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(texts) - hits
+        Metrics.increment('embedding_cache.hits', hits)
+        Metrics.increment('embedding_cache.misses', len(texts) - hits)
+        return results
+    
+    def put_many(self, texts, vectors):
+        """Store vectors for texts, evicting least recently used entries when full"""
+        if not texts:
+            return
+        try:
+            with self._lock:
+                if self._vectors is None:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    self._open('w+', dimension=len(vectors[0]))
+                
+                keys = [self._key(text) for text in texts]
+                new_keys = list(dict.fromkeys(key for key in keys if key not in self._slots))
+                self._make_room(min(len(new_keys), len(self._keys)))
+                
+                now = time.time()
+                for key, vector in zip(keys, vectors):
+                    slot = self._slots.get(key)
+                    if slot is None:
+                        if not self._free:
+                            continue
+                        slot = self._free.pop()
+                        self._slots[key] = slot
+                        self._keys[slot] = key
+                    self._vectors[slot] = vector
+                    self._last_used[slot] = now
+                
+                for array in (self._vectors, self._keys, self._last_used):
+                    array.flush()
+        except Exception as e:
+            print(f"Error writing embedding cache: {e}")
+    
+    def _make_room(self, count):
+        shortfall = count - len(self._free)
+        if shortfall <= 0:
+            return
+        # Free slots already count as room, so never pick them
+        last_used = np.where(self._keys != b'', self._last_used, np.inf)
+        evict = np.argpartition(last_used, shortfall - 1)[:shortfall]
+        for slot in evict.tolist():
+            self._slots.pop(bytes(self._keys[slot]), None)
+            self._keys[slot] = b''
+            self._last_used[slot] = 0
+            self._free.append(slot)
+        Metrics.increment('embedding_cache.evictions', shortfall)
+    
+    def stats(self):
+        """Entry count, hit rate and bytes on disk"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            bytes_on_disk = sum(
+                os.path.getsize(self._path(name))
+                for name in ('vectors', 'keys', 'last_used')
+                if os.path.exists(self._path(name))
+            )
+            return {
+                'model': self.model_name,
+                'entries': len(self._slots),
+                'max_entries': self.max_entries if self._keys is None else len(self._keys),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_on_disk': bytes_on_disk
+            }
+
+
+class QueryEmbeddingCache:
+    """In-process LRU of normalized query text -> embedding, with a time-to-live"""
+    
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = max_entries or Config.QUERY_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.QUERY_CACHE_TTL_SECONDS
+        self._entries = OrderedDict()  # query -> (vector, expires_at)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(query):
+        """Case- and whitespace-insensitive form of a query (the embedding model is uncased)"""
+        return ' '.join(query.lower().split())
+    
+    def get(self, query):
+        """Cached vector for a normalized query, or None"""
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[query]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(query)
+        
+        Metrics.increment('query_cache.hits' if entry is not None else 'query_cache.misses')
+        return entry[0] if entry is not None else None
+    
+    def put(self, query, vector):
+        with self._lock:
+            self._entries[query] = (vector, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl_seconds': self.ttl_seconds}
@@ -1,111 +1,561 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from config import Config
-import os
-
-class EmbeddingManager:
-    """Manage embeddings and ChromaDB with collection isolation"""
-    
-    def __init__(self):
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
-        
-        # Initialize ChromaDB
-        os.makedirs(Config.CHROMA_PERSIST_DIR, exist_ok=True)
-        self.chroma_client = chromadb.PersistentClient(path=Config.CHROMA_PERSIST_DIR)
-    
-    def get_or_create_collection(self, collection_name):
-        """Get or create a specific collection"""
-        try:
-            collection = self.chroma_client.get_or_create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
-            return collection
-        except Exception as e:
-            print(f"Error getting/creating collection: {e}")
-            return None
-    
-    def add_document_chunks(self, collection_name, doc_id, chunks_by_page):
-        """Add document chunks to specific collection"""
-        try:
-            collection = self.get_or_create_collection(collection_name)
-            if not collection:
-                return False
-            
-            documents = []
-            metadatas = []
-            ids = []
-            
-            chunk_id = 0
-            for page_num, chunks in chunks_by_page.items():
-                for chunk in chunks:
-                    documents.append(chunk)
-                    metadatas.append({
-                        'doc_id': str(doc_id),
-                        'page_num': str(page_num),
-                        'chunk_id': str(chunk_id)
-                    })
-                    ids.append(f"{collection_name}_{doc_id}_page{page_num}_chunk{chunk_id}")
-                    chunk_id += 1
-            
-            # Add to ChromaDB
-            if documents:
-                collection.add(
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-            
-            return True
-        except Exception as e:
-            print(f"Error adding chunks to ChromaDB: {e}")
-            return False
-    
-    def search_similar(self, collection_name, query, n_results=5):
-        """Search for similar chunks in specific collection"""
-        try:
-            collection = self.get_or_create_collection(collection_name)
-            if not collection:
-                return []
-            
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
-            
-            if not results['documents'] or not results['documents'][0]:
-                return []
-            
-            search_results = []
-            for i, doc in enumerate(results['documents'][0]):
-                search_results.append({
-                    'text': doc,
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else 0
-                })
-            
-            return search_results
-        except Exception as e:
-            print(f"Error searching ChromaDB: {e}")
-            return []
-    
-    def delete_collection(self, collection_name):
-        """Delete a collection"""
-        try:
-            self.chroma_client.delete_collection(name=collection_name)
-            return True
-        except Exception as e:
-            print(f"Error deleting collection: {e}")
-            return False
-    
-    def collection_exists(self, collection_name):
-        """Check if collection exists"""
-        try:
-            collections = self.chroma_client.list_collections()
-            return any(c.name == collection_name for c in collections)
-        except Exception as e:
-            print(f"Error checking collection: {e}")
-            return False
-
+import chromadb
+import torch
+from chromadb.api.types import Documents, EmbeddingFunction
+from chromadb.config import Settings
+from sentence_transformers import SentenceTransformer
+from config import Config
+from utils.bm25 import BM25Index
+from utils.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from utils.metrics import Metrics
+from utils.onnx_embedder import OnnxEmbedder
+from utils.vector_store import QuantizedCollection
+import hashlib
+import numpy as np
+import os
+import re
+import threading
+
+class ModelEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Chroma embedding function backed by the EmbeddingManager's model
+    
+    Passed to every collection so Chroma never loads its own default model.
+    """
+    
+    def __init__(self, embedding_manager):
+        self.embedding_manager = embedding_manager
+    
+    def __call__(self, input):
+        return self.embedding_manager.embed_texts(list(input))
+
+class EmbeddingManager:
+    """Manage embeddings and ChromaDB with collection isolation"""
+    
+    def __init__(self):
+        # Initialize embedding model (the only one in the process)
+        model_id = Config.EMBEDDING_MODEL
+        if Config.EMBEDDING_BACKEND == 'onnx':
+            self.embedding_model = OnnxEmbedder(Config.EMBEDDING_MODEL)
+            # Quantized vectors differ slightly, so they get their own cache
+            if Config.EMBEDDING_ONNX_QUANTIZE:
+                model_id = f"{Config.EMBEDDING_MODEL}-onnx-int8"
+        else:
+            if Config.EMBEDDING_THREADS:
+                torch.set_num_threads(Config.EMBEDDING_THREADS)
+            self.embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
+        self.embedding_function = ModelEmbeddingFunction(self)
+        
+        # Vectors for chunk text already embedded by any collection
+        self.embedding_cache = None
+        if Config.EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(model_id)
+            Metrics.register('embedding_cache', self.embedding_cache.stats)
+        
+        # Repeated questions skip the model entirely
+        self.query_cache = QueryEmbeddingCache()
+        Metrics.register('query_cache', self.query_cache.stats)
+        
+        # Initialize ChromaDB
+        os.makedirs(Config.CHROMA_PERSIST_DIR, exist_ok=True)
+        self.chroma_client = chromadb.PersistentClient(path=Config.CHROMA_PERSIST_DIR)
+        
+        # Open collection handles and the set of existing names, so lookups skip ChromaDB's catalog
+        self._collections = {}
+        self._collection_names = None
+        self._lexical_indexes = {}
+        self._collections_lock = threading.Lock()
+    
+    def embed_texts(self, texts, use_cache=True):
+        """Encode texts in batches, returning a list of vectors
+        
+        With use_cache, vectors are looked up in the shared embedding cache first and
+        only the misses are sent to the model.
+        """
+        if not texts:
+            return []
+        
+        cache = self.embedding_cache if use_cache else None
+        vectors = cache.get_many(texts) if cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            embeddings = self.embedding_model.encode(
+                [texts[i] for i in missing],
+                batch_size=Config.EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=Config.EMBEDDING_NORMALIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            for i, embedding in zip(missing, embeddings):
+                vectors[i] = embedding
+            if cache:
+                cache.put_many([texts[i] for i in missing], embeddings)
+        
+        return [vector.tolist() for vector in vectors]
+    
+    def embed_query(self, query):
+        """Embedding for a search query, reused for repeated questions"""
+        return self.embed_queries([query])[0]
+    
+    def embed_queries(self, queries):
+        """Embeddings for search queries, encoding only uncached ones (in one batched call)"""
+        queries = [QueryEmbeddingCache.normalize(query) for query in queries]
+        vectors = [self.query_cache.get(query) for query in queries]
+        
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        encoded = dict(zip(missing, self.embed_texts(missing, use_cache=False)))
+        for query, vector in encoded.items():
+            self.query_cache.put(query, vector)
+        
+        return [vector if vector is not None else encoded[query] for query, vector in zip(queries, vectors)]
+    
+    def get_or_create_collection(self, collection_name):
+        """Get or create a specific collection, reusing the handle once opened"""
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+        try:
+            with self._collections_lock:
+                collection = self._collections.get(collection_name)
+                if collection is None:
+                    if Config.VECTOR_QUANTIZATION:
+                        collection = QuantizedCollection(collection_name, Config.VECTOR_QUANTIZATION)
+                    else:
+                        collection = self.chroma_client.get_or_create_collection(
+                            name=collection_name,
+                            metadata={"hnsw:space": "cosine"},
+                            embedding_function=self.embedding_function
+                        )
+                    self._collections[collection_name] = collection
+                    if self._collection_names is not None:
+                        self._collection_names.add(collection_name)
+            return collection
+        except Exception as e:
+            print(f"Error getting/creating collection: {e}")
+            return None
+    
+    def lexical_index(self, collection_name):
+        """BM25 index kept alongside a collection, or None when hybrid search is off"""
+        if not Config.HYBRID_SEARCH:
+            return None
+        index = self._lexical_indexes.get(collection_name)
+        if index is None:
+            created = False
+            with self._collections_lock:
+                index = self._lexical_indexes.get(collection_name)
+                if index is None:
+                    index = BM25Index(collection_name)
+                    self._lexical_indexes[collection_name] = index
+                    created = True
+            if created:
+                self._backfill_lexical_index(collection_name, index)
+        return index
+    
+    def _backfill_lexical_index(self, collection_name, index):
+        """Index chunks a collection stored before hybrid search was turned on"""
+        try:
+            if not self.collection_exists(collection_name):
+                return
+            collection = self.get_or_create_collection(collection_name)
+            if not collection or collection.count() <= index.count():
+                return
+            
+            existing = collection.get(include=['documents', 'metadatas'])
+            texts = dict(zip(existing['ids'], existing['documents']))
+            doc_ids = {chunk_id: metadata.get('doc_id') for chunk_id, metadata in zip(existing['ids'], existing['metadatas'])}
+            missing = index.missing(existing['ids'])
+            for start in range(0, len(missing), Config.INGEST_BATCH_SIZE):
+                batch = missing[start:start + Config.INGEST_BATCH_SIZE]
+                index.add(batch, [texts[chunk_id] for chunk_id in batch], [doc_ids[chunk_id] for chunk_id in batch])
+            print(f"Added {len(missing)} existing chunks of {collection_name} to its BM25 index")
+        except Exception as e:
+            print(f"Error backfilling BM25 index for {collection_name}: {e}")
+    
+    @staticmethod
+    def shared_index_name(user_id):
+        """Collection holding every document of a user (or of everyone) in shared storage mode"""
+        if Config.SHARED_INDEX_SCOPE == 'global':
+            return "documents"
+        return f"documents_user_{user_id}"
+    
+    @staticmethod
+    def _doc_filter(doc_ids):
+        """where clause restricting a search to doc_ids (None = no restriction)"""
+        if doc_ids is None:
+            return None
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        if len(doc_ids) == 1:
+            return {'doc_id': doc_ids[0]}
+        return {'doc_id': {'$in': doc_ids}}
+    
+    def has_document(self, collection_name, doc_id):
+        """Whether a collection already holds vectors for a document"""
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection:
+                return False
+            existing = collection.get(where={'doc_id': str(doc_id)}, limit=1, include=['metadatas'])
+            return len(existing['ids']) > 0
+        except Exception as e:
+            print(f"Error checking document in ChromaDB: {e}")
+            return False
+    
+    @staticmethod
+    def source_name(filename):
+        """Name shared by every uploaded version of a file (upload timestamp and suffix removed)"""
+        name, ext = os.path.splitext(os.path.basename(filename))
+        return re.sub(r'_\d+(?:_[0-9a-f]{8})?$', '', name) + ext
+    
+    @staticmethod
+    def chunk_hash(text):
+        """Content hash used to recognise unchanged chunks"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def begin_chunk_sync(self, collection_name, doc_id, source_name=None, replaces=None):
+        """Load what the collection already holds for this document or an earlier version of it
+        
+        The returned state is passed to add_chunk_batch and then finish_chunk_sync, so
+        unchanged chunks are skipped, moved chunks reuse their stored vectors, and only
+        new text is embedded. This document's stale vectors are deleted at the end, and so
+        are those of the documents in replaces (earlier versions the caller explicitly
+        supersedes). Other documents with the same source name only lend their vectors, as
+        they may still be attached to a session or task; in shared storage mode replaces
+        is ignored for the same reason.
+        """
+        replaceable_doc_ids = {str(doc_id)}
+        if replaces and Config.VECTOR_STORE_MODE != 'shared':
+            replaceable_doc_ids.update(str(replaced) for replaced in replaces)
+        
+        sync = {
+            'hash_by_id': {},
+            'replaceable_ids': set(),
+            'embedding_by_hash': {},
+            'kept_ids': set(),
+            'unchanged': 0,
+            'reused': 0,
+            'embedded': 0
+        }
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection:
+                return sync
+            
+            where = {'doc_id': str(doc_id)}
+            if source_name:
+                where = {'$or': [where, {'source': source_name}]}
+            existing = collection.get(where=where, include=['metadatas', 'embeddings'])
+            
+            for chunk_id, metadata, embedding in zip(existing['ids'], existing['metadatas'], existing['embeddings']):
+                chunk_hash = metadata.get('chunk_hash')
+                sync['hash_by_id'][chunk_id] = chunk_hash
+                if metadata.get('doc_id') in replaceable_doc_ids:
+                    sync['replaceable_ids'].add(chunk_id)
+                if chunk_hash:
+                    sync['embedding_by_hash'][chunk_hash] = embedding
+        except Exception as e:
+            print(f"Error loading existing chunks: {e}")
+        return sync
+    
+    def finish_chunk_sync(self, collection_name, sync):
+        """Delete chunks that are no longer part of the document, returning the diff summary"""
+        stale_ids = [chunk_id for chunk_id in sync['replaceable_ids'] if chunk_id not in sync['kept_ids']]
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            lexical = self.lexical_index(collection_name)
+            for start in range(0, len(stale_ids), Config.INGEST_BATCH_SIZE):
+                collection.delete(ids=stale_ids[start:start + Config.INGEST_BATCH_SIZE])
+                if lexical:
+                    lexical.delete(stale_ids[start:start + Config.INGEST_BATCH_SIZE])
+        except Exception as e:
+            print(f"Error deleting stale chunks: {e}")
+            stale_ids = []
+        
+        return {
+            'unchanged': sync['unchanged'],
+            'reused': sync['reused'],
+            'embedded': sync['embedded'],
+            'deleted': len(stale_ids)
+        }
+    
+    def add_document_chunks(self, collection_name, doc_id, chunks_by_page, source_name=None, replaces=None):
+        """Add document chunks to specific collection, re-embedding only changed chunks
+        
+        replaces lists earlier versions whose vectors are deleted (see begin_chunk_sync).
+        Returns {'success', 'unchanged', 'reused', 'embedded', 'deleted'}.
+        """
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection:
+                return {'success': False}
+            
+            chunks = [
+                (page_num, chunk)
+                for page_num, page_chunks in chunks_by_page.items()
+                for chunk in page_chunks
+            ]
+            
+            sync = self.begin_chunk_sync(collection_name, doc_id, source_name, replaces)
+            
+            # Add to ChromaDB in fixed-size batches
+            for start in range(0, len(chunks), Config.INGEST_BATCH_SIZE):
+                batch = chunks[start:start + Config.INGEST_BATCH_SIZE]
+                if not self.add_chunk_batch(collection_name, doc_id, batch, start, sync, source_name):
+                    return {'success': False}
+            
+            summary = self.finish_chunk_sync(collection_name, sync)
+            summary['success'] = True
+            return summary
+        except Exception as e:
+            print(f"Error adding chunks to ChromaDB: {e}")
+            return {'success': False}
+    
+    def add_chunk_batch(self, collection_name, doc_id, batch, start_chunk_id, sync=None, source_name=None):
+        """Add a batch of (page_num, chunk) pairs, numbering chunks from start_chunk_id
+        
+        With a sync state from begin_chunk_sync, chunks already stored under the same id
+        are left alone and chunks whose text is already stored reuse that vector.
+        """
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection:
+                return False
+            
+            to_embed = {'documents': [], 'metadatas': [], 'ids': []}
+            to_reuse = {'documents': [], 'metadatas': [], 'ids': [], 'embeddings': []}
+            unchanged = {}  # vector id -> text of chunks already stored as-is
+            
+            for chunk_id, (page_num, chunk) in enumerate(batch, start_chunk_id):
+                chunk_hash = self.chunk_hash(chunk)
+                metadata = {
+                    'doc_id': str(doc_id),
+                    'page_num': str(page_num),
+                    'chunk_id': str(chunk_id),
+                    'chunk_hash': chunk_hash
+                }
+                if source_name:
+                    metadata['source'] = source_name
+                vector_id = f"{collection_name}_{doc_id}_page{page_num}_chunk{chunk_id}"
+                
+                target = to_embed
+                if sync is not None:
+                    sync['kept_ids'].add(vector_id)
+                    if sync['hash_by_id'].get(vector_id) == chunk_hash:
+                        sync['unchanged'] += 1
+                        unchanged[vector_id] = chunk
+                        continue
+                    if chunk_hash in sync['embedding_by_hash']:
+                        target = to_reuse
+                        to_reuse['embeddings'].append(sync['embedding_by_hash'][chunk_hash])
+                        sync['reused'] += 1
+                    else:
+                        sync['embedded'] += 1
+                
+                target['documents'].append(chunk)
+                target['metadatas'].append(metadata)
+                target['ids'].append(vector_id)
+            
+            if to_embed['ids']:
+                to_embed['embeddings'] = self.embed_texts(to_embed['documents'])
+            
+            # Upsert so a requeued ingestion job can safely re-send batches
+            lexical = self.lexical_index(collection_name)
+            if lexical and unchanged:
+                # Stored before hybrid search was on, or by an interrupted run
+                missing = lexical.missing(unchanged)
+                if missing:
+                    lexical.add(missing, [unchanged[chunk_id] for chunk_id in missing], [doc_id] * len(missing))
+            for chunks in (to_reuse, to_embed):
+                if chunks['ids']:
+                    collection.upsert(**chunks)
+                    if lexical:
+                        lexical.add(chunks['ids'], chunks['documents'], [doc_id] * len(chunks['ids']))
+            
+            return True
+        except Exception as e:
+            print(f"Error adding chunk batch to ChromaDB: {e}")
+            return False
+    
+    def search_similar(self, collection_name, query, n_results=5, doc_ids=None):
+        """Search for similar chunks in specific collection, optionally only within doc_ids"""
+        if Config.HYBRID_SEARCH:
+            return self.search_similar_batch(collection_name, [query], n_results, doc_ids)[0]
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection or doc_ids == []:
+                return []
+            
+            results = collection.query(
+                query_embeddings=[self.embed_query(query)],
+                n_results=n_results,
+                where=self._doc_filter(doc_ids)
+            )
+            
+            return self._format_results(results, 0)
+        except Exception as e:
+            print(f"Error searching ChromaDB: {e}")
+            return []
+    
+    def search_similar_batch(self, collection_name, queries, n_results=5, doc_ids=None):
+        """Search for many queries at once, returning one result list per query
+        
+        Queries are encoded in batches and sent to ChromaDB as multi-query calls of
+        RETRIEVAL_BATCH_SIZE, optionally restricted to doc_ids. With HYBRID_SEARCH the
+        vector hits are fused with BM25 hits from the collection's lexical index.
+        """
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            if not collection or doc_ids == []:
+                return [[] for _ in queries]
+            
+            search_results = []
+            for start in range(0, len(queries), Config.RETRIEVAL_BATCH_SIZE):
+                block = queries[start:start + Config.RETRIEVAL_BATCH_SIZE]
+                embeddings = self.embed_queries(block)
+                results = collection.query(
+                    query_embeddings=embeddings,
+                    n_results=max(n_results, Config.HYBRID_CANDIDATES) if Config.HYBRID_SEARCH else n_results,
+                    where=self._doc_filter(doc_ids)
+                )
+                if Config.HYBRID_SEARCH:
+                    search_results.extend(self._hybrid_results(
+                        collection, collection_name, block, embeddings, results, n_results, doc_ids
+                    ))
+                else:
+                    search_results.extend(self._format_results(results, i) for i in range(len(embeddings)))
+            
+            return search_results
+        except Exception as e:
+            print(f"Error searching ChromaDB: {e}")
+            return [[] for _ in queries]
+    
+    def _hybrid_results(self, collection, collection_name, queries, embeddings, results, n_results, doc_ids):
+        """Fuse each query's vector hits with its BM25 hits, keeping n_results per query"""
+        lexical = self.lexical_index(collection_name)
+        fused_results = []
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            ids = results['ids'][i] if results.get('ids') else []
+            by_id = dict(zip(ids, self._format_results(results, i)))
+            lexical_ids = [chunk_id for chunk_id, _ in lexical.search(query, Config.HYBRID_CANDIDATES, doc_ids)]
+            fused = BM25Index.fuse([ids, lexical_ids], [1.0, Config.HYBRID_LEXICAL_WEIGHT], n_results)
+            
+            # Chunks only BM25 found: load them, with their cosine distance for confidence scoring
+            missing = [chunk_id for chunk_id in fused if chunk_id not in by_id]
+            if missing:
+                Metrics.increment('hybrid.lexical_only_hits', len(missing))
+                found = collection.get(ids=missing, include=['documents', 'metadatas', 'embeddings'])
+                query_vector = np.asarray(embedding, dtype=np.float32)
+                query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+                for chunk_id, doc, metadata, vector in zip(found['ids'], found['documents'],
+                                                           found['metadatas'], found['embeddings']):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    similarity = float(vector @ query_vector / max(np.linalg.norm(vector), 1e-12))
+                    by_id[chunk_id] = {'id': chunk_id, 'text': doc, 'metadata': metadata, 'distance': 1 - similarity}
+            
+            fused_results.append([by_id[chunk_id] for chunk_id in fused if chunk_id in by_id])
+        return fused_results
+    
+    @staticmethod
+    def _format_results(results, query_index):
+        """Result dicts for one query of a collection.query response"""
+        if not results['documents'] or not results['documents'][query_index]:
+            return []
+        
+        search_results = []
+        for i, doc in enumerate(results['documents'][query_index]):
+            search_results.append({
+                'id': results['ids'][query_index][i] if results.get('ids') else None,
+                'text': doc,
+                'metadata': results['metadatas'][query_index][i],
+                'distance': results['distances'][query_index][i] if results.get('distances') else 0
+            })
+        
+        return search_results
+    
+    def delete_collection(self, collection_name):
+        """Delete a collection"""
+        try:
+            with self._collections_lock:
+                collection = self._collections.pop(collection_name, None)
+                lexical = self._lexical_indexes.pop(collection_name, None)
+                if lexical:
+                    lexical.drop()
+                elif os.path.exists(BM25Index.index_path(collection_name)):
+                    os.remove(BM25Index.index_path(collection_name))
+                if self._collection_names is not None:
+                    self._collection_names.discard(collection_name)
+                if Config.VECTOR_QUANTIZATION:
+                    (collection or QuantizedCollection(collection_name, Config.VECTOR_QUANTIZATION)).drop()
+                else:
+                    self.chroma_client.delete_collection(name=collection_name)
+            return True
+        except Exception as e:
+            print(f"Error deleting collection: {e}")
+            return False
+    
+    def migrate_collection(self, source_name, target_name):
+        """Copy a per-session/task collection's vectors into a shared index, then delete it
+        
+        Collections written before shared storage mode are backfilled the first time
+        their session or task is used. Stored vectors are copied as-is under the ids
+        add_chunk_batch gives them in the target, so nothing is re-embedded and later
+        ingests see the chunks as unchanged. Documents the target already holds are
+        skipped. Returns False, keeping the source, if the copy fails.
+        """
+        if not source_name or source_name == target_name or not self.collection_exists(source_name):
+            return True
+        try:
+            source = self.get_or_create_collection(source_name)
+            target = self.get_or_create_collection(target_name)
+            if not source or not target:
+                return False
+            lexical = self.lexical_index(target_name)
+            
+            existing = source.get(include=['documents', 'metadatas', 'embeddings'])
+            chunks_by_doc = {}
+            for text, metadata, embedding in zip(existing['documents'], existing['metadatas'], existing['embeddings']):
+                if metadata.get('doc_id') is not None:
+                    # Collections from before chunk hashing get one, so later ingests see these chunks as unchanged
+                    metadata.setdefault('chunk_hash', self.chunk_hash(text))
+                    chunks_by_doc.setdefault(metadata['doc_id'], []).append((text, metadata, embedding))
+            
+            copied = 0
+            for doc_id, chunks in chunks_by_doc.items():
+                if self.has_document(target_name, doc_id):
+                    continue
+                for start in range(0, len(chunks), Config.INGEST_BATCH_SIZE):
+                    batch = chunks[start:start + Config.INGEST_BATCH_SIZE]
+                    ids = [f"{target_name}_{doc_id}_page{metadata['page_num']}_chunk{metadata['chunk_id']}"
+                           for _, metadata, _ in batch]
+                    documents = [text for text, _, _ in batch]
+                    target.upsert(
+                        ids=ids,
+                        documents=documents,
+                        metadatas=[metadata for _, metadata, _ in batch],
+                        embeddings=[embedding for _, _, embedding in batch]
+                    )
+                    if lexical:
+                        lexical.add(ids, documents, [doc_id] * len(ids))
+                copied += len(chunks)
+            
+            self.delete_collection(source_name)
+            print(f"Migrated {copied} chunks from {source_name} into {target_name}")
+            return True
+        except Exception as e:
+            print(f"Error migrating collection {source_name}: {e}")
+            return False
+    
+    def collection_exists(self, collection_name):
+        """Check if collection exists"""
+        if collection_name in self._collections:
+            return True
+        try:
+            with self._collections_lock:
+                # ChromaDB's catalog is listed once; creates and deletes keep the set current
+                if self._collection_names is None and Config.VECTOR_QUANTIZATION:
+                    self._collection_names = set(QuantizedCollection.list_names())
+                elif self._collection_names is None:
+                    self._collection_names = {c.name for c in self.chroma_client.list_collections()}
+                return collection_name in self._collection_names
+        except Exception as e:
+            print(f"Error checking collection: {e}")
+            return False
+
@@ -1,80 +1,429 @@
-import PyPDF2
-import pdfplumber
-import pandas as pd
-from pathlib import Path
-
-class FileProcessor:
-    """Process PDF and Excel files"""
-    
-    @staticmethod
-    def process_pdf(file_path):
-        """Extract text from PDF"""
-        try:
-            text_by_page = {}
-            
-            # pdfplumber 
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        text_by_page[page_num] = text
-            
-            return text_by_page, len(text_by_page)
-        except Exception as e:
-            print(f"Error processing PDF: {e}")
-            # Fallback to PyPDF2
-            try:
-                text_by_page = {}
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page_num in range(len(pdf_reader.pages)):
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        if text:
-                            text_by_page[page_num + 1] = text
-                
-                return text_by_page, len(text_by_page)
-            except Exception as e2:
-                print(f"Error with PyPDF2: {e2}")
-                return {}, 0
-    
-    @staticmethod
-    def process_excel(file_path):
-        """Extract questions from Excel"""
-        try:
-            df = pd.read_excel(file_path)
-            
-            # Try to find question column
-            question_col = None
-            for col in df.columns:
-                if 'question' in col.lower() or 'query' in col.lower():
-                    question_col = col
-                    break
-            
-            if question_col is None:
-                # Use first column as questions
-                question_col = df.columns[0]
-            
-            questions = df[question_col].dropna().tolist()
-            return questions
-        except Exception as e:
-            print(f"Error processing Excel: {e}")
-            return []
-    
-    @staticmethod
-    def chunk_text(text, chunk_size=500, overlap=50):
-        """Split text into chunks"""
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = start + chunk_size
-            chunk = text[start:end]
-            
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - overlap
-        
+import csv
+import re
+import PyPDF2
+import pdfplumber
+import openpyxl
+import pandas as pd
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from pathlib import Path
+from config import Config
+from utils.chunker import TextChunker
+from utils.ocr import PageOCR
+
+# Adaptive extraction: PyPDF2 output is kept unless one of these suggests pdfplumber will do better
+_MAX_AVG_WORD_LENGTH = 12  # longer "words" mean PyPDF2 dropped the spaces
+_MIN_LETTER_RATIO = 0.5  # share of letters among non-space characters
+_MAX_GARBLED_RATIO = 0.01  # unmapped glyphs ('\ufffd', '(cid:NN)') per character
+_MIN_RULING_OPS = 8  # rectangles and line segments drawn on the page (table borders)
+_MIN_COLUMN_SHARE = 0.25  # share of lines starting in each half of the page for multi-column
+_GUTTER_SEARCH = (0.2, 0.8)  # part of the page width searched for the gap between columns
+_RULING_OP = re.compile(rb'\s(?:re|l)\s')
+
+def _layout_reason(page, text, line_starts):
+    """Why a page should be re-extracted with pdfplumber, or None to keep the PyPDF2 text"""
+    if not text.strip():
+        # No text but fonts present: PyPDF2 failed rather than the page being a scan
+        resources = page.get('/Resources')
+        resources = resources.get_object() if resources is not None else {}
+        return 'empty' if '/Font' in resources else None
+    
+    words = text.split()
+    if sum(len(w) for w in words) / len(words) > _MAX_AVG_WORD_LENGTH:
+        return 'merged words'
+    
+    visible = ''.join(words)
+    if (text.count('\ufffd') + text.count('(cid:')) / len(visible) > _MAX_GARBLED_RATIO:
+        return 'garbled'
+    if sum(c.isalpha() for c in visible) / len(visible) < _MIN_LETTER_RATIO:
+        return 'low letter ratio'
+    
+    contents = page.get_contents()
+    if contents is not None and len(_RULING_OP.findall(contents.get_data())) >= _MIN_RULING_OPS:
+        return 'table'
+    
+    if len(line_starts) >= 10:
+        width = float(page.mediabox.width)
+        right = sum(1 for x in line_starts if x > width * 0.45)
+        left = len(line_starts) - right
+        if min(left, right) >= len(line_starts) * _MIN_COLUMN_SHARE:
+            return 'multi-column'
+    
+    return None
+
+def _column_gutter(page):
+    """x position of the gap between two text columns on a pdfplumber page
+    
+    The centre of the widest vertical strip, in the middle of the page, crossed by the
+    fewest characters (a heading spanning both columns still crosses the gutter).
+    """
+    width = float(page.width)
+    low, high = int(width * _GUTTER_SEARCH[0]), int(width * _GUTTER_SEARCH[1])
+    coverage = [0] * (high - low)
+    for char in page.chars:
+        if not char['text'].strip():
+            continue
+        for x in range(max(int(char['x0']), low), min(int(char['x1']) + 1, high)):
+            coverage[x - low] += 1
+    if not coverage:
+        return width / 2
+    
+    fewest = min(coverage)
+    best_start, best_length = 0, 0
+    run_start = None
+    for x, count in enumerate(coverage + [fewest + 1]):
+        if count == fewest:
+            if run_start is None:
+                run_start = x
+        elif run_start is not None:
+            if x - run_start > best_length:
+                best_start, best_length = run_start, x - run_start
+            run_start = None
+    return low + best_start + best_length / 2
+
+def _extract_page_pypdf2(page):
+    """Extract a page with PyPDF2, returning (text, x positions where text lines start)"""
+    line_starts = []
+    last = {'x': None, 'y': None}
+    column_gap = float(page.mediabox.width) * 0.3
+    
+    def visit(text, cm, tm, font_dict, font_size):
+        if not text.strip():
+            return
+        x = cm[0] * tm[4] + cm[2] * tm[5] + cm[4]
+        y = cm[1] * tm[4] + cm[3] * tm[5] + cm[5]
+        # A new baseline, or a jump across the page on the same baseline (next column)
+        if last['y'] is None or abs(y - last['y']) > 1 or x - last['x'] > column_gap:
+            line_starts.append(x)
+        last.update(x=x, y=y)
+    
+    text = page.extract_text(visitor_text=visit) or ''
+    return text, line_starts
+
+def _extract_range_pdfplumber(file_path, start, end):
+    text_by_page = {}
+    blank_pages = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_index in range(start, end):
+            page = pdf.pages[page_index]
+            text = page.extract_text()
+            if text and text.strip():
+                text_by_page[page_index + 1] = text
+            else:
+                blank_pages.append(page_index)
+            page.flush_cache()
+    return text_by_page, blank_pages, end - start
+
+def _extract_range_pypdf2(file_path, start, end):
+    text_by_page = {}
+    blank_pages = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_index in range(start, end):
+            text = pdf_reader.pages[page_index].extract_text()
+            if text and text.strip():
+                text_by_page[page_index + 1] = text
+            else:
+                blank_pages.append(page_index)
+    return text_by_page, blank_pages, 0
+
+def _extract_range_adaptive(file_path, start, end):
+    text_by_page = {}
+    blank_pages = []
+    escalate = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_index in range(start, end):
+            page = pdf_reader.pages[page_index]
+            text, line_starts = _extract_page_pypdf2(page)
+            reason = _layout_reason(page, text, line_starts)
+            if reason:
+                escalate.append((page_index, reason))
+            elif text.strip():
+                text_by_page[page_index + 1] = text
+            else:
+                blank_pages.append(page_index)
+    
+    if escalate:
+        with pdfplumber.open(file_path) as pdf:
+            for page_index, reason in escalate:
+                page = pdf.pages[page_index]
+                if reason == 'multi-column':
+                    # Read each column separately so they come out in reading order; characters
+                    # go to the side their centre is on, so a glyph crossing the split is kept
+                    gutter = _column_gutter(page)
+                    columns = (
+                        page.filter(lambda obj: obj.get('object_type') != 'char'
+                                    or (obj['x0'] + obj['x1']) / 2 < gutter).extract_text(),
+                        page.filter(lambda obj: obj.get('object_type') != 'char'
+                                    or (obj['x0'] + obj['x1']) / 2 >= gutter).extract_text()
+                    )
+                    text = '\n'.join(column for column in columns if column)
+                else:
+                    text = page.extract_text()
+                if text and text.strip():
+                    text_by_page[page_index + 1] = text
+                else:
+                    blank_pages.append(page_index)
+                page.flush_cache()
+    
+    return dict(sorted(text_by_page.items())), sorted(blank_pages), len(escalate)
+
+_EXTRACTORS = {
+    'adaptive': _extract_range_adaptive,
+    'pdfplumber': _extract_range_pdfplumber,
+    'pypdf2': _extract_range_pypdf2
+}
+
+def _extract_page_range(file_path, start, end, mode='adaptive'):
+    """Extract text from pages [start, end) - runs inside a worker process
+    
+    Returns (text_by_page, blank_pages, pdfplumber_pages) where blank_pages are the
+    0-based indexes of pages without a text layer and pdfplumber_pages counts the
+    pages that needed the slower layout-aware engine.
+    """
+    try:
+        return _EXTRACTORS[mode](file_path, start, end)
+    except Exception as e:
+        print(f"Error processing PDF pages {start + 1}-{end} ({mode}): {e}")
+        # Fall back to the other engine for this page range only
+        fallback = 'pypdf2' if mode == 'pdfplumber' else 'pdfplumber'
+        try:
+            return _EXTRACTORS[fallback](file_path, start, end)
+        except Exception as e2:
+            print(f"Error with {fallback} on pages {start + 1}-{end}: {e2}")
+            return {}, [], 0
+
+# Worker pools shared by every ingest in the process, so concurrent ingests never start
+# more than PDF_EXTRACT_WORKERS extraction and OCR_WORKERS OCR processes between them
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _worker_pool(name, workers):
+    """Shared process pool, created on first use"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            # Forking a process that runs request, ingest and torch threads can copy a lock
+            # another thread holds (e.g. stdout's) into the child, so workers are never forked
+            # from it: forkserver forks them from a clean single-threaded server, spawn starts fresh
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pools[name] = pool
+        return pool
+
+def _discard_pool(name, pool):
+    """Drop a pool whose worker died, so the next ingest starts a fresh one"""
+    with _pools_lock:
+        if _pools.get(name) is pool:
+            del _pools[name]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+class FileProcessor:
+    """Process PDF and Excel files"""
+    
+    @staticmethod
+    def count_pdf_pages(file_path):
+        """Get the number of pages in a PDF"""
+        try:
+            with open(file_path, 'rb') as file:
+                return len(PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            print(f"Error counting pages with PyPDF2: {e}")
+            try:
+                with pdfplumber.open(file_path) as pdf:
+                    return len(pdf.pages)
+            except Exception as e2:
+                print(f"Error counting pages with pdfplumber: {e2}")
+                return 0
+    
+    @staticmethod
+    def iter_pdf_pages(file_path, workers=None, mode=None):
+        """Yield (page_num, text) in page order, extracting page ranges in worker processes for large files
+        
+        mode is 'adaptive' (PyPDF2, escalating layout-heavy or badly extracted pages to
+        pdfplumber), 'pdfplumber' or 'pypdf2'; defaults to Config.PDF_EXTRACT_MODE.
+        workers bounds how many of the shared pool's processes this file keeps busy.
+        """
+        workers = Config.PDF_EXTRACT_WORKERS if workers is None else workers
+        mode = Config.PDF_EXTRACT_MODE if mode is None else mode
+        start_time = time.perf_counter()
+        
+        total_pages = FileProcessor.count_pdf_pages(file_path)
+        if total_pages == 0:
+            return
+        
+        page_ranges = [
+            (start, min(start + Config.PDF_PAGES_PER_TASK, total_pages))
+            for start in range(0, total_pages, Config.PDF_PAGES_PER_TASK)
+        ]
+        
+        # Scanned pages are OCR'd in a separate pool, used from the first blank page
+        ocr = {'executor': None, 'pages': 0, 'cached': 0, 'seconds': 0.0}
+        pdfplumber_pages = 0
+        if workers > 1 and total_pages >= Config.PDF_PARALLEL_MIN_PAGES:
+            executor = _worker_pool('extract', Config.PDF_EXTRACT_WORKERS)
+            workers = min(workers, Config.PDF_EXTRACT_WORKERS, len(page_ranges))
+            # Keep a bounded window of ranges in flight so results don't pile up
+            remaining = iter(page_ranges)
+            pending = deque()
+            try:
+                pending.extend(
+                    executor.submit(_extract_page_range, file_path, start, end, mode)
+                    for start, end in islice(remaining, workers * 2)
+                )
+                while pending:
+                    text_by_page, blank_pages, escalated = pending.popleft().result()
+                    pdfplumber_pages += escalated
+                    next_range = next(remaining, None)
+                    if next_range:
+                        pending.append(executor.submit(_extract_page_range, file_path, *next_range, mode))
+                    yield from FileProcessor._add_ocr_pages(file_path, text_by_page, blank_pages, ocr)
+            except BrokenProcessPool:
+                _discard_pool('extract', executor)
+                raise
+            finally:
+                # The pool is shared: only drop this ingest's queued ranges
+                for future in pending:
+                    future.cancel()
+        else:
+            workers = 1
+            for start, end in page_ranges:
+                text_by_page, blank_pages, escalated = _extract_page_range(file_path, start, end, mode)
+                pdfplumber_pages += escalated
+                yield from FileProcessor._add_ocr_pages(file_path, text_by_page, blank_pages, ocr)
+        
+        elapsed = time.perf_counter() - start_time
+        pages_per_sec = total_pages / elapsed if elapsed > 0 else 0
+        ocr_summary = ''
+        if ocr['pages']:
+            ocr_summary = (f", {ocr['pages']} page(s) OCR'd ({ocr['cached']} from cache) "
+                           f"in {ocr['seconds']:.2f}s of worker time")
+        print(f"Extracted {total_pages} pages from {Path(file_path).name} in {elapsed:.2f}s "
+              f"({pages_per_sec:.1f} pages/sec, {workers} worker(s), {mode}: {pdfplumber_pages} page(s) "
+              f"via pdfplumber{ocr_summary})")
+    
+    @staticmethod
+    def _add_ocr_pages(file_path, text_by_page, blank_pages, ocr):
+        """OCR the blank pages of an extracted range, returning all (page_num, text) in page order"""
+        if not blank_pages or not PageOCR.is_available():
+            return list(text_by_page.items())
+        
+        if ocr['executor'] is None and Config.OCR_WORKERS > 1:
+            ocr['executor'] = _worker_pool('ocr', Config.OCR_WORKERS)
+        
+        try:
+            text_by_page.update(PageOCR.ocr_pages(file_path, blank_pages, ocr['executor'], ocr))
+        except BrokenProcessPool:
+            _discard_pool('ocr', ocr['executor'])
+            raise
+        return sorted(text_by_page.items())
+    
+    @staticmethod
+    def process_pdf(file_path, workers=None, mode=None):
+        """Extract text from PDF"""
+        text_by_page = dict(FileProcessor.iter_pdf_pages(file_path, workers, mode))
+        return text_by_page, len(text_by_page)
+    
+    @staticmethod
+    def iter_questions(file_path):
+        """Yield (row_num, question) from an Excel or CSV file without loading it all
+        
+        The first row is the header; the column named like 'question' or 'query' is used,
+        otherwise the first column. row_num is the 1-based row in the sheet.
+        """
+        ext = Path(file_path).suffix.lower()
+        try:
+            if ext == '.csv':
+                rows = FileProcessor._iter_csv_rows(file_path)
+            elif ext == '.xls':
+                # openpyxl can't read the legacy format
+                rows = FileProcessor._iter_xls_rows(file_path)
+            else:
+                rows = FileProcessor._iter_xlsx_rows(file_path)
+            
+            try:
+                header = next(rows)
+            except StopIteration:
+                return
+            
+            question_idx = 0
+            for idx, col in enumerate(header):
+                name = str(col).lower() if col is not None else ''
+                if 'question' in name or 'query' in name:
+                    question_idx = idx
+                    break
+            
+            for row_num, row in enumerate(rows, start=2):
+                if question_idx >= len(row) or row[question_idx] is None:
+                    continue
+                question = str(row[question_idx]).strip()
+                if question and question.lower() != 'nan':
+                    yield row_num, question
+        except Exception as e:
+            print(f"Error reading questions from {file_path}: {e}")
+    
+    @staticmethod
+    def _iter_xlsx_rows(file_path):
+        # Read-only mode streams rows instead of building the whole sheet in memory
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _iter_csv_rows(file_path):
+        with open(file_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+            for row in csv.reader(f):
+                yield [value if value != '' else None for value in row]
+    
+    @staticmethod
+    def _iter_xls_rows(file_path):
+        df = pd.read_excel(file_path, header=None)
+        for row in df.itertuples(index=False):
+            yield [None if pd.isna(value) else value for value in row]
+    
+    @staticmethod
+    def process_excel(file_path):
+        """Extract questions from Excel"""
+        return [question for _, question in FileProcessor.iter_questions(file_path)]
+    
+    @staticmethod
+    def chunk_text(text, chunk_size=500, overlap=50, strategy=None):
+        """Split text into chunks using the configured chunking strategy
+        
+        chunk_size only applies to the 'fixed' strategy; 'sentence' chunks are sized by
+        Config.CHUNK_MAX_TOKENS.
+        """
+        strategy = Config.CHUNK_STRATEGY if strategy is None else strategy
+        if strategy == 'sentence':
+            return TextChunker(overlap=overlap).chunk(text)
+        return FileProcessor.chunk_text_fixed(text, chunk_size, overlap)
+    
+    @staticmethod
+    def chunk_text_fixed(text, chunk_size=500, overlap=50):
+        """Split text into fixed-size character windows"""
+        chunks = []
+        start = 0
+        text_length = len(text)
+        
+        while start < text_length:
+            end = start + chunk_size
+            chunk = text[start:end]
+            
+            if chunk:
+                chunks.append(chunk)
+            
+            start = end - overlap
+        
         return chunks
\ No newline at end of file
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from config import Config
+from database.models import DatabaseManager
+from utils.document_cache import DocumentCache
+
+# Marks the end of the batch stream
+_DONE = object()
+
+class IngestionPipeline:
+    """Stream PDF pages through chunking, embedding and insertion in fixed-size batches"""
+    
+    def __init__(self, embedding_manager, batch_size=None, queue_batches=None, answer_cache=None):
+        self.embedding_manager = embedding_manager
+        self.answer_cache = answer_cache
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.queue_batches = queue_batches or Config.INGEST_QUEUE_BATCHES
+    
+    def ingest_pdf(self, collection_name, doc_id, file_path, file_hash=None, progress_callback=None, replaces=None):
+        """Ingest a PDF into a collection, returning {'success', 'total_pages', 'total_chunks', 'changes'}
+        
+        progress_callback(stage, pages_done, chunks_done) is called after every batch, with
+        stage 'extracting' while pages are still being read and 'embedding' afterwards.
+        Chunks already in the collection for this document, or for an earlier upload of the
+        same file name, are reused; 'changes' counts unchanged, reused, embedded and deleted chunks.
+        Vectors of the earlier versions in replaces are deleted once this one is in place.
+        """
+        start_time = time.perf_counter()
+        if file_hash is None:
+            file_hash = DatabaseManager.calculate_file_hash(file_path)
+        
+        source_name = self.embedding_manager.source_name(file_path)
+        sync = self.embedding_manager.begin_chunk_sync(collection_name, doc_id, source_name, replaces)
+        
+        # Extraction and chunking run in a producer thread while this thread embeds,
+        # so only queue_batches batches are ever held in memory
+        batches = queue.Queue(maxsize=self.queue_batches)
+        stop = threading.Event()
+        extraction_done = threading.Event()
+        pages = set()
+        
+        producer = threading.Thread(
+            target=self._produce_batches,
+            args=(file_path, file_hash, batches, stop, extraction_done, pages),
+            daemon=True
+        )
+        producer.start()
+        
+        success = True
+        total_chunks = 0
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, Exception):
+                print(f"Error extracting {file_path}: {batch}")
+                success = False
+                continue
+            if success and not self.embedding_manager.add_chunk_batch(
+                    collection_name, doc_id, batch, total_chunks, sync, source_name):
+                # Stop extracting, but keep draining so the producer can exit
+                success = False
+                stop.set()
+            total_chunks += len(batch)
+            
+            if success and progress_callback:
+                stage = 'embedding' if extraction_done.is_set() else 'extracting'
+                progress_callback(stage, len(pages), total_chunks)
+        
+        producer.join()
+        
+        # Only drop the old vectors once the new version is fully in place
+        changes = None
+        if success:
+            changes = self.embedding_manager.finish_chunk_sync(collection_name, sync)
+            # Answers given while the document was missing, partial or older are stale
+            if self.answer_cache:
+                for stale_doc_id in [doc_id] + list(replaces or []):
+                    self.answer_cache.invalidate_document(stale_doc_id)
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"Ingested {len(pages)} pages / {total_chunks} chunks into {collection_name} in {elapsed:.2f}s"
+              + (f" ({changes})" if changes else ""))
+        
+        return {
+            'success': success,
+            'total_pages': len(pages),
+            'total_chunks': total_chunks,
+            'changes': changes
+        }
+    
+    def _produce_batches(self, file_path, file_hash, batches, stop, extraction_done, pages):
+        """Chunk the document and put fixed-size batches on the queue"""
+        try:
+            batch = []
+            for page_num, chunk in DocumentCache.iter_chunks(file_path, file_hash):
+                if stop.is_set():
+                    break
+                pages.add(page_num)
+                batch.append((page_num, chunk))
+                if len(batch) >= self.batch_size:
+                    batches.put(batch)
+                    batch = []
+            
+            if batch and not stop.is_set():
+                batches.put(batch)
+        except Exception as e:
+            batches.put(e)
+        finally:
+            extraction_done.set()
+            batches.put(_DONE)
@@ -0,0 +1,172 @@
+import os
+import queue
+import socket
+import threading
+import time
+import traceback
+from config import Config
+from database.models import DatabaseManager
+from utils.file_processor import FileProcessor
+
+class IngestionJobQueue:
+    """Run document ingestion jobs on background worker threads
+    
+    Jobs are stored in the IngestionJobs table, so queued work is picked up again the
+    next time the queue starts. Claimed jobs record this process as their owner and
+    refresh a heartbeat every INGEST_JOB_HEARTBEAT_SECONDS while they run; a sweep
+    every INGEST_JOB_SWEEP_SECONDS requeues other owners' jobs with no heartbeat for
+    INGEST_JOB_STALE_SECONDS, so work interrupted by a crash or restart resumes.
+    """
+    
+    def __init__(self, pipeline, workers=None):
+        self.pipeline = pipeline
+        self.workers = workers or Config.INGEST_WORKERS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start worker threads and recover persisted jobs (safe to call repeatedly)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        
+        for i in range(self.workers):
+            worker = threading.Thread(target=self._worker, name=f"ingest-worker-{i + 1}", daemon=True)
+            worker.start()
+        
+        DatabaseManager.requeue_stale_ingestion_jobs(Config.INGEST_JOB_STALE_SECONDS, self.worker_id)
+        recovered = DatabaseManager.get_queued_ingestion_job_ids()
+        for job_id in recovered:
+            self.jobs.put(job_id)
+        if recovered:
+            print(f"Recovered {len(recovered)} queued ingestion job(s)")
+        
+        threading.Thread(target=self._sweep, name="ingest-sweeper", daemon=True).start()
+    
+    def submit(self, user_id, doc_id, collection_name):
+        """Persist a new job and hand it to the workers, returning the job id"""
+        job_id = DatabaseManager.create_ingestion_job(user_id, doc_id, collection_name)
+        if job_id is None:
+            return None
+        
+        self.start()
+        self.jobs.put(job_id)
+        return job_id
+    
+    def submit_many(self, user_id, doc_ids, collection_name, replaces=None):
+        """Persist jobs for several documents in one transaction, returning job ids in order
+        
+        replaces maps a document to the earlier versions of it that its job supersedes.
+        """
+        job_ids = DatabaseManager.create_ingestion_jobs(user_id, doc_ids, collection_name, replaces)
+        if job_ids is None:
+            return [None] * len(doc_ids)
+        
+        self.start()
+        for job_id in job_ids:
+            self.jobs.put(job_id)
+        return job_ids
+    
+    def run(self, job_id):
+        """Run a persisted job in the calling thread, returning the ingest result (None if not run)"""
+        try:
+            return self._run_job(job_id)
+        except Exception as e:
+            print(f"Error running ingestion job {job_id}: {e}")
+            DatabaseManager.update_ingestion_job(job_id, 'failed', error_message=str(e))
+            return None
+    
+    def _sweep(self):
+        """Periodically requeue jobs abandoned by a process that stopped mid-ingest"""
+        while True:
+            time.sleep(Config.INGEST_JOB_SWEEP_SECONDS)
+            recovered = DatabaseManager.requeue_stale_ingestion_jobs(Config.INGEST_JOB_STALE_SECONDS, self.worker_id)
+            for job_id in recovered:
+                self.jobs.put(job_id)
+            if recovered:
+                print(f"Requeued {len(recovered)} stalled ingestion job(s)")
+    
+    def _worker(self):
+        while True:
+            job_id = self.jobs.get()
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                print(f"Error running ingestion job {job_id}: {e}")
+                traceback.print_exc()
+                DatabaseManager.update_ingestion_job(job_id, 'failed', error_message=str(e))
+            finally:
+                self.jobs.task_done()
+    
+    def _run_job(self, job_id):
+        # Another process may already have claimed it
+        if not DatabaseManager.claim_ingestion_job(job_id, self.worker_id):
+            return None
+        
+        # Extraction and OCR can run for minutes without a progress write
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, stop_heartbeat),
+            name=f"ingest-heartbeat-{job_id}",
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            return self._ingest(job_id)
+        finally:
+            stop_heartbeat.set()
+    
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(Config.INGEST_JOB_HEARTBEAT_SECONDS):
+            DatabaseManager.touch_ingestion_job(job_id, self.worker_id)
+    
+    def _ingest(self, job_id):
+        job = DatabaseManager.get_ingestion_job(job_id)
+        if not job:
+            return None
+        
+        total_pages = FileProcessor.count_pdf_pages(job['file_path'])
+        DatabaseManager.update_ingestion_job(job_id, 'extracting', total_pages=total_pages)
+        
+        # Throttle progress writes to roughly one per second per job
+        last_update = {'stage': 'extracting', 'time': time.monotonic()}
+        
+        def report_progress(stage, pages_done, chunks_done):
+            now = time.monotonic()
+            if stage == last_update['stage'] and now - last_update['time'] < 1:
+                return
+            last_update.update(stage=stage, time=now)
+            DatabaseManager.update_ingestion_job(job_id, stage, pages_done=pages_done, chunks_done=chunks_done)
+        
+        result = self.pipeline.ingest_pdf(
+            job['collection_name'],
+            job['doc_id'],
+            job['file_path'],
+            job['file_hash'],
+            progress_callback=report_progress,
+            replaces=job['replaces']
+        )
+        
+        if result['success']:
+            DatabaseManager.update_document_pages(job['doc_id'], result['total_pages'])
+            DatabaseManager.update_ingestion_job(
+                job_id,
+                'ready',
+                pages_done=result['total_pages'],
+                chunks_done=result['total_chunks'],
+                changes=result['changes']
+            )
+        else:
+            DatabaseManager.update_ingestion_job(
+                job_id,
+                'failed',
+                pages_done=result['total_pages'],
+                chunks_done=result['total_chunks'],
+                error_message='Failed to ingest document'
+            )
+        
+        return result
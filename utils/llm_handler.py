@@ -1,147 +1,228 @@
-import ollama
-from config import Config
-
-class LLMHandler:
-    """Handle LLM interactions using Ollama"""
-    
-    def __init__(self):
-        self.model = Config.OLLAMA_MODEL
-    
-    def generate_answer(self, question, context_chunks):
-        """Generate answer using Ollama"""
-        try:
-            # Check if we have any relevant chunks
-            if not context_chunks:
-                return {
-                    'answer': "No documents have been uploaded yet. Please upload some documents first.",
-                    'confidence': 0,
-                    'source_pages': None,
-                    'source_doc_names': None
-                }
-            
-            # Prepare context
-            context = "\n\n".join([chunk['text'] for chunk in context_chunks])
-            
-            # Create prompt
-            prompt = f"""You are a helpful AI assistant that answers questions based strictly on the provided context.
-
-Context from uploaded documents:
-{context}
-
-Question: {question}
-
-Instructions:
-1. Answer the question based ONLY on the information provided in the context above.
-2. If the context doesn't contain enough information to answer the question, you MUST say EXACTLY: "I don't have enough information in the provided documents to answer this question."
-3. Be concise, accurate, and helpful.
-4. Do not make up information or use external knowledge.
-5. If you quote from the context, keep it brief and relevant.
-
-Answer:"""
-            
-            # Generate response using Ollama
-            response = ollama.generate(
-                model=self.model,
-                prompt=prompt
-            )
-            
-            answer_text = response['response']
-            
-            # Calculate confidence score
-            confidence = self._calculate_confidence(context_chunks, answer_text)
-            
-            # Get source information
-            source_info = self._get_source_info(context_chunks)
-            
-            # If confidence is very low (answer indicates no info), set to 0
-            if confidence < 20 or self._is_no_answer(answer_text):
-                confidence = 0
-                source_info['pages'] = None
-                source_info['doc_names'] = None
-            
-            return {
-                'answer': answer_text,
-                'confidence': confidence,
-                'source_pages': source_info['pages'],
-                'source_doc_names': source_info['doc_names']
-            }
-            
-        except Exception as e:
-            print(f"Error generating answer: {e}")
-            return {
-                'answer': "Error generating answer. Please try again.",
-                'confidence': 0,
-                'source_pages': None,
-                'source_doc_names': None
-            }
-    
-    def _is_no_answer(self, answer):
-        """Check if answer indicates no information found"""
-        no_answer_phrases = [
-            "don't have enough information",
-            "doesn't contain enough information",
-            "cannot answer",
-            "not mentioned",
-            "no information",
-            "unclear from",
-            "not provided in",
-            "does not provide",
-            "cannot find"
-        ]
-        answer_lower = answer.lower()
-        return any(phrase in answer_lower for phrase in no_answer_phrases)
-    
-    def _calculate_confidence(self, context_chunks, answer):
-        """Calculate confidence score (0-100)"""
-        if not context_chunks:
-            return 0
-        
-        # Check if answer indicates no information
-        if self._is_no_answer(answer):
-            return 0
-        
-        # Average distance from retrieved chunks 
-        avg_distance = sum([chunk.get('distance', 1) for chunk in context_chunks]) / len(context_chunks)
-        
-        # Convert distance to similarity score
-       
-        similarity = max(0, 100 - (avg_distance * 50))
-        
-      
-       
-        
-        # Ensure minimum threshold - if similarity is very low, set to 0
-        if similarity < 20:
-            similarity = 0
-        
-        return round(min(100, similarity), 2)
-    
-    def _get_source_info(self, context_chunks):
-        """Extract source document and page information"""
-        if not context_chunks:
-            return {'pages': None, 'doc_names': None}
-        
-        # Get unique doc_ids and pages
-        doc_ids = set()
-        pages = set()
-        
-        for chunk in context_chunks:
-            metadata = chunk.get('metadata', {})
-            if 'doc_id' in metadata:
-                doc_ids.add(metadata['doc_id'])
-            if 'page_num' in metadata:
-                pages.add(metadata['page_num'])
-        
-        # Get document names from doc_ids
-        from database.models import DatabaseManager
-        doc_names = []
-        for doc_id in doc_ids:
-            doc = DatabaseManager.get_document_by_id(int(doc_id))
-            if doc:
-                doc_names.append(doc['filename'])
-        
-        # Return comma-separated values
-        pages_str = ', '.join(sorted(pages, key=lambda x: int(x))) if pages else None
-        doc_names_str = ', '.join(doc_names) if doc_names else None
-        
+import ollama
+from config import Config
+from utils.chunker import TokenCounter
+from utils.metrics import Metrics
+
+# SentencePiece splits numbers, codes and medical terms into several pieces, so overestimate
+prompt_token_counter = TokenCounter(Config.LLM_TOKENIZER, estimate_factor=1.5)
+
+class LLMHandler:
+    """Handle LLM interactions using Ollama"""
+    
+    # Bump whenever the prompt changes, so answers cached for the old prompt are not reused
+    PROMPT_VERSION = 2
+    
+    PROMPT_TEMPLATE = """You are a helpful AI assistant that answers questions based strictly on the provided context.
+
+Context from uploaded documents:
+{context}
+
+Question: {question}
+
+Instructions:
+1. Answer the question based ONLY on the information provided in the context above.
+2. If the context doesn't contain enough information to answer the question, you MUST say EXACTLY: "I don't have enough information in the provided documents to answer this question."
+3. Be concise, accurate, and helpful.
+4. Do not make up information or use external knowledge.
+5. If you quote from the context, keep it brief and relevant.
+
+Answer:"""
+    
+    def __init__(self):
+        self.model = Config.OLLAMA_MODEL
+        # The prompt and the answer share the model's context window; ContextSelector keeps the
+        # context itself to CONTEXT_MAX_TOKENS, so this only cuts context that would overflow it
+        self.prompt_budget = Config.LLM_CONTEXT_WINDOW - Config.LLM_ANSWER_TOKENS
+        self.options = {'num_ctx': Config.LLM_CONTEXT_WINDOW, 'num_predict': Config.LLM_ANSWER_TOKENS}
+    
+    def generate_answer(self, question, context_chunks):
+        """Generate answer using Ollama"""
+        try:
+            # Check if we have any relevant chunks
+            if not context_chunks:
+                return self._no_documents_result()
+            
+            # Generate response using Ollama
+            prompt, used_chunks = self._build_prompt(question, context_chunks)
+            response = ollama.generate(model=self.model, prompt=prompt, options=self.options)
+            self._record_usage(response)
+            
+            return self._build_result(response['response'], used_chunks)
+        
+        except Exception as e:
+            print(f"Error generating answer: {e}")
+            return self._error_result()
+    
+    def stream_answer(self, question, context_chunks):
+        """Generate answer using Ollama, yielding ('token', text) as it arrives and then ('done', result)"""
+        if not context_chunks:
+            yield 'done', self._no_documents_result()
+            return
+        
+        try:
+            pieces = []
+            prompt, used_chunks = self._build_prompt(question, context_chunks)
+            for part in ollama.generate(model=self.model, prompt=prompt, options=self.options, stream=True):
+                if part.get('response'):
+                    pieces.append(part['response'])
+                    yield 'token', part['response']
+                if part.get('done'):
+                    self._record_usage(part)
+            
+            yield 'done', self._build_result(''.join(pieces), used_chunks)
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield 'done', self._error_result()
+    
+    def _build_prompt(self, question, context_chunks):
+        """Prompt with as many context chunks, in ranked order, as fit the prompt budget
+        
+        Returns the prompt and the chunks it includes. Chunks that do not fit are skipped
+        in favour of smaller, lower-ranked ones; the top chunk is truncated rather than dropped.
+        """
+        base_tokens = prompt_token_counter.count(self.PROMPT_TEMPLATE.format(context='', question=question))
+        budget = self.prompt_budget - base_tokens
+        separator_tokens = prompt_token_counter.count("\n\n")
+        
+        used_chunks = []
+        for chunk, tokens in zip(context_chunks, prompt_token_counter.count_many([chunk['text'] for chunk in context_chunks])):
+            cost = tokens + (separator_tokens if used_chunks else 0)
+            if cost <= budget:
+                used_chunks.append(chunk)
+                budget -= cost
+        
+        if not used_chunks:
+            text = prompt_token_counter.truncate(context_chunks[0]['text'], budget)
+            if text:
+                used_chunks.append(dict(context_chunks[0], text=text))
+        
+        if len(used_chunks) < len(context_chunks):
+            Metrics.increment('llm.context_chunks_dropped', len(context_chunks) - len(used_chunks))
+        
+        # Prepare context
+        context = "\n\n".join([chunk['text'] for chunk in used_chunks])
+        return self.PROMPT_TEMPLATE.format(context=context, question=question), used_chunks
+    
+    def _record_usage(self, response):
+        """Record prompt tokens and evaluation/generation times from an Ollama response"""
+        prompt_tokens = response.get('prompt_eval_count') or 0  # 0 when the prompt was already cached
+        answer_tokens = response.get('eval_count') or 0
+        prompt_seconds = (response.get('prompt_eval_duration') or 0) / 1e9
+        answer_seconds = (response.get('eval_duration') or 0) / 1e9
+        
+        Metrics.increment('llm.requests')
+        Metrics.increment('llm.prompt_tokens', prompt_tokens)
+        Metrics.increment('llm.answer_tokens', answer_tokens)
+        Metrics.observe('llm.prompt_eval', prompt_seconds)
+        Metrics.observe('llm.generation', answer_seconds)
+        print(f"LLM: {prompt_tokens} prompt tokens in {prompt_seconds:.2f}s, "
+              f"{answer_tokens} answer tokens in {answer_seconds:.2f}s")
+    
+    def _build_result(self, answer_text, context_chunks):
+        """Answer with its confidence score and sources"""
+        # Calculate confidence score
+        confidence = self._calculate_confidence(context_chunks, answer_text)
+        
+        # Get source information
+        source_info = self._get_source_info(context_chunks)
+        
+        # If confidence is very low (answer indicates no info), set to 0
+        if confidence < 20 or self._is_no_answer(answer_text):
+            confidence = 0
+            source_info['pages'] = None
+            source_info['doc_names'] = None
+        
+        return {
+            'answer': answer_text,
+            'confidence': confidence,
+            'source_pages': source_info['pages'],
+            'source_doc_names': source_info['doc_names']
+        }
+    
+    def _no_documents_result(self):
+        return {
+            'answer': "No documents have been uploaded yet. Please upload some documents first.",
+            'confidence': 0,
+            'source_pages': None,
+            'source_doc_names': None
+        }
+    
+    def _error_result(self):
+        return {
+            'answer': "Error generating answer. Please try again.",
+            'confidence': 0,
+            'source_pages': None,
+            'source_doc_names': None,
+            'error': True
+        }
+    
+    def _is_no_answer(self, answer):
+        """Check if answer indicates no information found"""
+        no_answer_phrases = [
+            "don't have enough information",
+            "doesn't contain enough information",
+            "cannot answer",
+            "not mentioned",
+            "no information",
+            "unclear from",
+            "not provided in",
+            "does not provide",
+            "cannot find"
+        ]
+        answer_lower = answer.lower()
+        return any(phrase in answer_lower for phrase in no_answer_phrases)
+    
+    def _calculate_confidence(self, context_chunks, answer):
+        """Calculate confidence score (0-100)"""
+        if not context_chunks:
+            return 0
+        
+        # Check if answer indicates no information
+        if self._is_no_answer(answer):
+            return 0
+        
+        # Average distance from retrieved chunks 
+        avg_distance = sum([chunk.get('distance', 1) for chunk in context_chunks]) / len(context_chunks)
+        
+        # Convert distance to similarity score
+       
+        similarity = max(0, 100 - (avg_distance * 50))
+        
+      
+       
+        
+        # Ensure minimum threshold - if similarity is very low, set to 0
+        if similarity < 20:
+            similarity = 0
+        
+        return round(min(100, similarity), 2)
+    
+    def _get_source_info(self, context_chunks):
+        """Extract source document and page information"""
+        if not context_chunks:
+            return {'pages': None, 'doc_names': None}
+        
+        # Get unique doc_ids and pages
+        doc_ids = set()
+        pages = set()
+        
+        for chunk in context_chunks:
+            metadata = chunk.get('metadata', {})
+            if 'doc_id' in metadata:
+                doc_ids.add(metadata['doc_id'])
+            if 'page_num' in metadata:
+                pages.add(metadata['page_num'])
+        
+        # Get document names from doc_ids
+        from database.models import DatabaseManager
+        doc_names = []
+        for doc_id in doc_ids:
+            doc = DatabaseManager.get_document_by_id(int(doc_id))
+            if doc:
+                doc_names.append(doc['filename'])
+        
+        # Return comma-separated values
+        pages_str = ', '.join(sorted(pages, key=lambda x: int(x))) if pages else None
+        doc_names_str = ', '.join(doc_names) if doc_names else None
+        
         return {'pages': pages_str, 'doc_names': doc_names_str}
\ No newline at end of file
@@ -0,0 +1,49 @@
+import threading
+
+class Metrics:
+    """Process-wide counters and timings, exposed as JSON at /metrics"""
+    
+    _lock = threading.Lock()
+    _counters = {}
+    _timings = {}
+    _sources = {}
+    
+    @staticmethod
+    def increment(name, value=1):
+        """Add value to a counter"""
+        with Metrics._lock:
+            Metrics._counters[name] = Metrics._counters.get(name, 0) + value
+    
+    @staticmethod
+    def observe(name, seconds):
+        """Record one timing sample"""
+        with Metrics._lock:
+            timing = Metrics._timings.setdefault(name, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += 1
+            timing['total_seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+    
+    @staticmethod
+    def register(name, callback):
+        """Include callback() (a dict) in every snapshot under name"""
+        with Metrics._lock:
+            Metrics._sources[name] = callback
+    
+    @staticmethod
+    def snapshot():
+        """Current counters, timing summaries and registered sources"""
+        with Metrics._lock:
+            counters = dict(Metrics._counters)
+            timings = {
+                name: dict(timing, avg_seconds=timing['total_seconds'] / timing['count'])
+                for name, timing in Metrics._timings.items()
+            }
+            sources = dict(Metrics._sources)
+        
+        snapshot = {'counters': counters, 'timings': timings}
+        for name, callback in sources.items():
+            try:
+                snapshot[name] = callback()
+            except Exception as e:
+                snapshot[name] = {'error': str(e)}
+        return snapshot
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import time
+from itertools import repeat
+import pdfplumber
+import pytesseract
+from config import Config
+
+def ocr_page(file_path, page_index):
+    """Render and OCR one page, reusing cached text for an identical image - runs inside a worker process
+    
+    Returns (page_num, text, seconds, cached).
+    """
+    start_time = time.perf_counter()
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            page = pdf.pages[page_index]
+            image = page.to_image(resolution=Config.OCR_RESOLUTION).original
+            page.flush_cache()
+        
+        image_hash = PageOCR.image_hash(image)
+        text = PageOCR.get_cached(image_hash)
+        if text is not None:
+            return page_index + 1, text, time.perf_counter() - start_time, True
+        
+        text = pytesseract.image_to_string(image, lang=Config.OCR_LANGUAGE)
+        seconds = time.perf_counter() - start_time
+        PageOCR.save_cached(image_hash, text, seconds)
+        return page_index + 1, text, seconds, False
+    except Exception as e:
+        print(f"Error running OCR on page {page_index + 1}: {e}")
+        return page_index + 1, '', time.perf_counter() - start_time, False
+
+class PageOCR:
+    """OCR fallback for PDF pages without a text layer, cached on disk by page-image hash"""
+    
+    _available = None
+    
+    @staticmethod
+    def is_available():
+        """Whether OCR is enabled and the tesseract binary can be found"""
+        if not Config.OCR_ENABLED:
+            return False
+        if PageOCR._available is None:
+            try:
+                pytesseract.get_tesseract_version()
+                PageOCR._available = True
+            except Exception as e:
+                print(f"Tesseract not available, scanned pages will be skipped: {e}")
+                PageOCR._available = False
+        return PageOCR._available
+    
+    @staticmethod
+    def image_hash(image):
+        """Hash of the rendered page pixels and the OCR language"""
+        sha256_hash = hashlib.sha256()
+        sha256_hash.update(f"{image.mode};{image.size};{Config.OCR_LANGUAGE};".encode())
+        sha256_hash.update(image.tobytes())
+        return sha256_hash.hexdigest()
+    
+    @staticmethod
+    def _cache_path(image_hash):
+        return os.path.join(Config.OCR_CACHE_DIR, image_hash[:2], f"{image_hash}.json")
+    
+    @staticmethod
+    def get_cached(image_hash):
+        """Cached OCR text for a page image, or None"""
+        try:
+            with open(PageOCR._cache_path(image_hash), encoding='utf-8') as f:
+                return json.load(f)['text']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading OCR cache: {e}")
+            return None
+    
+    @staticmethod
+    def save_cached(image_hash, text, seconds):
+        """Store OCR text and how long it took"""
+        path = PageOCR._cache_path(image_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'text': text,
+                    'ocr_seconds': round(seconds, 3),
+                    'language': Config.OCR_LANGUAGE,
+                    'resolution': Config.OCR_RESOLUTION
+                }, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing OCR cache: {e}")
+    
+    @staticmethod
+    def ocr_pages(file_path, page_indexes, executor=None, stats=None):
+        """OCR the given 0-based pages, returning {page_num: text} for pages that produced text
+        
+        Pages fan out over executor when given. stats, if given, accumulates
+        'pages', 'cached' and 'seconds'.
+        """
+        if executor is not None:
+            results = executor.map(ocr_page, repeat(file_path), page_indexes)
+        else:
+            results = map(ocr_page, repeat(file_path), page_indexes)
+        
+        text_by_page = {}
+        for page_num, text, seconds, cached in results:
+            source = 'cache' if cached else 'tesseract'
+            print(f"OCR page {page_num} of {os.path.basename(file_path)}: {seconds:.2f}s ({source})")
+            if stats is not None:
+                stats['pages'] += 1
+                stats['cached'] += int(cached)
+                stats['seconds'] += seconds
+            if text.strip():
+                text_by_page[page_num] = text
+        
+        return text_by_page
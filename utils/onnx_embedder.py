@@ -0,0 +1,100 @@
+import inspect
+import json
+import os
+import re
+import numpy as np
+from config import Config
+
+class OnnxEmbedder:
+    """CPU encoder running an exported ONNX copy of a SentenceTransformer model
+    
+    The model is exported once into ONNX_MODEL_DIR/<model> (plus a dynamically
+    int8-quantized copy) and encode() mirrors SentenceTransformer.encode: mean pooling
+    over the attention mask, then optional L2 normalization.
+    """
+    
+    def __init__(self, model_name=None, quantize=None, threads=None, model_dir=None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+        
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.quantize = Config.EMBEDDING_ONNX_QUANTIZE if quantize is None else quantize
+        self.directory = os.path.join(model_dir or Config.ONNX_MODEL_DIR, re.sub(r'[^\w.-]', '_', self.model_name))
+        if not os.path.exists(self._path('settings.json')):
+            self.export()
+        
+        with open(self._path('settings.json'), 'r', encoding='utf-8') as f:
+            self.max_seq_length = json.load(f)['max_seq_length']
+        self.tokenizer = AutoTokenizer.from_pretrained(self.directory)
+        
+        # One request encodes one batch at a time, so all cores go to intra-op parallelism
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or Config.EMBEDDING_THREADS or os.cpu_count()
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            self._path('model_int8.onnx' if self.quantize else 'model.onnx'),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def export(self):
+        """Export the model's transformer to ONNX and write an int8-quantized copy"""
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from sentence_transformers import SentenceTransformer
+        
+        os.makedirs(self.directory, exist_ok=True)
+        model = SentenceTransformer(self.model_name, device='cpu')
+        transformer = model[0].auto_model.eval()
+        model.tokenizer.save_pretrained(self.directory)
+        
+        sample = dict(model.tokenizer(['An example sentence'], return_tensors='pt'))
+        # Graph inputs follow forward()'s parameter order, not the tokenizer's
+        names = [name for name in inspect.signature(transformer.forward).parameters if name in sample]
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                (sample,),
+                self._path('model.onnx'),
+                input_names=names,
+                output_names=['last_hidden_state'],
+                dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in names + ['last_hidden_state']},
+                opset_version=14
+            )
+        quantize_dynamic(self._path('model.onnx'), self._path('model_int8.onnx'), weight_type=QuantType.QInt8)
+        
+        # Written last: its presence marks a complete export
+        with open(self._path('settings.json'), 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_name, 'max_seq_length': model.max_seq_length}, f)
+        print(f"Exported {self.model_name} to ONNX in {self.directory}")
+    
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               show_progress_bar=False):
+        """Embed sentences, accepting SentenceTransformer.encode's arguments"""
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size, normalize_embeddings)[0]
+        
+        # Similar lengths share a batch so little padding is computed
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        embeddings = np.empty((len(sentences), 0), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            batch = [sentences[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors='np')
+            hidden = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self.input_names})[0]
+            
+            mask = encoded['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            
+            if embeddings.shape[1] == 0:
+                embeddings = np.empty((len(sentences), pooled.shape[1]), dtype=np.float32)
+            embeddings[order[start:start + batch_size]] = pooled
+        return embeddings
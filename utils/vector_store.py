@@ -0,0 +1,304 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import numpy as np
+from config import Config
+
+class QuantizedCollection:
+    """Chunk store searched over compact int8/float16 vectors, rescored with float32
+    
+    Stands in for the parts of a Chroma collection EmbeddingManager uses (get, upsert,
+    delete, query). Compact codes are held in memory for the coarse scan; the float32
+    vectors stay in a memory-mapped file and only the top candidates are read back.
+    """
+    
+    def __init__(self, name, quantization, store_dir=None, rescore_factor=None):
+        if quantization not in ('int8', 'float16'):
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        self.name = name
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor or Config.VECTOR_RESCORE_FACTOR
+        self.directory = os.path.join(store_dir or Config.VECTOR_STORE_DIR, name)
+        self._lock = threading.Lock()
+        
+        os.makedirs(self.directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.directory, 'chunks.sqlite3'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                slot INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                document TEXT,
+                metadata TEXT
+            )
+        """)
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        
+        row = self._db.execute("SELECT value FROM settings WHERE key = 'dimension'").fetchone()
+        self.dimension = int(row[0]) if row else None
+        
+        # slot -> id / metadata for filtering without touching SQLite; None marks a free slot
+        self._ids = []
+        self._metadatas = []
+        self._slot_by_id = {}
+        self._columns = {}
+        for slot, chunk_id, metadata in self._db.execute("SELECT slot, id, metadata FROM chunks ORDER BY slot"):
+            self._grow(slot + 1)
+            self._ids[slot] = chunk_id
+            self._metadatas[slot] = json.loads(metadata)
+            self._slot_by_id[chunk_id] = slot
+        
+        self._codes = None
+        self._scales = None
+        if self.dimension:
+            self._load_codes()
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def _grow(self, size):
+        while len(self._ids) < size:
+            self._ids.append(None)
+            self._metadatas.append(None)
+    
+    def _code_dtype(self):
+        return np.int8 if self.quantization == 'int8' else np.float16
+    
+    def _load_codes(self):
+        slots = len(self._ids)
+        codes = np.fromfile(self._path('codes.bin'), dtype=self._code_dtype()) if os.path.exists(self._path('codes.bin')) else np.empty(0)
+        scales = np.fromfile(self._path('scales.bin'), dtype=np.float32) if os.path.exists(self._path('scales.bin')) else np.empty(0)
+        self._codes = np.zeros((slots, self.dimension), dtype=self._code_dtype())
+        self._scales = np.ones(slots, dtype=np.float32)
+        stored = min(slots, len(codes) // self.dimension)
+        self._codes[:stored] = codes[:stored * self.dimension].reshape(stored, self.dimension)
+        self._scales[:min(slots, len(scales))] = scales[:slots]
+    
+    def _vectors(self):
+        """Read-only map of the float32 vectors, one row per slot"""
+        slots = os.path.getsize(self._path('vectors.bin')) // (4 * self.dimension)
+        return np.memmap(self._path('vectors.bin'), dtype=np.float32, mode='r', shape=(slots, self.dimension))
+    
+    def _quantize(self, vectors):
+        if self.quantization == 'float16':
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    
+    @staticmethod
+    def _write_rows(path, slots, rows):
+        """Write rows (one per slot, fixed width) into a flat binary file at their slot offsets"""
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        row_bytes = rows.dtype.itemsize * (rows.shape[1] if rows.ndim > 1 else 1)
+        with open(path, mode) as f:
+            for slot, row in zip(slots, rows):
+                f.seek(slot * row_bytes)
+                f.write(row.tobytes())
+    
+    def _column(self, key):
+        """Metadata values for key by slot, as an array for vectorized where clauses"""
+        column = self._columns.get(key)
+        if column is None or len(column) != len(self._metadatas):
+            column = np.array([
+                '' if metadata is None else str(metadata.get(key, ''))
+                for metadata in self._metadatas
+            ], dtype=object)
+            self._columns[key] = column
+        return column
+    
+    def _match(self, where):
+        """Boolean mask of slots matching a Chroma-style where clause ($and/$or, $eq/$ne/$in/$nin)"""
+        live = self._columns.get(None)
+        if live is None or len(live) != len(self._ids):
+            live = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+            self._columns[None] = live
+        if not where:
+            return live.copy()
+        
+        mask = live.copy()
+        for key, condition in where.items():
+            if key in ('$and', '$or'):
+                masks = [self._match(clause) for clause in condition]
+                combined = np.logical_and.reduce(masks) if key == '$and' else np.logical_or.reduce(masks)
+                mask &= combined
+                continue
+            
+            column = self._column(key)
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for operator, value in condition.items():
+                if operator == '$eq':
+                    mask &= column == str(value)
+                elif operator == '$ne':
+                    mask &= column != str(value)
+                elif operator == '$in':
+                    mask &= np.isin(column, [str(v) for v in value])
+                elif operator == '$nin':
+                    mask &= ~np.isin(column, [str(v) for v in value])
+                else:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+        return mask
+    
+    def count(self):
+        return len(self._slot_by_id)
+    
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        """Insert or replace chunks; vectors are L2-normalized so scores are cosine similarities"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dimension', ?)", (str(self.dimension),))
+                self._load_codes()
+            
+            free = [slot for slot, chunk_id in enumerate(self._ids) if chunk_id is None]
+            slots = []
+            for chunk_id in ids:
+                slot = self._slot_by_id.get(chunk_id)
+                if slot is None:
+                    slot = free.pop(0) if free else len(self._ids)
+                    self._grow(slot + 1)
+                    self._slot_by_id[chunk_id] = slot
+                slots.append(slot)
+            
+            codes, scales = self._quantize(vectors)
+            if len(self._codes) < len(self._ids):
+                extra = len(self._ids) - len(self._codes)
+                self._codes = np.vstack([self._codes, np.zeros((extra, self.dimension), dtype=self._code_dtype())])
+                self._scales = np.concatenate([self._scales, np.ones(extra, dtype=np.float32)])
+            self._codes[slots] = codes
+            self._scales[slots] = scales
+            
+            self._write_rows(self._path('vectors.bin'), slots, vectors)
+            self._write_rows(self._path('codes.bin'), slots, codes)
+            self._write_rows(self._path('scales.bin'), slots, scales)
+            
+            for slot, chunk_id, document, metadata in zip(slots, ids, documents, metadatas):
+                self._ids[slot] = chunk_id
+                self._metadatas[slot] = dict(metadata or {})
+            self._columns = {}
+            
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (slot, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(slot, chunk_id, document, json.dumps(metadata or {}))
+                 for slot, chunk_id, document, metadata in zip(slots, ids, documents, metadatas)]
+            )
+            self._db.commit()
+    
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if where is not None:
+                slots = np.flatnonzero(self._match(where)).tolist()
+            else:
+                slots = [self._slot_by_id[chunk_id] for chunk_id in ids or [] if chunk_id in self._slot_by_id]
+            
+            for slot in slots:
+                self._slot_by_id.pop(self._ids[slot], None)
+                self._ids[slot] = None
+                self._metadatas[slot] = None
+            self._columns = {}
+            
+            self._db.executemany("DELETE FROM chunks WHERE slot = ?", [(slot,) for slot in slots])
+            self._db.commit()
+    
+    def _records(self, slots, include):
+        """ids plus the requested fields for slots, in the same order"""
+        records = {'ids': [self._ids[slot] for slot in slots]}
+        if 'metadatas' in include:
+            records['metadatas'] = [dict(self._metadatas[slot]) for slot in slots]
+        if 'documents' in include:
+            documents = {}
+            for start in range(0, len(slots), 500):
+                block = slots[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT slot, document FROM chunks WHERE slot IN ({','.join('?' * len(block))})", block
+                ).fetchall()
+                documents.update(rows)
+            records['documents'] = [documents.get(slot) for slot in slots]
+        if 'embeddings' in include:
+            vectors = self._vectors() if slots else None
+            records['embeddings'] = [vectors[slot].tolist() for slot in slots]
+        return records
+    
+    def get(self, ids=None, where=None, limit=None, include=('metadatas', 'documents')):
+        with self._lock:
+            if ids is not None:
+                slots = [self._slot_by_id[chunk_id] for chunk_id in ids if chunk_id in self._slot_by_id]
+            else:
+                slots = np.flatnonzero(self._match(where)).tolist()
+            if limit is not None:
+                slots = slots[:limit]
+            return self._records(slots, include)
+    
+    def query(self, query_embeddings, n_results=10, where=None, include=('metadatas', 'documents', 'distances')):
+        """Nearest chunks by cosine distance for each query embedding
+        
+        The compact codes pick n_results * rescore_factor candidates, which are then
+        ranked by their exact float32 similarity.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        
+        results = {'ids': [], 'metadatas': [], 'documents': [], 'distances': []}
+        with self._lock:
+            candidates = np.flatnonzero(self._match(where)) if self.dimension else np.empty(0, dtype=int)
+            if len(candidates) == 0:
+                for key in results:
+                    results[key] = [[] for _ in queries]
+                return results
+            
+            # Coarse scan over the compact codes, widened to float32 a block at a time
+            coarse = np.empty((len(candidates), len(queries)), dtype=np.float32)
+            everything = len(candidates) == len(self._codes)
+            for start in range(0, len(candidates), 4096):
+                rows = slice(start, start + 4096) if everything else candidates[start:start + 4096]
+                coarse[start:start + 4096] = self._codes[rows].astype(np.float32) @ queries.T
+            coarse *= self._scales[candidates][:, None]
+            shortlist_size = min(len(candidates), n_results * self.rescore_factor)
+            vectors = self._vectors()
+            
+            for q, query in enumerate(queries):
+                shortlist = np.sort(candidates[np.argpartition(-coarse[:, q], shortlist_size - 1)[:shortlist_size]])
+                # Exact rescoring of the shortlist
+                similarities = np.asarray(vectors[shortlist]) @ query
+                order = np.argsort(-similarities)[:n_results]
+                slots = shortlist[order].tolist()
+                
+                records = self._records(slots, include)
+                results['ids'].append(records['ids'])
+                results['metadatas'].append(records.get('metadatas', []))
+                results['documents'].append(records.get('documents', []))
+                results['distances'].append((1 - similarities[order]).tolist())
+        return results
+    
+    def drop(self):
+        """Delete the collection's files"""
+        with self._lock:
+            self._db.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def disk_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+        )
+    
+    @staticmethod
+    def list_names(store_dir=None):
+        """Names of the collections stored under store_dir"""
+        store_dir = store_dir or Config.VECTOR_STORE_DIR
+        if not os.path.isdir(store_dir):
+            return []
+        return [
+            name for name in os.listdir(store_dir)
+            if os.path.exists(os.path.join(store_dir, name, 'chunks.sqlite3'))
+        ]